@@ -0,0 +1,109 @@
+"""
+================================================================================
+BENCHMARK: BAGGED MULTI-SEED ENSEMBLE VS SINGLE MODEL ON THE SAME WALK-FORWARD SPLITS
+================================================================================
+
+PURPOSE:
+    Reports what averaging K LightGBM models per window (each with its own
+    seed and row/feature subsampling, trained in parallel threads) costs in
+    wall time and buys in accuracy, against the single model used by
+    train_predict_data4.py:
+    1. Per-window wall time (fit) for each ensemble size
+    2. Rank IC and D10 - D1 spread of the out-of-sample predictions
+
+INPUT FILE: data4.parquet
+
+OUTPUT:
+    Printed comparison table (one row per ensemble size)
+
+USAGE:
+    python benchmark_ensemble.py
+
+NOTES FOR AI:
+    - ENSEMBLE_SIZES mirrors ENSEMBLE_SIZE in the training scripts (1 = single model)
+    - N_WINDOWS limits the benchmark to the first windows (None = all)
+    - The model cache is not used, so every window is actually trained
+
+================================================================================
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from utils.walk_forward import WalkForward
+from utils.lgb_panel import ensemble_params
+from utils.param_search import window_metrics
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TRAINING_WINDOW = 12            # Months in the rolling training window
+N_PORTFOLIOS = 10               # Number of portfolios (deciles)
+ENSEMBLE_SIZES = [1, 3, 5, 10]  # Members per window (1 = single model)
+N_WINDOWS = 36                  # Windows benchmarked (None = all)
+
+PARAMS = {
+    'num_leaves': 31,
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'n_estimators': 100,
+    'min_child_samples': 50,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'objective': 'regression',
+    'metric': 'rmse',
+    'boosting_type': 'gbdt',
+    'verbose': -1,
+    'random_state': 42,
+    'n_jobs': -1,
+}
+
+# ============================================================================
+# LOAD AND RANK (same as train_predict_data4.py)
+# ============================================================================
+
+df_raw = pd.read_parquet('data4.parquet')
+df_train = df_raw.drop(columns=['close']).copy()
+df_train['raw_return'] = df_train['return']
+cols_to_rank = [col for col in df_train.columns if col not in ['ticker', 'month', 'raw_return']]
+for col in cols_to_rank:
+    df_train[col] = df_train.groupby('month')[col].rank(pct=True)
+df_train = df_train.sort_values(['month', 'ticker']).reset_index(drop=True)
+
+features = [col for col in cols_to_rank if col != 'return']
+wf = WalkForward(df_train, 'month', features, 'return')
+today = datetime.now()
+n_complete = int(np.sum(wf.periods < f"{today.year}-{today.month:02d}"))
+end = n_complete if N_WINDOWS is None else min(n_complete, TRAINING_WINDOW + N_WINDOWS)
+raw_returns = df_train['raw_return'].to_numpy()
+
+# ============================================================================
+# RUN EACH ENSEMBLE SIZE
+# ============================================================================
+
+rows = []
+for size in ENSEMBLE_SIZES:
+    print(f"\nEnsemble size {size}")
+    ensemble = ensemble_params(PARAMS, size) if size > 1 else None
+    df_predict = wf.run(PARAMS, train_size=TRAINING_WINDOW, end=end,
+                        ensemble=ensemble, verbose=False)
+
+    # Predictions come back in panel order, so the scored rows are one slice
+    block = wf.rows(TRAINING_WINDOW, end)
+    offsets = wf.offsets[TRAINING_WINDOW:end + 1] - wf.offsets[TRAINING_WINDOW]
+    rank_ic, spread = window_metrics(df_predict['predict'].to_numpy(), raw_returns[block],
+                                     offsets, N_PORTFOLIOS)
+    rows.append({'members': size, 'windows': len(wf.fit_times),
+                 'mean_fit_s': np.mean(wf.fit_times), 'total_fit_s': np.sum(wf.fit_times),
+                 'rank_ic': rank_ic, 'spread': spread})
+
+results = pd.DataFrame(rows).set_index('members')
+results['fit_time_vs_single'] = results['mean_fit_s'] / results['mean_fit_s'].iloc[0]
+
+print("\n" + "=" * 80)
+print("ENSEMBLE VS SINGLE MODEL (data4, first windows)")
+print("=" * 80)
+print(results.round(4).to_string())
@@ -0,0 +1,155 @@
+"""
+================================================================================
+BENCHMARK: NATIVE LIGHTGBM SCORING VS UNPICKLED MODELS
+================================================================================
+
+PURPOSE:
+    Compares the two ways of scoring a saved model:
+    - pickle: joblib.load('{name}.pkl') and model.predict(DataFrame)
+    - native: NativeScorer('{name}.json') on a memory-mapped float32 array
+    1. Cold start: a fresh Python process loads the model and its feature
+       snapshot and scores it once (imports included)
+    2. Throughput: rows per second for several batch sizes in a warm process
+
+INPUT FILES: data4_model.pkl, data5_model.pkl, lightGBM.pkl (whichever exist)
+    and their native exports (run export_native_models.py first)
+
+OUTPUT:
+    Printed comparison tables
+
+USAGE:
+    python benchmark_native_scoring.py
+
+NOTES FOR AI:
+    - Feature snapshots are synthetic (uniform percentile ranks, random
+      category levels) so the benchmark needs no parquet data
+    - N_ROWS is the snapshot size; BATCH_SIZES the per-call batch sizes
+
+================================================================================
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from utils.native_scoring import NativeScorer, save_snapshot, load_snapshot
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MODELS = ['data4_model', 'data5_model', 'lightGBM']
+N_ROWS = 5000                   # Rows in the synthetic feature snapshot
+BATCH_SIZES = [1, 100, 1000, N_ROWS]
+COLD_START_REPEATS = 3          # Fresh processes per path (median reported)
+THROUGHPUT_SECONDS = 1.0        # Minimum timing budget per batch size
+
+PICKLE_COLD_START = """
+import time; start = time.perf_counter()
+import joblib, pandas as pd
+model = joblib.load({pkl!r})
+model = model['model'] if isinstance(model, dict) else model
+model.predict(pd.read_parquet({parquet!r}))
+print(time.perf_counter() - start)
+"""
+
+NATIVE_COLD_START = """
+import time; start = time.perf_counter()
+from utils.native_scoring import NativeScorer, load_snapshot
+NativeScorer({manifest!r}).predict(load_snapshot({npy!r}))
+print(time.perf_counter() - start)
+"""
+
+
+def synthetic_snapshot(scorer, n_rows, seed=0):
+    """float32 matrix and equivalent DataFrame of random feature values."""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(size=(n_rows, len(scorer.features))).astype(np.float32)
+    df = pd.DataFrame(X, columns=scorer.features)
+    for j, name in enumerate(scorer.features):
+        if name in scorer.categories:
+            levels = scorer.categories[name]
+            codes = rng.integers(0, len(levels), n_rows)
+            X[:, j] = codes
+            df[name] = pd.Categorical.from_codes(codes, categories=levels)
+    return X, df
+
+
+def cold_start(code):
+    """Median wall time (s) of a fresh interpreter running code."""
+    times = []
+    for _ in range(COLD_START_REPEATS):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                             text=True, check=True, cwd=os.getcwd())
+        times.append((time.perf_counter() - start, float(out.stdout.strip().splitlines()[-1])))
+    process, in_script = np.median(np.array(times), axis=0)
+    return process, in_script
+
+
+def throughput(predict, data, batch_size):
+    """Rows per second scoring data in batches of batch_size."""
+    n_rows, calls = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < THROUGHPUT_SECONDS or calls == 0:
+        for i in range(0, len(data), batch_size):
+            predict(data[i:i + batch_size])
+            n_rows += min(batch_size, len(data) - i)
+            calls += 1
+            if batch_size < len(data) and calls >= 2000:
+                break
+    return n_rows / (time.perf_counter() - start)
+
+
+for name in MODELS:
+    if not (os.path.exists(f'{name}.pkl') and os.path.exists(f'{name}.json')):
+        print(f"{name}: pickle or native export missing, skipping")
+        continue
+
+    print("\n" + "=" * 80)
+    print(f"{name}: NATIVE VS PICKLE")
+    print("=" * 80)
+
+    scorer = NativeScorer(f'{name}.json')
+    model = joblib.load(f'{name}.pkl')
+    model = model['model'] if isinstance(model, dict) else model
+    X, df = synthetic_snapshot(scorer, N_ROWS)
+
+    # Both paths must score identically before timing them
+    gap = np.max(np.abs(scorer.predict(X) - model.predict(df)))
+    print(f"Max |native - pickle| prediction difference: {gap:.2e}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        npy = os.path.join(tmp, 'snapshot.npy')
+        parquet = os.path.join(tmp, 'snapshot.parquet')
+        save_snapshot(X, npy)
+        df.to_parquet(parquet)
+
+        rows = []
+        for path, code in [
+            ('pickle', PICKLE_COLD_START.format(pkl=f'{name}.pkl', parquet=parquet)),
+            ('native', NATIVE_COLD_START.format(manifest=f'{name}.json', npy=npy)),
+        ]:
+            process, in_script = cold_start(code)
+            rows.append({'path': path, 'process_s': process, 'load_and_score_s': in_script})
+        print("\nCold start (fresh process, median of "
+              f"{COLD_START_REPEATS}; load_and_score_s includes imports):")
+        print(pd.DataFrame(rows).set_index('path').round(4).to_string())
+
+        X_mapped = load_snapshot(npy)
+        rows = []
+        for batch_size in BATCH_SIZES:
+            rows.append({
+                'batch_size': batch_size,
+                'pickle_rows_per_s': throughput(model.predict, df, batch_size),
+                'native_rows_per_s': throughput(scorer.predict, X_mapped, batch_size),
+            })
+        results = pd.DataFrame(rows).set_index('batch_size')
+        results['speedup'] = results['native_rows_per_s'] / results['pickle_rows_per_s']
+        print("\nThroughput (warm process):")
+        print(results.round(1).to_string())
+        del X_mapped
@@ -0,0 +1,136 @@
+"""
+================================================================================
+BENCHMARK: PER-WINDOW FIT TIME, PANDAS SLICES VS PRE-BINNED PANEL DATASET
+================================================================================
+
+PURPOSE:
+    Compares the per-window fit time of the two ways of training the rolling
+    12-month models of train_predict_data4.py:
+    1. Before: LGBMRegressor().fit() on a pandas slice (re-bins every window)
+    2. After: lgb.train() on a row subset of one binned panel Dataset
+       (utils/lgb_panel.py)
+
+INPUT FILE: data4.parquet
+
+OUTPUT:
+    Printed timing table (build time, mean/median fit time per window) and
+    the correlation between the two sets of out-of-sample predictions
+
+USAGE:
+    python benchmark_prebinned.py
+
+NOTES FOR AI:
+    - To benchmark more or fewer windows: modify N_WINDOWS constant
+    - Uses the same PARAMS and ranking as train_predict_data4.py
+
+================================================================================
+"""
+
+import time
+import pandas as pd
+import numpy as np
+import lightgbm as lgb
+from utils.lgb_panel import build_panel_dataset, train_window
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TRAINING_WINDOW = 12            # Number of months in rolling training window
+N_WINDOWS = 24                  # Number of rolling windows to time
+
+PARAMS = {
+    'num_leaves': 31,
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'n_estimators': 100,
+    'min_child_samples': 50,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'objective': 'regression',
+    'metric': 'rmse',
+    'boosting_type': 'gbdt',
+    'verbose': -1,
+    'random_state': 42,
+    'n_jobs': -1,
+}
+
+# ============================================================================
+# PREPARE RANKED PANEL (same as Step 1 of train_predict_data4.py)
+# ============================================================================
+
+df_train = pd.read_parquet('data4.parquet').drop(columns=['close'])
+cols_to_rank = [col for col in df_train.columns if col not in ['ticker', 'month']]
+for col in cols_to_rank:
+    df_train[col] = df_train.groupby('month')[col].rank(pct=True)
+df_train = df_train.sort_values(['month', 'ticker']).reset_index(drop=True)
+
+target = 'return'
+features = [col for col in df_train.columns if col not in ['ticker', 'month', 'return']]
+months = sorted(df_train['month'].unique())
+windows = range(TRAINING_WINDOW, min(TRAINING_WINDOW + N_WINDOWS, len(months)))
+print(f"Panel: {len(df_train):,} rows, {len(features)} features, timing {len(windows)} windows")
+
+# ============================================================================
+# BEFORE: LGBMRegressor ON A PANDAS SLICE PER WINDOW
+# ============================================================================
+
+before_times = []
+before_predictions = []
+for i in windows:
+    train_data = df_train[df_train['month'].isin(months[i - TRAINING_WINDOW:i])]
+    test_data = df_train[df_train['month'] == months[i]]
+
+    start = time.perf_counter()
+    model = lgb.LGBMRegressor(**PARAMS)
+    model.fit(train_data[features], train_data[target])
+    before_times.append(time.perf_counter() - start)
+
+    before_predictions.append(model.predict(test_data[features]))
+
+# ============================================================================
+# AFTER: ROW SUBSETS OF ONE BINNED PANEL DATASET
+# ============================================================================
+
+start = time.perf_counter()
+X_panel = df_train[features].to_numpy(dtype=np.float32)
+panel_dataset = build_panel_dataset(X_panel, df_train[target].to_numpy(),
+                                    features, PARAMS)
+build_time = time.perf_counter() - start
+
+month_values = df_train['month'].to_numpy()
+after_times = []
+after_predictions = []
+for i in windows:
+    train_rows = np.flatnonzero(np.isin(month_values, months[i - TRAINING_WINDOW:i]))
+    test_rows = np.flatnonzero(month_values == months[i])
+
+    start = time.perf_counter()
+    model = train_window(panel_dataset, train_rows, PARAMS)
+    after_times.append(time.perf_counter() - start)
+
+    after_predictions.append(model.predict(X_panel[test_rows]))
+
+# ============================================================================
+# RESULTS
+# ============================================================================
+
+before_times = np.array(before_times)
+after_times = np.array(after_times)
+agreement = np.corrcoef(np.concatenate(before_predictions),
+                        np.concatenate(after_predictions))[0, 1]
+
+print("\n" + "=" * 80)
+print("PER-WINDOW FIT TIME (seconds)")
+print("=" * 80)
+results = pd.DataFrame({
+    'mean': [before_times.mean(), after_times.mean()],
+    'median': [np.median(before_times), np.median(after_times)],
+    'total': [before_times.sum(), after_times.sum() + build_time],
+}, index=['pandas slice (before)', 'pre-binned subset (after)'])
+print(results.round(4).to_string())
+print(f"\nOne-off panel binning time: {build_time:.4f}s")
+print(f"Speedup per window (mean): {before_times.mean() / after_times.mean():.2f}x")
+print(f"Prediction correlation (before vs after): {agreement:.6f}")
@@ -0,0 +1,225 @@
+"""
+================================================================================
+BENCHMARK: WARM-START BOOSTING VS FULL RETRAINING ON THE SAME WALK-FORWARD SPLITS
+================================================================================
+
+PURPOSE:
+    Reports the accuracy/speed trade-off of the optional warm-start mode
+    (continue boosting the previous window's model with a few extra trees)
+    against training every window from scratch:
+    1. train_predict_data4.py: 12-month rolling return model
+       (rank IC and D10 - D1 spread)
+    2. train_lightgbm_pe.py: month-by-month PE model (MAPE)
+
+INPUT FILES: data4.parquet, data3.parquet
+
+OUTPUT:
+    Printed comparison tables (fit time, accuracy, trees in final model)
+
+USAGE:
+    python benchmark_warm_start.py
+
+NOTES FOR AI:
+    - Warm-start settings mirror WARM_START_TREES / WARM_START_REFIT_EVERY in
+      the two training scripts
+    - Each section is skipped if its input file is missing
+
+================================================================================
+"""
+
+import os
+import time
+import pandas as pd
+import numpy as np
+import lightgbm as lgb
+from utils.lgb_panel import build_panel_dataset, train_window
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TRAINING_WINDOW = 12            # Months in the data4 rolling training window
+N_PORTFOLIOS = 10               # Number of portfolios (deciles)
+WARM_START_TREES = 10           # data4: extra trees per warm-started window
+WARM_START_REFIT_EVERY = 12     # data4: full retrain every N windows
+
+PE_TREES = 500                  # PE model: trees per full retrain
+PE_WARM_START_TREES = 50        # PE model: extra trees per warm-started month
+
+PARAMS = {
+    'num_leaves': 31,
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'n_estimators': 100,
+    'min_child_samples': 50,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'objective': 'regression',
+    'metric': 'rmse',
+    'boosting_type': 'gbdt',
+    'verbose': -1,
+    'random_state': 42,
+    'n_jobs': -1,
+}
+
+PE_PARAMS = {
+    'objective': 'regression',
+    'metric': 'mape',
+    'learning_rate': 0.05,
+    'num_leaves': 31,
+    'max_depth': -1,
+    'min_data_in_leaf': 20,
+    'feature_fraction': 0.8,
+    'bagging_fraction': 0.8,
+    'bagging_freq': 5,
+    'lambda_l1': 0.1,
+    'lambda_l2': 0.1,
+    'verbose': -1,
+    'n_jobs': -1,
+    'random_state': 42
+}
+
+
+def summarize(name, fit_times, extra):
+    """One row of the comparison table."""
+    return {'mode': name, 'total_fit_s': np.sum(fit_times),
+            'mean_fit_s': np.mean(fit_times), **extra}
+
+
+# ============================================================================
+# SECTION 1: DATA4 RETURN MODEL
+# ============================================================================
+
+if os.path.exists('data4.parquet'):
+    print("=" * 80)
+    print("DATA4 RETURN MODEL: warm start vs full retrain")
+    print("=" * 80)
+
+    df_raw = pd.read_parquet('data4.parquet')
+    df_train = df_raw.drop(columns=['close'])
+    cols_to_rank = [col for col in df_train.columns if col not in ['ticker', 'month']]
+    for col in cols_to_rank:
+        df_train[col] = df_train.groupby('month')[col].rank(pct=True)
+    df_train = df_train.sort_values(['month', 'ticker']).reset_index(drop=True)
+
+    features = [col for col in df_train.columns if col not in ['ticker', 'month', 'return']]
+    months = sorted(df_train['month'].unique())[:-1]   # drop the incomplete month
+    X_panel = df_train[features].to_numpy(dtype=np.float32)
+    panel_dataset = build_panel_dataset(X_panel, df_train['return'].to_numpy(),
+                                        features, PARAMS)
+    month_values = df_train['month'].to_numpy()
+
+    # Realised (unranked) returns for the spread
+    df_returns = df_raw[['ticker', 'month', 'return']].rename(columns={'return': 'raw_return'})
+
+    rows = []
+    for warm in [False, True]:
+        fit_times = []
+        all_predictions = []
+        model = None
+        for i in range(TRAINING_WINDOW, len(months)):
+            train_rows = np.flatnonzero(np.isin(month_values, months[i - TRAINING_WINDOW:i]))
+            test_rows = np.flatnonzero(month_values == months[i])
+
+            start = time.perf_counter()
+            if warm and (i - TRAINING_WINDOW) % WARM_START_REFIT_EVERY != 0:
+                model = train_window(panel_dataset, train_rows, PARAMS,
+                                     init_model=model, num_boost_round=WARM_START_TREES)
+            else:
+                model = train_window(panel_dataset, train_rows, PARAMS)
+            fit_times.append(time.perf_counter() - start)
+
+            all_predictions.append(pd.DataFrame({
+                'ticker': df_train['ticker'].values[test_rows],
+                'month': months[i],
+                'predict': model.predict(X_panel[test_rows]),
+                'return': df_train['return'].values[test_rows],
+            }))
+
+        df_predict = pd.concat(all_predictions, ignore_index=True)
+        rank_ic = df_predict.groupby('month')[['predict', 'return']].corr(
+            method='spearman').xs('predict', level=1)['return'].mean()
+
+        df_analysis = pd.merge(df_predict, df_returns, on=['ticker', 'month'])
+        df_analysis['decile'] = df_analysis.groupby('month')['predict'].transform(
+            lambda x: pd.cut(x.rank(method='first'), bins=N_PORTFOLIOS,
+                             labels=range(1, N_PORTFOLIOS + 1))
+        )
+        spreads = df_analysis.groupby(['month', 'decile'], observed=True)['raw_return'].mean().unstack()
+        spread = (spreads[N_PORTFOLIOS] - spreads[1]).mean()
+
+        rows.append(summarize('warm start' if warm else 'full retrain', fit_times, {
+            'rank_ic': rank_ic, 'spread': spread, 'final_trees': model.num_trees()}))
+
+    print(pd.DataFrame(rows).set_index('mode').round(4).to_string())
+else:
+    print("data4.parquet not found, skipping data4 section")
+
+
+# ============================================================================
+# SECTION 2: PE MODEL (train_lightgbm_pe.py)
+# ============================================================================
+
+if os.path.exists('data3.parquet'):
+    print("\n" + "=" * 80)
+    print("PE MODEL: warm start vs full retrain")
+    print("=" * 80)
+
+    df = pd.read_parquet('data3.parquet')
+    df['month'] = pd.to_datetime(df['month'])
+    categorical_features = ['sector', 'industry', 'size']
+    numeric_features = [
+        'roe', 'roa', 'grossmargin', 'netmargin', 'assetturnover',
+        'equity_multiplier', 'payoutratio', 'gp_to_assets',
+        'revenue_5y_growth', 'netinc_5y_growth', 'eps_5y_growth',
+        'ebitda_5y_growth', 'assets_5y_growth', 'equity_5y_growth',
+        'debt_5y_growth', 'cashneq_5y_growth', 'ncfo_5y_growth',
+        'fcf_5y_growth', 'dps_5y_growth', 'payoutratio_5y_growth',
+        'assetturnover_5y_growth', 'equity_multiplier_5y_growth',
+        'gp_to_assets_5y_growth'
+    ]
+    all_features = categorical_features + numeric_features
+    df = df[df['pe'].notna() & (df['pe'] > 0)].dropna(subset=all_features).copy()
+
+    # Shared category codes so warm-started months are comparable
+    for col in categorical_features:
+        df[col] = df[col].astype('category')
+    months = sorted(df['month'].unique())
+
+    rows = []
+    for warm in [False, True]:
+        fit_times = []
+        abs_errors = []
+        model = None
+        for i in range(len(months) - 1):
+            train_data = df[df['month'] == months[i]]
+            test_data = df[df['month'] == months[i + 1]]
+            if len(train_data) < 100 or len(test_data) < 10:
+                continue
+
+            start = time.perf_counter()
+            if warm and model is not None and i % WARM_START_REFIT_EVERY != 0:
+                init_model = model.booster_
+                model = lgb.LGBMRegressor(n_estimators=PE_WARM_START_TREES, **PE_PARAMS)
+                model.fit(train_data[all_features], train_data['pe'],
+                          categorical_feature=categorical_features, init_model=init_model)
+            else:
+                model = lgb.LGBMRegressor(n_estimators=PE_TREES, **PE_PARAMS)
+                model.fit(train_data[all_features], train_data['pe'],
+                          categorical_feature=categorical_features)
+            fit_times.append(time.perf_counter() - start)
+
+            y_test = test_data['pe'].to_numpy()
+            y_pred = model.predict(test_data[all_features])
+            abs_errors.append(np.abs((y_pred - y_test) / y_test) * 100)
+
+        abs_errors = np.concatenate(abs_errors)
+        rows.append(summarize('warm start' if warm else 'full retrain', fit_times, {
+            'mape': abs_errors.mean(), 'median_ape': np.median(abs_errors),
+            'final_trees': model.booster_.num_trees()}))
+
+    print(pd.DataFrame(rows).set_index('mode').round(4).to_string())
+else:
+    print("data3.parquet not found, skipping PE section")
@@ -0,0 +1,131 @@
+"""
+================================================================================
+MODEL COMPARISON: LIGHTGBM VS NEURAL NETWORKS VS LINEAR ON SHARED SPLITS
+================================================================================
+
+PURPOSE:
+    Compares the model families used across the course material on exactly
+    the same data and walk-forward windows:
+    - LightGBM with the PARAMS of train_predict_data4.py
+    - MLPs with the hidden-layer architectures of session11C_traintest.ipynb
+      (one row per architecture), trained on the same ranked matrix
+    - The linear regression of analyze_model_features.ipynb
+    1. Ranks data4 once, as Step 1 of train_predict_data4.py
+    2. Writes the ranked matrix and period offsets once as memory-mapped files
+    3. Runs every model in parallel worker processes on the shared files
+    4. Scores all models the same way: rank IC, D10 - D1 spread of realised
+       returns, fit time and predict time
+
+INPUT FILE: data4.parquet
+
+OUTPUT FILES:
+    1. model_comparison.csv - One row per model
+    2. model_comparison_predict.parquet - (ticker, month, model, predict)
+
+USAGE:
+    python compare_models.py
+
+NOTES FOR AI:
+    - To add a model: append (name, family, config) to MODELS
+      (families: 'lightgbm', 'mlp', 'linear'; see utils/model_comparison.py)
+    - Rows without a realised return are dropped so every family trains on
+      the same rows
+    - The MLPs are not session11C's models: they see sector and size as
+      within-month ranks like every other family (not one-hot columns) and
+      train a fixed number of epochs per window (no early stopping)
+
+================================================================================
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from utils.model_comparison import write_shared, compare
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TRAINING_WINDOW = 12            # Months in each training window
+N_PORTFOLIOS = 10               # Number of portfolios (deciles)
+N_WORKERS = None                # Worker processes (None = all cores)
+CACHE_DIR = '.compare_cache'    # Shared memory-mapped arrays
+
+PARAMS = {
+    'num_leaves': 31,
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'n_estimators': 100,
+    'min_child_samples': 50,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'objective': 'regression',
+    'metric': 'rmse',
+    'boosting_type': 'gbdt',
+    'verbose': -1,
+    'random_state': 42,
+    'n_jobs': -1,
+}
+
+MLP_CONFIG = {'epochs': 20, 'warm_epochs': 5, 'refit_every': 12, 'batch_size': 256}
+
+MODELS = [
+    ('LightGBM', 'lightgbm', PARAMS),
+    ('MLP (20, 10)', 'mlp', {**MLP_CONFIG, 'hidden_layer_sizes': (20, 10)}),
+    ('MLP (50, 25, 10)', 'mlp', {**MLP_CONFIG, 'hidden_layer_sizes': (50, 25, 10)}),
+    ('Linear', 'linear', {}),
+]
+
+
+def main():
+    # ============================================================================
+    # STEP 1: RANK ONCE (same as train_predict_data4.py)
+    # ============================================================================
+
+    df_raw = pd.read_parquet('data4.parquet')
+    df = df_raw.drop(columns=['close']).copy()
+    df['raw_return'] = df['return']
+    cols_to_rank = [col for col in df.columns if col not in ['ticker', 'month', 'raw_return']]
+    for col in cols_to_rank:
+        df[col] = df.groupby('month')[col].rank(pct=True)
+    features = [col for col in cols_to_rank if col != 'return']
+
+    # Complete months with realised returns only
+    today = datetime.now()
+    df = df[(df['month'] < f"{today.year}-{today.month:02d}") & df['raw_return'].notna()]
+    df = df.sort_values(['month', 'ticker']).reset_index(drop=True)
+
+    month_values = df['month'].to_numpy()
+    months = pd.unique(month_values)
+    offsets = np.append(np.searchsorted(month_values, months), len(df))
+    print(f"Panel: {len(df):,} rows x {len(features)} features, {len(months)} months, "
+          f"{len(months) - TRAINING_WINDOW} windows")
+
+    # ============================================================================
+    # STEP 2: WRITE SHARED ARRAYS AND RUN ALL MODELS IN PARALLEL
+    # ============================================================================
+
+    paths = write_shared(df[features].to_numpy(dtype=np.float32), df['return'].to_numpy(),
+                         df['raw_return'].to_numpy(), offsets, CACHE_DIR)
+    table, predictions = compare(paths, MODELS, train_size=TRAINING_WINDOW,
+                                 n_workers=N_WORKERS, n_portfolios=N_PORTFOLIOS)
+
+    table.to_csv('model_comparison.csv')
+    oos = df.iloc[offsets[TRAINING_WINDOW]:][['ticker', 'month']]
+    df_predict = pd.concat([oos.assign(model=name, predict=p) for name, p in predictions.items()],
+                           ignore_index=True)
+    df_predict.to_parquet('model_comparison_predict.parquet', index=False)
+    print("\nSaved model_comparison.csv and model_comparison_predict.parquet")
+
+    print("\n" + "=" * 80)
+    print("MODEL COMPARISON (same walk-forward windows)")
+    print("=" * 80)
+    print(table.round(4).to_string())
+
+
+# Worker processes re-import this module, so the comparison only runs when the
+# script is executed directly
+if __name__ == '__main__':
+    main()
@@ -25,6 +25,9 @@ OUTPUT COLUMNS:
     - grossmargin: Gross margin (from SF1)
     - assetturnover: Asset turnover (from SF1)
     - leverage: Assets / Equity
+    - beta: Market beta from the prior RISK_WINDOW weeks of returns
+    - idio_vol: Annualized residual volatility vs. the FF5 factors (same window)
+    - total_vol: Annualized volatility of weekly excess returns (same window)
     - sector: Company sector classification
     - industry: Company industry classification
     - size: Market cap category (Mega/Large/Mid/Small/Micro/Nano-Cap)
@@ -34,6 +37,8 @@ DATA SOURCES:
     - DAILY table: End-of-month valuation metrics (marketcap, pb)
     - SF1 table: Annual fundamentals from 10-K filings (ARY dimension)
     - TICKERS table: Sector and industry classification
+    - SEP table: End-of-week prices (closeadj) for beta and volatility
+    - Ken French data library: Daily FF5 factors (cached in .factor_cache/)
 
 KEY METHODOLOGY:
     1. Monthly prices are filtered to end-of-month using window functions
@@ -43,6 +48,8 @@ KEY METHODOLOGY:
     5. Fundamentals forward-filled until next filing
     6. Size categories based on percentile cutoffs within each month
     7. Penny stocks (close < $5) filtered out
+    8. Beta, idio_vol and total_vol use weekly excess returns through the end
+       of the prior month (like close, marketcap and pb)
 
 FILTERS APPLIED:
     - All tickers (including delisted) to avoid look-ahead bias
@@ -63,6 +70,7 @@ MODIFICATION NOTES FOR AI:
     - To change size percentiles: Modify NANO_CUTOFF through LARGE_CUTOFF constants
     - To change price filter: Modify MINIMUM_PRICE constant
     - To add new daily metrics: Add to SQL query in Step 1b and merge logic
+    - To change the beta/volatility window: Modify RISK_WINDOW and RISK_MIN_WEEKS
 
 ================================================================================
 """
@@ -73,6 +81,8 @@ import numpy as np
 from dotenv import load_dotenv
 import os
 from datetime import datetime
+from utils.factor_data import load_daily_factors, compound, period_labels
+from utils.risk_features import rolling_risk
 
 # ============================================================================
 # CONFIGURATION
@@ -98,6 +108,10 @@ SMALL_CUTOFF = 51.46
 MID_CUTOFF = 78.60
 LARGE_CUTOFF = 98.53
 
+# Rolling beta and volatility (weekly returns)
+RISK_WINDOW = 52     # Weeks per window
+RISK_MIN_WEEKS = 26  # Fewest weekly returns a window needs
+
 # API Configuration
 API_URL = "https://data-portal.rice-business.org/api/query"
 BATCH_SIZE = 500  # Number of tickers per API query
@@ -360,6 +374,87 @@ df_monthly['pb'] = df_monthly.groupby('ticker')['pb'].shift(1)
 print("Lagged close, marketcap, and pb by 1 month")
 
 
+# ============================================================================
+# STEP 1e: ROLLING BETA AND VOLATILITY FROM WEEKLY RETURNS
+# ============================================================================
+
+print("\n" + "=" * 80)
+print("STEP 1e: Calculating rolling beta and volatility from weekly returns")
+print("=" * 80)
+
+all_weekly_data = []
+
+for batch_num, ticker_batch in enumerate(ticker_batches):
+    ticker_list = "'" + "','".join(ticker_batch) + "'"
+    print(f"\nBatch {batch_num + 1}/{len(ticker_batches)} ({len(ticker_batch)} tickers)")
+
+    for year in range(START_YEAR, current_year + 1):
+        # Last trading day of each (ISO) week
+        sql = f"""
+        WITH week_ends AS (
+            SELECT ticker, date::DATE as date, closeadj,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY ticker, DATE_TRUNC('week', date::DATE)
+                       ORDER BY date::DATE DESC
+                   ) as rn
+            FROM sep
+            WHERE ticker IN ({ticker_list})
+              AND date::DATE >= '{year}-01-01'
+              AND date::DATE < '{year + 1}-01-01'
+        )
+        SELECT ticker, date, closeadj
+        FROM week_ends
+        WHERE rn = 1
+        ORDER BY ticker, date
+        """
+
+        try:
+            df_year = execute_query(sql)
+            if not df_year.empty:
+                all_weekly_data.append(df_year)
+                print(f"  {year}: {len(df_year)} rows", end="")
+        except Exception as e:
+            print(f"  {year}: Error - {e}")
+        print("", flush=True)
+
+df_weekly = pd.concat(all_weekly_data, ignore_index=True)
+df_weekly['date'] = pd.to_datetime(df_weekly['date'], unit='s')
+# A week split across two yearly queries appears twice; keep its last day
+df_weekly['week'] = period_labels(df_weekly['date'], 'week')
+df_weekly = (df_weekly.sort_values(['ticker', 'date'])
+             .drop_duplicates(['ticker', 'week'], keep='last').reset_index(drop=True))
+df_weekly['return'] = df_weekly.groupby('ticker')['closeadj'].pct_change()
+
+# Weekly FF5 factors (decimals) on the same ISO week labels
+ff_daily = load_daily_factors()
+factor_names = ['Mkt-RF', 'SMB', 'HML', 'RMW', 'CMA']
+ff_daily[factor_names + ['RF']] = ff_daily[factor_names + ['RF']] / 100
+ff_weekly = compound(ff_daily, 'week', columns=factor_names + ['RF']).set_index('week')
+
+# Wide (week x ticker) excess returns, then moments over all tickers at once
+weekly_returns = df_weekly.pivot(index='week', columns='ticker', values='return').sort_index()
+weekly_excess = weekly_returns.sub(ff_weekly['RF'].reindex(weekly_returns.index), axis=0)
+df_risk = rolling_risk(weekly_excess, ff_weekly[factor_names], window=RISK_WINDOW,
+                       min_periods=RISK_MIN_WEEKS, periods_per_year=52)
+
+# Values as of the last week ending in a month are used in the FOLLOWING month
+week_end = df_weekly.groupby('week')['date'].max()
+df_risk['month'] = (pd.DatetimeIndex(week_end.reindex(df_risk['week']))
+                    + pd.offsets.MonthBegin(1)).strftime('%Y-%m')
+df_risk = df_risk.sort_values('week').drop_duplicates(['ticker', 'month'], keep='last')
+risk_columns = ['beta', 'idio_vol', 'total_vol']
+df_risk[risk_columns] = df_risk[risk_columns].round(4)
+
+df_monthly = pd.merge(
+    df_monthly,
+    df_risk[['ticker', 'month'] + risk_columns],
+    on=['ticker', 'month'],
+    how='left'
+)
+print(f"Beta and volatility for {df_risk['ticker'].nunique():,} tickers "
+      f"({RISK_WINDOW}-week window, {RISK_MIN_WEEKS}+ weeks)")
+
+
 # ============================================================================
 # STEP 2: FETCH SF1 FUNDAMENTALS
 # ============================================================================
@@ -548,6 +643,7 @@ final_columns = [
     'ticker', 'month', 'return', 'momentum', 'lagged_return',
     'close', 'marketcap', 'pb',
     'asset_growth', 'roe', 'gp_to_assets', 'grossmargin', 'assetturnover', 'leverage',
+    'beta', 'idio_vol', 'total_vol',
     'sector', 'industry', 'size'
 ]
 df_final = df_merged[final_columns].copy()
@@ -0,0 +1,41 @@
+"""
+================================================================================
+EXPORT SAVED LIGHTGBM MODELS TO LIGHTGBM'S NATIVE FORMAT
+================================================================================
+
+PURPOSE:
+    Converts the joblib pickles written by the training scripts into native
+    LightGBM text model files plus a JSON manifest (feature names and
+    categorical levels), which utils/native_scoring.py loads without sklearn
+    or unpickling:
+    1. data4_model.pkl -> data4_model.txt + data4_model.json
+    2. data5_model.pkl -> data5_model.txt + data5_model.json
+    3. lightGBM.pkl    -> lightGBM.txt    + lightGBM.json
+
+    Ensemble models (ENSEMBLE_SIZE > 1) are written as one file per member
+    ({name}_member{k}.txt) listed in the manifest.
+
+USAGE:
+    python export_native_models.py
+
+NOTES FOR AI:
+    - train_predict_data4.py / train_predict_data5.py already export their
+      model after saving the pickle; run this for older pickles
+    - Models whose pickle is missing are skipped
+    - See benchmark_native_scoring.py for cold-start and throughput numbers
+
+================================================================================
+"""
+
+import os
+import joblib
+from utils.native_scoring import export_native
+
+MODELS = ['data4_model', 'data5_model', 'lightGBM']
+
+for name in MODELS:
+    if not os.path.exists(f'{name}.pkl'):
+        print(f"{name}.pkl not found, skipping")
+        continue
+    manifest_path = export_native(joblib.load(f'{name}.pkl'), name)
+    print(f"Exported {name}.pkl -> {manifest_path}")
@@ -1,43 +1,23 @@
-import pandas as pd
-import pandas_datareader as pdr
-from datetime import datetime
+from utils.factor_data import load_daily_factors, compound, FACTORS
 
-# Fetch daily Fama-French 5 factors from Ken French's data library
+# Set True to download the daily factors again instead of using the local copy
+REFRESH = False
+
+# Fetch daily Fama-French 5 factors from Ken French's data library (cached
+# in .factor_cache after the first download)
 print("Fetching Fama-French 5 factor daily data...")
-ff5 = pdr.DataReader('F-F_Research_Data_5_Factors_2x3_daily', 'famafrench', start='1960-01-01')[0]
+ff5 = load_daily_factors(start='1960-01-01', refresh=REFRESH)
 
 # The data comes as percentages, convert to decimals for compounding
-ff5 = ff5 / 100
-
-# Reset index to have date as a column
-ff5 = ff5.reset_index()
-ff5.rename(columns={'Date': 'date'}, inplace=True)
-
-# Add ISO calendar year and week
-ff5['iso_year'] = ff5['date'].dt.isocalendar().year
-ff5['iso_week'] = ff5['date'].dt.isocalendar().week
-
-# Create week identifier in format 'YYYY-WW'
-ff5['week'] = ff5['iso_year'].astype(str) + '-' + ff5['iso_week'].astype(str).str.zfill(2)
+ff5[FACTORS] = ff5[FACTORS] / 100
 
-# Group by week and compound returns
+# Compound returns within each ISO week ('YYYY-WW'), all weeks at once
 # Formula: (1+r1)*(1+r2)*...*(1+rn) - 1
 print("Compounding returns to weekly frequency...")
-weekly = ff5.groupby('week').apply(
-    lambda x: pd.Series({
-        'Mkt-RF': (1 + x['Mkt-RF']).prod() - 1,
-        'SMB': (1 + x['SMB']).prod() - 1,
-        'HML': (1 + x['HML']).prod() - 1,
-        'RMW': (1 + x['RMW']).prod() - 1,
-        'CMA': (1 + x['CMA']).prod() - 1,
-        'RF': (1 + x['RF']).prod() - 1,
-        'start_date': x['date'].min(),
-        'end_date': x['date'].max()
-    })
-).reset_index()
+weekly = compound(ff5, 'week', columns=FACTORS)
 
 # Convert back to percentages for consistency with original format
-for col in ['Mkt-RF', 'SMB', 'HML', 'RMW', 'CMA', 'RF']:
+for col in FACTORS:
     weekly[col] = (weekly[col] * 100).round(4)
 
 print(f"\nCreated {len(weekly)} weekly observations")
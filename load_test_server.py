@@ -0,0 +1,122 @@
+"""
+================================================================================
+LOAD TEST FOR serve_predictions.py
+================================================================================
+
+PURPOSE:
+    Measures latency and throughput of a running prediction server under
+    concurrent clients:
+    1. GET /top, GET /ticker/<ticker> (served from the in-memory ranking)
+    2. POST /score with ROWS_PER_REQUEST feature rows (micro-batched)
+    For each endpoint and client count: requests per second and latency
+    percentiles (p50, p95, p99), plus how many predict calls the server's
+    micro-batcher needed for the /score requests.
+
+USAGE:
+    python serve_predictions.py        # in one terminal
+    python load_test_server.py         # in another
+
+NOTES FOR AI:
+    - Standard library only (threads + http.client with keep-alive off)
+    - /score rows are random percentile ranks with the server's feature count
+
+================================================================================
+"""
+
+import json
+import threading
+import time
+import http.client
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+HOST = '127.0.0.1'
+PORT = 8000
+CLIENTS = [1, 8, 32]            # Concurrent client threads
+REQUESTS_PER_CLIENT = 200       # Requests each client sends per test
+ROWS_PER_REQUEST = 10           # Feature rows per POST /score
+
+
+def request(method, path, body=None):
+    """Send one request and return (status, seconds)."""
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=30)
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status, time.perf_counter() - start
+
+
+def run_clients(n_clients, make_request):
+    """Latencies of every request and the wall time of the whole test."""
+    latencies = [[] for _ in range(n_clients)]
+    errors = [0] * n_clients
+
+    def client(k):
+        for i in range(REQUESTS_PER_CLIENT):
+            status, seconds = make_request(k, i)
+            latencies[k].append(seconds)
+            errors[k] += status != 200
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(n_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate(latencies), time.perf_counter() - start, sum(errors)
+
+
+def get_json(path):
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=30)
+    conn.request('GET', path)
+    payload = json.loads(conn.getresponse().read())
+    conn.close()
+    return payload
+
+
+health = get_json('/health')
+tickers = [row['ticker'] for row in get_json(f"/top?n={health['tickers']}")['predictions']]
+n_features = len(health['features'])
+print(f"Server: {health['model']} model, {health['tickers']:,} tickers, {n_features} features")
+
+rng = np.random.default_rng(0)
+bodies = [json.dumps({'rows': rng.uniform(size=(ROWS_PER_REQUEST, n_features)).tolist()})
+          for _ in range(64)]
+
+endpoints = {
+    'GET /top?n=10': lambda k, i: request('GET', '/top?n=10'),
+    'GET /ticker/<t>': lambda k, i: request('GET', f"/ticker/{tickers[(k * 7919 + i) % len(tickers)]}"),
+    'POST /score': lambda k, i: request('POST', '/score', bodies[(k + i) % len(bodies)]),
+}
+
+rows = []
+for name, make_request in endpoints.items():
+    for n_clients in CLIENTS:
+        before = get_json('/health')
+        latencies, wall, errors = run_clients(n_clients, make_request)
+        after = get_json('/health')
+        row = {
+            'endpoint': name, 'clients': n_clients, 'requests': len(latencies),
+            'errors': errors, 'req_per_s': len(latencies) / wall,
+            'p50_ms': np.percentile(latencies, 50) * 1000,
+            'p95_ms': np.percentile(latencies, 95) * 1000,
+            'p99_ms': np.percentile(latencies, 99) * 1000,
+        }
+        if name == 'POST /score':
+            batches = after['score_batches'] - before['score_batches']
+            row['requests_per_batch'] = len(latencies) / max(batches, 1)
+        rows.append(row)
+        print(f"{name:18s} {n_clients:3d} clients: {row['req_per_s']:8.1f} req/s, "
+              f"p50 {row['p50_ms']:.2f} ms, p99 {row['p99_ms']:.2f} ms")
+
+print("\n" + "=" * 80)
+print("LOAD TEST SUMMARY")
+print("=" * 80)
+print(pd.DataFrame(rows).set_index(['endpoint', 'clients']).round(2).to_string())
@@ -0,0 +1,131 @@
+"""
+================================================================================
+MEAN-VARIANCE PORTFOLIOS OF THE MODEL'S TOP-DECILE NAMES (data4, monthly)
+================================================================================
+
+PURPOSE:
+    Extends the two-asset problem of portfolio_optimization.ipynb to the
+    names the model ranks highest this month:
+    1. Takes the current month's predictions (data4_current.xlsx from
+       train_predict_data4.py) and selects the top decile (and the bottom
+       decile for the long-short portfolio)
+    2. Estimates the covariance (Ledoit-Wolf shrinkage, EWMA or PCA factor
+       model) from the names' last LOOKBACK months of returns in data4.parquet
+    3. Turns predictions into expected returns with the Grinold rule
+       alpha = IC x volatility x z-score of the prediction
+    4. Solves minimum-variance and mean-variance portfolios, long-only
+       (top decile) and dollar-neutral long-short (top and bottom deciles),
+       and sweeps the efficient frontier with warm starts
+
+INPUT FILES: data4_current.xlsx, data4.parquet
+
+OUTPUT FILES:
+    1. data4_optimal_weights.csv - (ticker, predict, decile, min_variance,
+       mean_variance, long_short) weights
+    2. data4_frontier.csv - Long-only frontier: gamma, expected_return,
+       volatility, sharpe (annualized)
+
+USAGE:
+    python optimize_top_decile.py
+
+NOTES FOR AI:
+    - IC is the assumed correlation between predictions and next-month
+      returns; it scales every expected return, so it moves the mean-variance
+      portfolios but not the minimum-variance one
+    - Names with fewer than MIN_MONTHS returns in the lookback are dropped
+    - COVARIANCE picks the estimator: 'ledoit_wolf', 'ewma' (HALFLIFE months)
+      or 'pca' (N_FACTORS principal components plus specific variances)
+
+================================================================================
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from utils.covariance import return_matrix, ledoit_wolf, ewma_covariance, pca_covariance
+from utils.optimizer import optimize, efficient_frontier, portfolio_stats
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+N_PORTFOLIOS = 10               # Deciles; the top one is held long
+LOOKBACK = 60                   # Months of returns for the covariance
+MIN_MONTHS = 24                 # Fewest returns a name needs in the lookback
+COVARIANCE = 'ledoit_wolf'      # 'ledoit_wolf', 'ewma' or 'pca'
+HALFLIFE = 12                   # EWMA halflife in months
+N_FACTORS = 10                  # Principal components of the PCA model
+IC = 0.05                       # Assumed information coefficient of the predictions
+GAMMA = 1.0                     # Return weight of the mean-variance portfolios
+MAX_WEIGHT = 0.05               # Largest absolute weight per name
+N_FRONTIER = 50                 # Points on the efficient frontier
+
+# ============================================================================
+# STEP 1: SELECT NAMES AND ESTIMATE THE COVARIANCE
+# ============================================================================
+
+df_current = pd.read_excel('data4_current.xlsx')
+df_raw = pd.read_parquet('data4.parquet')
+current_month = df_current['month'].dropna().max()
+
+# Deciles of this month's predictions (N_PORTFOLIOS = best)
+ranks = df_current['predict'].rank(method='first', pct=True)
+df_current['decile'] = np.ceil(ranks * N_PORTFOLIOS).astype(int)
+candidates = df_current[df_current['decile'].isin([1, N_PORTFOLIOS])]
+
+# History before the current month only
+returns = return_matrix(df_raw[df_raw['month'] < current_month], 'month', candidates['ticker'],
+                        lookback=LOOKBACK, min_periods=MIN_MONTHS)
+if COVARIANCE == 'ledoit_wolf':
+    cov, shrinkage = ledoit_wolf(returns)
+    detail = f"Ledoit-Wolf shrinkage {shrinkage:.2f}"
+elif COVARIANCE == 'ewma':
+    cov = ewma_covariance(returns, halflife=HALFLIFE)
+    detail = f"EWMA halflife {HALFLIFE} months"
+else:
+    cov = pca_covariance(returns, n_factors=N_FACTORS)
+    detail = f"{N_FACTORS}-factor PCA model"
+print(f"{len(cov)} names with {MIN_MONTHS}+ months of returns; {detail}")
+
+# ============================================================================
+# STEP 2: EXPECTED RETURNS FROM PREDICTIONS
+# ============================================================================
+
+names = candidates.set_index('ticker').loc[cov.index]
+z = (names['predict'] - names['predict'].mean()) / names['predict'].std()
+mu = IC * np.sqrt(np.diag(cov)) * z.to_numpy()
+mu = pd.Series(mu, index=cov.index)
+long_names = names.index[names['decile'] == N_PORTFOLIOS]
+
+# ============================================================================
+# STEP 3: OPTIMAL PORTFOLIOS AND FRONTIER
+# ============================================================================
+
+start = time.perf_counter()
+long_cov = cov.loc[long_names, long_names]
+min_variance = optimize(None, long_cov, gamma=0.0, max_weight=MAX_WEIGHT)
+mean_variance = optimize(mu[long_names], long_cov, gamma=GAMMA, max_weight=MAX_WEIGHT,
+                         w0=min_variance)
+long_short = optimize(mu, cov, gamma=GAMMA, long_only=False, max_weight=MAX_WEIGHT,
+                      budget=0.0)
+frontier, _ = efficient_frontier(mu[long_names], long_cov, n_points=N_FRONTIER,
+                                 max_weight=MAX_WEIGHT)
+print(f"Solved 3 portfolios and a {N_FRONTIER}-point frontier in "
+      f"{time.perf_counter() - start:.2f}s")
+
+weights = names[['predict', 'decile']].copy()
+weights['min_variance'] = min_variance.reindex(weights.index).fillna(0.0)
+weights['mean_variance'] = mean_variance.reindex(weights.index).fillna(0.0)
+weights['long_short'] = long_short
+weights.sort_values('predict', ascending=False).to_csv('data4_optimal_weights.csv')
+frontier.to_csv('data4_frontier.csv', index=False)
+print("Saved data4_optimal_weights.csv and data4_frontier.csv")
+
+print("\n" + "=" * 80)
+print(f"PORTFOLIOS FOR {current_month} (annualized, IC = {IC})")
+print("=" * 80)
+for name in ['min_variance', 'mean_variance', 'long_short']:
+    expected, volatility, sharpe = portfolio_stats(weights[name], mu, cov)
+    held = (weights[name].abs() > 1e-6).sum()
+    print(f"{name:15s} names {held:4d} | expected {expected:7.2%} | "
+          f"volatility {volatility:7.2%} | ratio {sharpe:5.2f}")
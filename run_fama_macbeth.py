@@ -0,0 +1,76 @@
+"""
+================================================================================
+FAMA-MACBETH REGRESSIONS OF RETURNS ON RANKED CHARACTERISTICS
+================================================================================
+
+PURPOSE:
+    Extends the single-snapshot LinearRegression of analyze_model_features.ipynb
+    (regression_coefficients.png) to the whole panel:
+    1. Percentile-ranks every characteristic within each period (as Step 1 of
+       train_predict_data4.py / train_predict_data5.py)
+    2. Regresses the raw return on the ranked characteristics in every period,
+       all periods solved at once (utils/fama_macbeth.py)
+    3. Reports the time-series mean of each coefficient with its t-statistic
+
+INPUT FILE: data4.parquet (monthly) or data5.parquet (weekly), see DATASET
+
+OUTPUT FILES:
+    1. {DATASET}_fama_macbeth.csv - Per term: mean, std_error, t_stat, p_value, n_periods
+    2. {DATASET}_fama_macbeth_periods.csv - Per period: coefficients, nobs, R²
+
+USAGE:
+    python run_fama_macbeth.py
+
+NOTES FOR AI:
+    - A coefficient is the return spread between the highest- and lowest-ranked
+      stocks (ranks run from 0 to 1), holding the other characteristics fixed
+    - Missing ranks are set to 0.5 (the median rank); rows without a return
+      (e.g. the current period) are dropped
+
+================================================================================
+"""
+
+import time
+import pandas as pd
+from utils.fama_macbeth import fama_macbeth
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATASET = 'data4'               # 'data4' (monthly) or 'data5' (weekly)
+NW_LAGS = 6                     # Newey-West lags for the t-statistics (None = plain)
+FILL_VALUE = 0.5                # Missing ranks (None = drop incomplete rows)
+
+PERIOD_COL = 'month' if DATASET == 'data4' else 'week'
+
+# ============================================================================
+# STEP 1: RANK CHARACTERISTICS WITHIN EACH PERIOD
+# ============================================================================
+
+df_raw = pd.read_parquet(f'{DATASET}.parquet')
+df = df_raw.drop(columns=['close']).copy()
+features = [col for col in df.columns if col not in ['ticker', PERIOD_COL, 'return']]
+for col in features:
+    df[col] = df.groupby(PERIOD_COL)[col].rank(pct=True)
+print(f"Loaded {DATASET}.parquet: {len(df):,} rows, {len(features)} characteristics")
+
+# ============================================================================
+# STEP 2: CROSS-SECTIONAL REGRESSIONS AND TIME-SERIES AVERAGES
+# ============================================================================
+
+start = time.perf_counter()
+summary, coefficients = fama_macbeth(df, PERIOD_COL, features, 'return',
+                                     lags=NW_LAGS, fill_value=FILL_VALUE)
+elapsed = time.perf_counter() - start
+
+summary.to_csv(f'{DATASET}_fama_macbeth.csv')
+coefficients.to_csv(f'{DATASET}_fama_macbeth_periods.csv')
+print(f"Solved {len(coefficients)} cross-sections in {elapsed:.3f}s")
+print(f"Saved {DATASET}_fama_macbeth.csv and {DATASET}_fama_macbeth_periods.csv")
+
+print("\n" + "=" * 80)
+print("FAMA-MACBETH COEFFICIENTS (time-series means)")
+print(f"Average cross-sectional R²: {coefficients['rsquared'].mean():.4f}")
+print("=" * 80)
+print(summary.sort_values('t_stat', ascending=False).round(4).to_string())
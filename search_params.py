@@ -0,0 +1,137 @@
+"""
+================================================================================
+WALK-FORWARD HYPERPARAMETER SEARCH FOR THE LIGHTGBM RETURN MODELS
+================================================================================
+
+PURPOSE:
+    Evaluates alternative LightGBM PARAMS for train_predict_data4.py (monthly)
+    or train_predict_data5.py (weekly) on the same walk-forward splits those
+    pipelines use, without rerunning the serial pipeline per setting:
+    1. Ranks features exactly as Step 1 of the chosen pipeline
+    2. Scores every configuration on the first windows, keeps the best 1/ETA,
+       and repeats on ETA times as many windows (successive halving)
+    3. Runs window evaluations in parallel processes sharing one binned dataset
+
+INPUT FILE: data4.parquet or data5.parquet (see DATASET)
+
+OUTPUT FILES:
+    1. {DATASET}_param_search.csv - Leaderboard (one row per configuration)
+    2. {DATASET}_param_search_windows.csv - Per-window metrics and timings
+
+USAGE:
+    python search_params.py
+
+NOTES FOR AI:
+    - To search the weekly pipeline: set DATASET = 'data5'
+    - To change the search space: modify SEARCH_SPACE (booster params only;
+      dataset params such as max_bin are fixed by the first configuration)
+    - METRIC is 'rank_ic' or 'spread' (D10 - D1 of realised returns)
+
+================================================================================
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from utils.walk_forward import WalkForward
+from utils.param_search import expand_grid, search
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATASET = 'data4'               # 'data4' (monthly) or 'data5' (weekly)
+METRIC = 'rank_ic'              # Ranking metric: 'rank_ic' or 'spread'
+FIRST_WINDOWS = 12              # Windows every configuration is evaluated on
+ETA = 3                         # Keep the best 1/ETA configurations per rung
+N_WORKERS = None                # Worker processes (None = all cores)
+
+# Baseline parameters (same as PARAMS in the training scripts)
+PARAMS = {
+    'num_leaves': 31,
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'n_estimators': 100,
+    'min_child_samples': 50,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'objective': 'regression',
+    'metric': 'rmse',
+    'boosting_type': 'gbdt',
+    'verbose': -1,
+    'random_state': 42,
+    'n_jobs': -1,
+}
+
+# Values to try (every combination is a configuration)
+SEARCH_SPACE = {
+    'num_leaves': [15, 31, 63],
+    'learning_rate': [0.02, 0.05, 0.1],
+    'min_child_samples': [50, 200, 1000],
+    'colsample_bytree': [0.5, 0.8],
+}
+
+
+def main():
+    # ============================================================================
+    # STEP 1: RANK FEATURES (same as the chosen pipeline)
+    # ============================================================================
+
+    period = 'month' if DATASET == 'data4' else 'week'
+    df_raw = pd.read_parquet(f'{DATASET}.parquet')
+    print(f"Loaded {DATASET}.parquet: {len(df_raw):,} rows")
+
+    df_train = df_raw.drop(columns=['close']).copy()
+    df_train['raw_return'] = df_train['return']
+    if DATASET == 'data4':
+        cols_to_rank = [col for col in df_train.columns if col not in ['ticker', 'month', 'raw_return']]
+        features = [col for col in cols_to_rank if col != 'return']
+        today = datetime.now()
+        cutoff = f"{today.year}-{today.month:02d}"
+        train_size, step = 12, 1
+    else:
+        cols_to_rank = [col for col in df_train.columns
+                        if col not in ['ticker', 'week', 'return', 'raw_return']
+                        and df_train[col].dtype in ['float64', 'int64']]
+        features = [col for col in df_train.columns
+                    if col not in ['ticker', 'week', 'return', 'raw_return',
+                                   'sector', 'industry', 'size']]
+        current_iso = datetime.now().isocalendar()
+        cutoff = f"{current_iso[0]}-{current_iso[1]:02d}"
+        train_size, step = 52, 8
+
+    for col in cols_to_rank:
+        df_train[col] = df_train.groupby(period)[col].rank(pct=True)
+    df_train = df_train.sort_values([period, 'ticker']).reset_index(drop=True)
+
+    # ============================================================================
+    # STEP 2: SUCCESSIVE-HALVING SEARCH
+    # ============================================================================
+
+    wf = WalkForward(df_train, period, features, 'return')
+    n_complete = int(np.sum(wf.periods < cutoff))
+    configs = expand_grid(PARAMS, SEARCH_SPACE)
+    print(f"Searching {len(configs)} configurations on "
+          f"{len(list(wf.windows(train_size, step, end=n_complete)))} walk-forward windows")
+
+    leaderboard, windows = search(wf, configs, df_train['raw_return'].to_numpy(),
+                                  train_size=train_size, step=step, end=n_complete,
+                                  metric=METRIC, first_windows=FIRST_WINDOWS, eta=ETA,
+                                  n_workers=N_WORKERS)
+
+    leaderboard.to_csv(f'{DATASET}_param_search.csv')
+    windows.to_csv(f'{DATASET}_param_search_windows.csv', index=False)
+    print(f"\nSaved {DATASET}_param_search.csv and {DATASET}_param_search_windows.csv")
+
+    print("\n" + "=" * 80)
+    print("LEADERBOARD (top 10)")
+    print("=" * 80)
+    print(leaderboard.head(10).round(4).to_string())
+
+
+# Worker processes re-import this module, so the search only runs when the
+# script is executed directly
+if __name__ == '__main__':
+    main()
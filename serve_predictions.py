@@ -0,0 +1,144 @@
+"""
+================================================================================
+HTTP SERVICE FOR CURRENT-PERIOD STOCK PREDICTIONS
+================================================================================
+
+PURPOSE:
+    Serves the latest trained return model on demand instead of through
+    data4_current.xlsx / data5_current.xlsx:
+    1. Loads the native model and the ranked current-period feature snapshot
+       once at startup and scores the whole snapshot in memory
+    2. Answers top-N, bottom-N and per-ticker queries from that ranking
+    3. Scores posted feature rows, micro-batching concurrent requests into
+       shared predict calls
+    4. Hot-reloads when the training script writes a new model manifest
+       (saved after the snapshot, so both are complete)
+
+INPUT FILES (written by train_predict_data4.py / train_predict_data5.py):
+    1. {MODEL}_model.json (+ .txt) - Native model (see export_native_models.py)
+    2. {MODEL}_current.npy (+ _tickers.npy) - Ranked current features
+
+ENDPOINTS:
+    GET  /top?n=10           Highest predictions, best first
+    GET  /bottom?n=10        Lowest predictions, worst first
+    GET  /ticker/AAPL        Prediction and rank of one ticker
+    POST /score              {"rows": [[...], ...]} ranked feature rows in
+                             /health "features" order -> {"predict": [...]}
+    GET  /health             Model info, reload and batching counters
+
+USAGE:
+    python serve_predictions.py
+    curl 'http://127.0.0.1:8000/top?n=5'
+
+NOTES FOR AI:
+    - To serve the weekly model: set MODEL = 'data5'
+    - Latency/throughput under load: python load_test_server.py
+    - MAX_WAIT_MS trades single-request latency for batching under load
+
+================================================================================
+"""
+
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from utils.serving import ModelStore, MicroBatcher
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MODEL = 'data4'                 # 'data4' (monthly) or 'data5' (weekly)
+HOST = '127.0.0.1'
+PORT = 8000
+RELOAD_SECONDS = 5.0            # Check for a new model manifest every N seconds
+MAX_BATCH = 4096                # Rows per micro-batched predict call
+MAX_WAIT_MS = 2.0               # Wait for more requests after the first (ms)
+DEFAULT_N = 10                  # Rows returned by /top and /bottom without ?n=
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """Routes requests to the shared ModelStore and MicroBatcher."""
+
+    store = None
+    batcher = None
+    started = time.time()
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            n = int(query.get('n', [DEFAULT_N])[0])
+        except ValueError:
+            return self._send(400, {'error': 'n must be an integer'})
+        if n < 0:
+            return self._send(400, {'error': 'n must be non-negative'})
+
+        if parts == ['top']:
+            return self._send(200, {'predictions': self.store.top(n)})
+        if parts == ['bottom']:
+            return self._send(200, {'predictions': self.store.bottom(n)})
+        if len(parts) == 2 and parts[0] == 'ticker':
+            row = self.store.ticker(parts[1].upper())
+            if row is None:
+                return self._send(404, {'error': f"{parts[1]} is not in the snapshot"})
+            return self._send(200, row)
+        if parts == ['health']:
+            state = self.store.state
+            return self._send(200, {
+                'model': MODEL,
+                'tickers': len(state.tickers),
+                'features': state.scorer.features,
+                'loaded_at': state.loaded_at,
+                'reloads': self.store.reloads,
+                'score_requests': self.batcher.requests,
+                'score_batches': self.batcher.batches,
+                'uptime_s': time.time() - self.started,
+            })
+        return self._send(404, {'error': f"unknown endpoint {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/score':
+            return self._send(404, {'error': f"unknown endpoint {self.path}"})
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            future = self.batcher.submit(json.loads(self.rfile.read(length))['rows'])
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {'error': f"bad request: {e}"})
+        try:
+            predictions = future.result()
+        except Exception as e:
+            return self._send(500, {'error': f"prediction failed: {e}"})
+        return self._send(200, {'predict': predictions.tolist()})
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate latency under load
+        pass
+
+
+def main():
+    store = ModelStore(f'{MODEL}_model.json', f'{MODEL}_current', reload_seconds=RELOAD_SECONDS)
+    PredictionHandler.store = store
+    PredictionHandler.batcher = MicroBatcher(store, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS)
+
+    server = ThreadingHTTPServer((HOST, PORT), PredictionHandler)
+    print(f"Serving {MODEL} predictions for {len(store.state.tickers):,} tickers "
+          f"on http://{HOST}:{PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
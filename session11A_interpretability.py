@@ -69,6 +69,8 @@ import seaborn as sns
 import joblib
 import shap
 import warnings
+from utils.shap_cache import ShapCache, model_hash, data_hash, to_explanation
+from utils.partial_dependence import partial_dependence, pdp_frame
 warnings.filterwarnings('ignore')
 
 # Set style
@@ -212,15 +214,19 @@ else:
 # In[ ]:
 
 
-# Create SHAP explainer
-# Use a sample of data for faster computation
-sample_size = min(1000, len(df))
-X_sample = X.sample(n=sample_size, random_state=42)
+# Exact TreeSHAP for every stock in the cross-section, computed in chunks and
+# cached as float32 Parquet keyed by (model hash, month, data hash): rerunning
+# this notebook with the same model and data reads the values from disk
+# (in-process: this script has no __main__ guard for worker processes, which
+# re-run the whole script on spawn platforms such as Windows and macOS)
+shap_cache = ShapCache('shap_cache')
+period = str(df['month'].iloc[0])
 
-print(f"Creating SHAP explainer with {sample_size} samples...")
-explainer = shap.TreeExplainer(model)
-shap_values = explainer(X_sample)
-print("SHAP values computed!")
+print(f"Computing SHAP values for all {len(X):,} stocks (cached per model, month and data)...")
+shap_frame = shap_cache.get(model, X, period, ids=df['ticker'], n_workers=1)
+shap_values = to_explanation(shap_frame, X)
+shap_path = shap_cache.path(model_hash(model), period, data_hash(X, df['ticker']))
+print(f"SHAP values ready: {shap_path}")
 
 
 # ### Global Feature Importance
@@ -231,7 +237,7 @@ print("SHAP values computed!")
 
 
 # Summary plot - shows feature importance and effect direction
-shap.summary_plot(shap_values, X_sample, plot_type="bar", max_display=13)
+shap.summary_plot(shap_values, X, plot_type="bar", max_display=13)
 plt.title('Global Feature Importance (Mean |SHAP value|)', fontweight='bold')
 plt.tight_layout()
 plt.show()
@@ -241,7 +247,7 @@ plt.show()
 
 
 # Detailed summary plot - shows feature values and their effects
-shap.summary_plot(shap_values, X_sample, max_display=13)
+shap.summary_plot(shap_values, X, max_display=13)
 plt.title('Feature Effects on Predictions', fontweight='bold', pad=20)
 plt.tight_layout()
 plt.show()
@@ -279,12 +285,11 @@ for feat in numeric_features[:5]:
 # In[ ]:
 
 
-# Get SHAP values for this specific stock
-stock_X = X.loc[idx:idx]
-stock_shap = explainer(stock_X)
+# Get SHAP values for this specific stock (from the cached cross-section)
+stock_shap = shap_values[df.index.get_loc(idx)]
 
 # Waterfall plot - shows how each feature contributes to this prediction
-shap.plots.waterfall(stock_shap[0], max_display=13)
+shap.plots.waterfall(stock_shap, max_display=13)
 plt.title(f'Feature Contributions for {stock_data["ticker"]}', fontweight='bold')
 plt.tight_layout()
 plt.show()
@@ -304,7 +309,7 @@ print("- The prediction is: base value + sum of all feature contributions")
 
 
 # Dependence plot for momentum
-shap.dependence_plot('momentum', shap_values.values, X_sample, interaction_index=None)
+shap.dependence_plot('momentum', shap_values.values, X, interaction_index=None)
 plt.title('Effect of Momentum on Predictions', fontweight='bold')
 plt.tight_layout()
 plt.show()
@@ -319,12 +324,45 @@ print("- Shows relationship between momentum and its effect on predicted returns
 
 
 # Dependence plot for another key feature
-shap.dependence_plot('roe', shap_values.values, X_sample, interaction_index=None)
+shap.dependence_plot('roe', shap_values.values, X, interaction_index=None)
 plt.title('Effect of ROE on Predictions', fontweight='bold')
 plt.tight_layout()
 plt.show()
 
 
+# ### Partial Dependence and ICE Curves: All Features
+# 
+# A partial-dependence curve shows the average prediction when one feature is set to each value on a grid (all other features as observed); the thin ICE lines show the same curve for individual stocks.
+
+# In[ ]:
+
+
+# All features x grid values are scored in one stacked, batched predict call
+# and cached per model and cross-section
+curves = partial_dependence(model, X[feature_cols], grid_size=20)
+print(pdp_frame(curves).groupby('feature')['pdp'].agg(['min', 'max']).assign(
+    range=lambda t: t['max'] - t['min']).sort_values('range', ascending=False).round(4))
+
+plot_features = [f for f in feature_cols if f not in categorical_features]
+n_cols = 4
+n_rows = int(np.ceil(len(plot_features) / n_cols))
+fig, axes = plt.subplots(n_rows, n_cols, figsize=(16, 3.5 * n_rows), squeeze=False)
+rng = np.random.default_rng(42)
+for ax, feature in zip(axes.flat, plot_features):
+    curve = curves[feature]
+    ice_rows = rng.choice(len(curve['ice']), size=min(100, len(curve['ice'])), replace=False)
+    ax.plot(curve['grid'], curve['ice'][ice_rows].T, color='steelblue', alpha=0.08, linewidth=0.8)
+    ax.plot(curve['grid'], curve['pdp'], color='red', linewidth=2, label='PDP')
+    ax.set_title(feature, fontweight='bold')
+    ax.set_xlabel('Feature value (ranked)')
+    ax.set_ylabel('Prediction')
+for ax in axes.flat[len(plot_features):]:
+    ax.axis('off')
+plt.suptitle('Partial Dependence (red) and ICE Curves (blue)', fontweight='bold')
+plt.tight_layout()
+plt.show()
+
+
 # ## Summary
 # 
 # **Categorical Variables:**
@@ -1,30 +1,54 @@
 """
 LightGBM model for predicting PE ratios with monthly retraining.
 Uses percentage errors instead of absolute errors.
+
+Each month's model is trained on that month only and predicts the next
+month. Months are independent, so they are trained in parallel threads
+(PARALLEL_MONTHS) on contiguous row ranges from utils/walk_forward.py, and
+MAPE/RMSE are computed for all months at once after training.
+
+Set OBJECTIVE = 'percentage' to minimize squared percentage errors: this is
+the built-in L2 objective with precomputed weights 2 / pe^2, which gives the
+same gradients and hessians as a custom percentage-error objective without a
+Python callback per boosting iteration.
+
+Set WARM_START = True to continue boosting the previous month's model with a
+few extra trees instead of training 500 trees from scratch every month
+(see benchmark_warm_start.py for the accuracy/speed trade-off). Warm-started
+months depend on each other, so they are trained sequentially.
 """
 
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 import lightgbm as lgb
-from sklearn.metrics import mean_squared_error, mean_absolute_percentage_error
+from utils.walk_forward import WalkForward
 
-# Custom objective function for percentage errors
-def percentage_error_objective(y_true, y_pred):
-    """
-    Custom objective function that minimizes squared percentage errors.
-    This penalizes relative errors rather than absolute errors.
-    """
-    grad = 2 * (y_pred - y_true) / (y_true ** 2)
-    hess = 2 / (y_true ** 2)
-    return grad, hess
+# Training objective
+OBJECTIVE = 'regression'        # 'regression' (squared error) or 'percentage'
+                                # (squared percentage error via 2 / pe^2 weights)
+N_TREES = 500                   # Trees per monthly model
+PARALLEL_MONTHS = None          # Months trained at once (None = all cores, 1 = serial)
 
-def feval_mape(y_pred, train_data):
+# Warm-start mode
+WARM_START = False              # Continue boosting the previous month's model
+WARM_START_TREES = 50           # Extra trees added per warm-started month
+WARM_START_REFIT_EVERY = 12     # Full retrain every N months to bound model size
+
+
+def percentage_error_weights(y_true):
     """
-    Custom evaluation metric: Mean Absolute Percentage Error
+    Sample weights that turn the built-in L2 objective into squared percentage error.
+
+    For loss (y_pred - y_true)^2 / y_true^2 the gradient is
+    2 * (y_pred - y_true) / y_true^2 and the hessian is 2 / y_true^2, which is
+    exactly weighted L2 with weight 2 / y_true^2. The weights are computed once
+    instead of on every boosting iteration.
     """
-    y_true = train_data.get_label()
-    mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
-    return 'mape', mape, False
+    return 2 / (y_true ** 2)
+
 
 # Read data
 print("Loading data...")
@@ -56,8 +80,18 @@ df = df.dropna(subset=all_features)
 print(f"Data shape after cleaning: {df.shape}")
 print(f"Date range: {df['month'].min()} to {df['month'].max()}")
 
+# Group rows by month, keeping the file's row order within each month (the
+# order LightGBM's bagging samples from), and code each categorical column
+# against its globally sorted categories
+df = df.sort_values('month', kind='stable').reset_index(drop=True)
+for col in categorical_features:
+    df[col] = df[col].astype('category').cat.codes
+
+wf = WalkForward(df, 'month', all_features, 'pe', dtype=np.float64)
+categorical_idx = [all_features.index(col) for col in categorical_features]
+
 # Get sorted list of months
-months = sorted(df['month'].unique())
+months = list(pd.to_datetime(wf.periods))
 print(f"Number of months: {len(months)}")
 
 # LightGBM parameters optimized for percentage errors
@@ -77,83 +111,117 @@ params = {
     'n_jobs': -1,
     'random_state': 42
 }
+if OBJECTIVE == 'percentage':
+    # A custom objective starts boosting from 0, not from the (weighted) mean
+    params['boost_from_average'] = False
+weights = percentage_error_weights(wf.y) if OBJECTIVE == 'percentage' else None
+
+
+def month_features(train_rows, test_rows):
+    """
+    Feature matrices of a train month and its test month.
 
-# Store results
-results = []
+    Categorical codes are re-based on the categories present in the train
+    month, as converting each month's columns to category dtype does; test
+    categories unseen in training become NaN. Warm-started models share
+    the global codes instead, so they agree across months.
+    """
+    X_train = wf.X[train_rows].copy()
+    X_test = wf.X[test_rows].copy()
+    if WARM_START:
+        return X_train, X_test
+    for j in categorical_idx:
+        present = np.unique(X_train[:, j])
+        X_train[:, j] = np.searchsorted(present, X_train[:, j])
+        local = np.searchsorted(present, X_test[:, j])
+        known = present[np.minimum(local, len(present) - 1)] == X_test[:, j]
+        X_test[:, j] = np.where(known, local, np.nan)
+    return X_train, X_test
+
+
+def fit_month(i, num_threads, init_model=None, num_boost_round=N_TREES):
+    """Train on month i and predict month i + 1; returns (model, predictions, fit seconds)."""
+    train_rows, test_rows = wf.rows(i, i + 1), wf.rows(i + 1, i + 2)
+    X_train, X_test = month_features(train_rows, test_rows)
+    month_params = {**params, 'n_jobs': num_threads}
+
+    start = time.perf_counter()
+    train_set = lgb.Dataset(X_train, label=wf.y[train_rows],
+                            weight=None if weights is None else weights[train_rows],
+                            feature_name=all_features, categorical_feature=categorical_features,
+                            params=month_params)
+    model = lgb.train(month_params, train_set, num_boost_round=num_boost_round,
+                      init_model=init_model)
+    fit_time = time.perf_counter() - start
+    return model, model.predict(X_test), fit_time
+
+
+# Months with enough data to train and evaluate
+counts = np.diff(wf.offsets)
+eligible = []
+for i in range(len(months) - 1):
+    if counts[i] < 100 or counts[i + 1] < 10:
+        print(f"Skipping {months[i].strftime('%Y-%m')}: insufficient data")
+    else:
+        eligible.append(i)
 
-# Loop over months for training and prediction
 print("\nStarting monthly training and prediction...")
 print("=" * 80)
 
-for i in range(len(months) - 1):
-    train_month = months[i]
-    test_month = months[i + 1]
-
-    # Get training data (current month)
-    train_data = df[df['month'] == train_month].copy()
-
-    # Get test data (next month)
-    test_data = df[df['month'] == test_month].copy()
-
-    if len(train_data) < 100 or len(test_data) < 10:
-        print(f"Skipping {train_month.strftime('%Y-%m')}: insufficient data")
-        continue
-
-    # Prepare features and target
-    X_train = train_data[all_features].copy()
-    y_train = train_data['pe']
-
-    X_test = test_data[all_features].copy()
-    y_test = test_data['pe']
-
-    # Convert categorical features to category dtype
-    for col in categorical_features:
-        X_train[col] = X_train[col].astype('category')
-        X_test[col] = X_test[col].astype('category')
-
-    # Train model
-    print(f"Training model for {train_month.strftime('%Y-%m')}...", end=" ", flush=True)
-    model = lgb.LGBMRegressor(n_estimators=500, **params)
-
-    model.fit(
-        X_train,
-        y_train,
-        categorical_feature=categorical_features
-    )
-    print(f"Completed training for month {train_month.strftime('%Y-%m')}")
-
-    # Make predictions
-    print(f"Predicting for {test_month.strftime('%Y-%m')}...", end=" ", flush=True)
-    y_pred = model.predict(X_test)
-    print(f"Completed predicting for month {test_month.strftime('%Y-%m')}")
-
-    # Calculate percentage errors
-    percentage_errors = ((y_pred - y_test) / y_test) * 100
-
-    # Calculate metrics
-    mape = np.mean(np.abs(percentage_errors))
-    rmse_pct = np.sqrt(np.mean(percentage_errors ** 2))
-
-    # Store results for each prediction
-    month_results = pd.DataFrame({
-        'ticker': test_data['ticker'].values,
-        'train_month': train_month,
-        'test_month': test_month,
-        'actual_pe': y_test.values,
-        'predicted_pe': y_pred,
-        'percentage_error': percentage_errors.values
-    })
-
-    results.append(month_results)
-
-    print(f"Results: Train {train_month.strftime('%Y-%m')} ({len(train_data):5d} obs) -> "
-          f"Test {test_month.strftime('%Y-%m')} ({len(test_data):5d} obs) | "
-          f"MAPE: {mape:6.2f}% | RMSE(pct): {rmse_pct:6.2f}%")
+predictions = {}
+fit_times = {}
+if WARM_START:
+    # Each month continues the previous model, so months run in order
+    model = None
+    months_since_refit = 0
+    for i in eligible:
+        if model is not None and months_since_refit < WARM_START_REFIT_EVERY:
+            model, predictions[i], fit_times[i] = fit_month(i, -1, init_model=model,
+                                                            num_boost_round=WARM_START_TREES)
+            months_since_refit += 1
+        else:
+            model, predictions[i], fit_times[i] = fit_month(i, -1)
+            months_since_refit = 1
+else:
+    # Independent months train concurrently (LightGBM releases the GIL) with
+    # the cores split between them
+    n_parallel = min(PARALLEL_MONTHS or os.cpu_count() or 1, max(len(eligible), 1))
+    num_threads = -1 if n_parallel == 1 else max(1, (os.cpu_count() or 1) // n_parallel)
+    print(f"Training {len(eligible)} months, {n_parallel} at a time")
+    with ThreadPoolExecutor(max_workers=n_parallel) as pool:
+        futures = {i: pool.submit(fit_month, i, num_threads) for i in eligible}
+        for i, future in futures.items():
+            _, predictions[i], fit_times[i] = future.result()
+            print(f"Completed training for month {months[i].strftime('%Y-%m')}")
+
+# Percentage errors for every test row at once
+test_rows = np.concatenate([np.arange(wf.offsets[i + 1], wf.offsets[i + 2]) for i in eligible])
+train_month_idx = np.concatenate([np.full(counts[i + 1], i) for i in eligible])
+y_pred = np.concatenate([predictions[i] for i in eligible])
+y_test = wf.y[test_rows]
+percentage_errors = ((y_pred - y_test) / y_test) * 100
+
+# Per-month MAPE and RMSE(pct) from grouped sums
+month_pos = np.searchsorted(eligible, train_month_idx)
+n_test = np.bincount(month_pos, minlength=len(eligible))
+mape = np.bincount(month_pos, np.abs(percentage_errors), len(eligible)) / n_test
+rmse_pct = np.sqrt(np.bincount(month_pos, percentage_errors ** 2, len(eligible)) / n_test)
+for k, i in enumerate(eligible):
+    print(f"Results: Train {months[i].strftime('%Y-%m')} ({counts[i]:5d} obs) -> "
+          f"Test {months[i + 1].strftime('%Y-%m')} ({counts[i + 1]:5d} obs) | "
+          f"MAPE: {mape[k]:6.2f}% | RMSE(pct): {rmse_pct[k]:6.2f}%")
 
 # Combine all results
 print("\n" + "=" * 80)
 print("Combining results...")
-all_results = pd.concat(results, ignore_index=True)
+all_results = pd.DataFrame({
+    'ticker': wf.df['ticker'].to_numpy()[test_rows],
+    'train_month': wf.periods[train_month_idx],
+    'test_month': wf.periods[train_month_idx + 1],
+    'actual_pe': y_test,
+    'predicted_pe': y_pred,
+    'percentage_error': percentage_errors
+})
 
 # Save prediction results
 output_file = 'lightgbm_pe_predictions.parquet'
@@ -168,5 +236,9 @@ print("=" * 80)
 print(f"Mean Absolute Percentage Error: {all_results['percentage_error'].abs().mean():.2f}%")
 print(f"Median Absolute Percentage Error: {all_results['percentage_error'].abs().median():.2f}%")
 print(f"RMSE (percentage): {np.sqrt((all_results['percentage_error'] ** 2).mean()):.2f}%")
+total_fit = sum(fit_times.values())
+print(f"Training mode: {'warm start' if WARM_START else 'full retrain'} | "
+      f"Objective: {OBJECTIVE} | Total fit time: {total_fit:.1f}s | "
+      f"Mean per month: {total_fit / max(len(fit_times), 1):.2f}s")
 print(f"\nPercentage Error Distribution:")
 print(all_results['percentage_error'].describe())
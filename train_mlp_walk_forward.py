@@ -0,0 +1,105 @@
+"""
+================================================================================
+WALK-FORWARD NEURAL NETWORK ARCHITECTURE SWEEP (data4, monthly)
+================================================================================
+
+PURPOSE:
+    Evaluates the MLP architectures of session11C_traintest.ipynb /
+    10-NeuralNetworks.ipynb on rolling windows instead of one train/test split:
+    1. One-hot encodes sector and size and percentile-ranks everything else
+       within each month (same layout as session11C_traintest.ipynb)
+    2. Writes the feature matrix once as a memory-mapped float32 file
+    3. Trains each architecture on every TRAINING_WINDOW-month window with
+       mini-batches streamed from the memory map; between windows the network
+       keeps training for WARM_EPOCHS instead of starting over
+    4. Runs the architectures in parallel processes
+
+INPUT FILE: data4.parquet
+
+OUTPUT FILES:
+    1. data4_mlp_sweep.csv - Per architecture: windows, OOS R², fit/predict times
+    2. data4_mlp_predict.parquet - (ticker, month, architecture, predict)
+
+USAGE:
+    python train_mlp_walk_forward.py
+
+NOTES FOR AI:
+    - Target is the within-month ranked return (as in the notebooks)
+    - To train every window from scratch: set WARM_EPOCHS = None
+    - To change architectures: modify ARCHITECTURES
+
+================================================================================
+"""
+
+import pandas as pd
+import numpy as np
+from utils.mlp_walk_forward import onehot_ranked_panel, write_panel, sweep_architectures
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TRAINING_WINDOW = 12            # Months in each training window
+EPOCHS = 20                     # Passes over a window when training from scratch
+WARM_EPOCHS = 5                 # Passes over a window when continuing (None = no warm start)
+REFIT_EVERY = 12                # Train from scratch every N windows
+BATCH_SIZE = 256                # Rows per mini-batch
+N_WORKERS = None                # Worker processes (None = all cores)
+CACHE_DIR = '.mlp_cache'        # Memory-mapped feature matrix
+
+ARCHITECTURES = [
+    (5,),
+    (10,),
+    (20,),
+    (10, 5),
+    (20, 10),
+    (30, 15),
+    (20, 10, 5),
+    (30, 20, 10),
+    (50, 25, 10),
+    (50, 30, 20, 10),
+]
+
+
+def main():
+    # ============================================================================
+    # STEP 1: PREPARE AND MEMORY-MAP THE PANEL
+    # ============================================================================
+
+    df, features = onehot_ranked_panel(pd.read_parquet('data4.parquet'))
+    paths = write_panel(df, features, 'return', 'month', CACHE_DIR)
+    print(f"Panel: {len(df):,} rows x {len(features)} features, "
+          f"{len(paths['periods'])} months")
+
+    # ============================================================================
+    # STEP 2: SWEEP ARCHITECTURES IN PARALLEL
+    # ============================================================================
+
+    print(f"Training {len(ARCHITECTURES)} architectures on "
+          f"{len(paths['periods']) - TRAINING_WINDOW} windows...")
+    results, predictions = sweep_architectures(
+        paths, ARCHITECTURES, n_workers=N_WORKERS, train_size=TRAINING_WINDOW,
+        epochs=EPOCHS, warm_epochs=WARM_EPOCHS, refit_every=REFIT_EVERY,
+        batch_size=BATCH_SIZE)
+
+    results.to_csv('data4_mlp_sweep.csv')
+    print("\nSaved data4_mlp_sweep.csv")
+
+    # Out-of-sample rows start after the first training window
+    first = np.load(paths['offsets'])[TRAINING_WINDOW]
+    oos = df.iloc[first:][['ticker', 'month']]
+    df_predict = pd.concat([oos.assign(architecture=arch, predict=p)
+                            for arch, p in predictions.items()], ignore_index=True)
+    df_predict.to_parquet('data4_mlp_predict.parquet', index=False)
+    print("Saved data4_mlp_predict.parquet")
+
+    print("\n" + "=" * 80)
+    print("ARCHITECTURE SWEEP (out-of-sample R² on ranked returns)")
+    print("=" * 80)
+    print(results.sort_values('oos_r2', ascending=False).round(4).to_string())
+
+
+# Worker processes re-import this module, so the sweep only runs when the
+# script is executed directly
+if __name__ == '__main__':
+    main()
@@ -15,9 +15,16 @@ INPUT FILE: data4.parquet
 
 OUTPUT FILES:
     1. data4_predict.parquet - (ticker, month, predict) predictions
-    2. data4_portfolios.csv - (month, decile, return, predict) portfolio analysis
+    2. data4_portfolios.csv - (month, decile, return, [return_vw,] predict) portfolio analysis
     3. data4_current.xlsx - Current month predictions with features
     4. data4_model.pkl - Trained LightGBM model
+    5. data4_model.json (+ .txt) - Same model in LightGBM's native format
+    6. data4_current.npy (+ _tickers.npy) - Ranked current features for serving
+    7. data4_importance.parquet - (window, month, feature, gain, split) per window model
+    8. data4_backtest.csv - Long-short backtest per month (gross/net return, turnover,
+       cost, positions, capacity)
+    9. data4_performance.csv - Mean/std/Sharpe (per month and annualized), hit rate,
+       skew, kurtosis, max drawdown and its duration per decile, spread and backtest
 
 METHODOLOGY:
     1. Convert all features (except ticker, month) to percentile ranks within month
@@ -26,7 +33,8 @@ METHODOLOGY:
        - No validation set or early stopping
        - Predict on month t's features
     3. Cut predictions into deciles each month
-    4. Calculate average return and prediction by (month, decile)
+    4. Calculate average return and prediction by (month, decile), equal- and
+       value-weighted (utils/portfolios.py: all months in one vectorized pass)
 
 USAGE:
     python train_predict_data4.py
@@ -36,8 +44,21 @@ NOTES FOR AI:
     - To modify features: they're auto-detected (all cols except ticker, month, return)
     - To change training window: modify TRAINING_WINDOW constant
     - To change portfolio buckets: modify N_PORTFOLIOS constant
+    - To continue boosting between windows: set WARM_START = True
+    - To average a bagged multi-seed ensemble per window: set ENSEMBLE_SIZE > 1
+      (members train in parallel threads; the saved model is an EnsembleModel)
+    - Window models/predictions are cached in MODEL_CACHE_DIR, keyed by the
+      training rows, the first BIN_PERIODS months (they set the bin edges),
+      features, PARAMS and LightGBM version: rerunning with unchanged inputs
+      skips training, and appending or refreshing later months retrains only
+      the windows that contain them. Changing PARAMS or the first BIN_PERIODS
+      months retrains every window; BIN_PERIODS = None bins on the whole panel,
+      so then any data change retrains every window
     - All features are percentile-ranked to handle scale differences
     - No early stopping: financial returns are noisy, let model train fully
+    - Rolling windows run on utils/walk_forward.py: the panel is sorted and
+      binned once, each window trains on a contiguous row subset of it, and
+      each window's out-of-sample rows are scored in one predict call
 
 ================================================================================
 """
@@ -46,6 +67,14 @@ import pandas as pd
 import numpy as np
 import lightgbm as lgb
 from datetime import datetime
+from utils.walk_forward import WalkForward
+from utils.model_cache import ModelCache
+from utils.lgb_panel import ensemble_params
+from utils.native_scoring import export_native, save_snapshot
+from utils.portfolios import quantile_buckets, portfolio_returns
+from utils.backtest import Backtest
+from utils.performance import performance_report, summary
+from utils.resampling import spread_inference
 
 # ============================================================================
 # CONFIGURATION
@@ -56,6 +85,30 @@ TRAINING_WINDOW = 12            # Number of months in rolling training window
 
 # Portfolio analysis
 N_PORTFOLIOS = 10               # Number of portfolios (deciles)
+N_RESAMPLES = 10_000            # Bootstrap/permutation draws for the spread's CI
+VALUE_WEIGHT_COLUMN = 'marketcap'  # Value weights: prior-month marketcap (None = EW only)
+
+# Long-short backtest (D10 - D1 holdings, utils/backtest.py)
+HOLDING_PERIODS = 1             # Months each portfolio is held (> 1 = overlapping)
+COST_BPS = 10                   # Trading cost per unit of turnover (basis points)
+MAX_OWNERSHIP = 0.01            # Capacity: largest fraction of a marketcap held
+
+# Warm-start mode (see benchmark_warm_start.py for the accuracy/speed trade-off)
+WARM_START = False              # Continue boosting the previous window's model
+WARM_START_TREES = 10           # Extra trees added per warm-started window
+WARM_START_REFIT_EVERY = 12     # Full retrain every N windows to bound model size
+
+# Content-addressed cache of window models and predictions (None to disable)
+MODEL_CACHE_DIR = '.model_cache'
+BIN_PERIODS = 60                # Bin edges from the first N months (None = all months)
+
+# Per-window feature importances saved to data4_importance.parquet:
+# 'trees' (gain/split), 'shap' (also mean |SHAP| out of sample) or None
+TRACK_IMPORTANCE = 'trees'
+
+# Bagged multi-seed ensemble (see benchmark_ensemble.py); 1 = single model
+ENSEMBLE_SIZE = 1               # Members averaged per window (each with its own
+                                # seed and row/feature subsampling)
 
 # ============================================================================
 # LIGHTGBM HYPERPARAMETERS
@@ -156,49 +209,30 @@ features = [col for col in df_train.columns if col not in ['ticker', 'month', 'r
 print(f"Target: {target}")
 print(f"Features ({len(features)}): {features}")
 
-# Train and predict
-all_predictions = []
-start_idx = TRAINING_WINDOW  # First prediction month index
-
-for i in range(start_idx, len(months)):
-    current_month = months[i]
-
-    # Define training window (12 months before current)
-    train_months = months[i - TRAINING_WINDOW:i]
-
-    # Get training and test data
-    train_data = df_train[df_train['month'].isin(train_months)]
-    test_data = df_train[df_train['month'] == current_month]
-
-    X_train = train_data[features]
-    y_train = train_data[target]
-    X_test = test_data[features]
-
-    # Train model (no validation set, no early stopping)
-    model = lgb.LGBMRegressor(**PARAMS)
-    model.fit(X_train, y_train)
-
-    # Predict on current month
-    predictions = model.predict(X_test)
-
-    # Store predictions
-    month_predictions = pd.DataFrame({
-        'ticker': test_data['ticker'].values,
-        'month': current_month,
-        'predict': predictions
-    })
-    all_predictions.append(month_predictions)
-
-    # Progress update every 12 months
-    if (i - start_idx + 1) % 12 == 0 or i == len(months) - 1:
-        print(f"Completed {i - start_idx + 1}/{len(months) - start_idx} months "
-              f"(current: {current_month})")
-
-# Combine all predictions
-df_predict = pd.concat(all_predictions, ignore_index=True)
+# Walk-forward engine: sorts by month once and hands out contiguous row
+# ranges; the panel is binned once and each window trains on a row subset
+wf = WalkForward(df_train, 'month', features, target, bin_periods=BIN_PERIODS)
+model_cache = ModelCache(MODEL_CACHE_DIR) if MODEL_CACHE_DIR else None
+ensemble = ensemble_params(PARAMS, ENSEMBLE_SIZE) if ENSEMBLE_SIZE > 1 else None
+
+# Train on months t-12..t-1 and predict month t, for every complete month.
+# In warm-start mode, continue boosting the previous window's model with a
+# few extra trees instead of retraining from scratch. final=True also trains
+# the window ending at the last complete month, which Step 4 reuses for the
+# current month (unless that window was warm-started)
+df_predict = wf.run(PARAMS, train_size=TRAINING_WINDOW, end=len(months),
+                    warm_start_trees=WARM_START_TREES if WARM_START else None,
+                    refit_every=WARM_START_REFIT_EVERY,
+                    ensemble=ensemble, cache=model_cache,
+                    importance=TRACK_IMPORTANCE, final=True)
+print(f"Mean fit time per window: {np.mean(wf.fit_times):.2f}s" if wf.fit_times
+      else "All windows loaded from the model cache")
 
 # Save predictions
 df_predict.to_parquet('data4_predict.parquet', index=False)
+if wf.importance is not None:
+    wf.importance.to_parquet('data4_importance.parquet', index=False)
+    print(f"Saved data4_importance.parquet ({wf.importance['window'].nunique()} windows)")
 print(f"\nSaved data4_predict.parquet")
 print(f"Total predictions: {len(df_predict):,}")
 print(f"Unique months: {df_predict['month'].nunique()}")
@@ -213,23 +247,22 @@ print("\n" + "=" * 80)
 print("STEP 3: Forming portfolios and analyzing performance")
 print("=" * 80)
 
-# Merge returns with predictions
-df_returns = df_raw[['ticker', 'month', 'return']]
+# Merge returns (and value weights) with predictions
+weight_col = VALUE_WEIGHT_COLUMN if VALUE_WEIGHT_COLUMN in df_raw.columns else None
+df_returns = df_raw[['ticker', 'month', 'return'] + ([weight_col] if weight_col else [])]
 df_analysis = pd.merge(df_returns, df_predict, on=['ticker', 'month'], how='inner')
 print(f"Merged rows: {len(df_analysis):,}")
 
-# Cut into portfolios (deciles) each month based on predicted return
-# Using rank-based approach to handle duplicate values
-df_analysis['decile'] = df_analysis.groupby('month')['predict'].transform(
-    lambda x: pd.cut(x.rank(method='first'), bins=N_PORTFOLIOS,
-                     labels=range(1, N_PORTFOLIOS + 1))
-)
+# Cut into portfolios (deciles) each month based on predicted return, for
+# all months at once. Rank-based (ties broken by row order), with the same
+# bins as pd.cut on the within-month ranks
+df_analysis['decile'] = quantile_buckets(df_analysis['predict'], df_analysis['month'],
+                                         N_PORTFOLIOS)
 
-# Calculate average return and prediction by (month, decile)
-portfolios = df_analysis.groupby(['month', 'decile'], observed=True).agg({
-    'return': 'mean',
-    'predict': 'mean'
-}).reset_index()
+# Calculate average return and prediction by (month, decile), plus the
+# value-weighted return when VALUE_WEIGHT_COLUMN is set
+portfolios = portfolio_returns(df_analysis, 'month', ['decile'], weight_col=weight_col,
+                               mean_cols=['predict'])
 
 # Save portfolio analysis
 portfolios.to_csv('data4_portfolios.csv', index=False)
@@ -249,6 +282,49 @@ spreads['spread'] = spreads[N_PORTFOLIOS] - spreads[1]
 avg_spread = spreads['spread'].mean()
 print(f"\nAverage monthly spread (D10 - D1): {avg_spread:.4f} ({avg_spread*100:.2f}%)")
 
+# 95% block-bootstrap interval and permutation p-value of the spread
+# (in-process: this script has no __main__ guard for worker processes;
+# spread_significance.py runs the same test on all cores)
+inference = spread_inference(portfolios, 'month', periods_per_year=12,
+                             n_resamples=N_RESAMPLES, n_workers=1)
+print(f"  95% CI: [{inference.loc['mean', 'ci_low']:.4f}, "
+      f"{inference.loc['mean', 'ci_high']:.4f}] | "
+      f"permutation p-value: {inference.loc['mean', 'p_value']:.4f} | "
+      f"annualized Sharpe {inference.loc['sharpe', 'observed']:.2f} "
+      f"[{inference.loc['sharpe', 'ci_low']:.2f}, {inference.loc['sharpe', 'ci_high']:.2f}]")
+if weight_col is not None:
+    vw = portfolios.pivot(index='month', columns='decile', values='return_vw')
+    avg_vw_spread = (vw[N_PORTFOLIOS] - vw[1]).mean()
+    print(f"Average monthly value-weighted spread (D10 - D1): "
+          f"{avg_vw_spread:.4f} ({avg_vw_spread*100:.2f}%)")
+
+# Backtest the long-short portfolio: sparse (ticker x month) holdings with
+# turnover, trading costs and capacity
+bt = Backtest(df_analysis, 'month')
+holdings = bt.weights(df_analysis['decile'], long=N_PORTFOLIOS, short=1, weight_col=weight_col)
+backtest = bt.run(holdings, holding_periods=HOLDING_PERIODS, cost_bps=COST_BPS,
+                  liquidity=weight_col, max_ownership=MAX_OWNERSHIP)
+# Ramp-up periods (HOLDING_PERIODS > 1) and the unrealised current period
+# have NaN returns and drop out of the averages
+backtest.to_csv('data4_backtest.csv')
+print(f"\nSaved data4_backtest.csv")
+print(f"Average monthly return: gross {backtest['gross_return'].mean():.4f}, "
+      f"net of {COST_BPS} bps costs {backtest['net_return'].mean():.4f} | "
+      f"average turnover {backtest['turnover'].mean():.2f}")
+if 'capacity' in backtest:
+    print(f"Median capacity: {backtest['capacity'].median():,.0f} (units of {weight_col})")
+
+# Performance report: per-decile and spread statistics plus the backtest's
+# gross and net returns (12 months per year)
+performance = pd.concat([
+    performance_report(portfolios, 'month', 'decile', periods_per_year=12),
+    summary(backtest[['gross_return', 'net_return']], periods_per_year=12),
+])
+performance.to_csv('data4_performance.csv')
+print(f"\nSaved data4_performance.csv")
+print(performance[['Annualized Mean', 'Annualized Sharpe', 'Hit Rate', 'Max Drawdown',
+                   'Max Drawdown Duration']].round(4).to_string())
+
 print("\n" + "=" * 80)
 print("COMPLETE")
 print("=" * 80)
@@ -277,27 +353,22 @@ if current_predict_month in all_months:
     print(f"Training on: {current_train_months[0]} to {current_train_months[-1]}")
     print(f"Predicting for: {current_predict_month}")
 
-    # Get training and prediction data
-    current_train_data = df_train[df_train['month'].isin(current_train_months)]
-    current_test_data = df_train[df_train['month'] == current_predict_month]
-
-    X_current_train = current_train_data[features]
-    y_current_train = current_train_data[target]
-    X_current_test = current_test_data[features]
-
-    # Train model
-    current_model = lgb.LGBMRegressor(**PARAMS)
-    current_model.fit(X_current_train, y_current_train)
+    # Reuse the model run(..., final=True) trained on the last window before
+    # the current month when it covers exactly these rows; otherwise load it
+    # from the cache (a rerun on the same data) or train it once here
+    current_model = wf.window_model(PARAMS, train_start_idx, train_end_idx,
+                                    cache=model_cache, ensemble=ensemble)
 
     # Predict
-    current_predictions = current_model.predict(X_current_test)
+    current_rows = wf.rows(train_end_idx, train_end_idx + 1)
+    current_predictions = wf.predict(current_model, train_end_idx, train_end_idx + 1)
 
     # Get original features from data4.parquet for November 2025
     df_raw_nov = df_raw[df_raw['month'] == current_predict_month].copy()
 
     # Create output dataframe with ticker and predict
     df_current = pd.DataFrame({
-        'ticker': current_test_data['ticker'].values,
+        'ticker': wf.df['ticker'].values[current_rows],
         'predict': current_predictions
     })
 
@@ -316,11 +387,23 @@ if current_predict_month in all_months:
     print(f"\nSaved data4_current.xlsx")
     print(f"Total predictions: {len(df_current):,}")
 
-    # Save the trained model
+    # Save the trained model (lgb.Booster)
     import joblib
     joblib.dump(current_model, 'data4_model.pkl')
     print(f"Saved trained model to data4_model.pkl")
 
+    # Ranked features of the current month for serve_predictions.py. Written
+    # before the model: the server reloads when the manifest changes, so the
+    # snapshot must already be complete by then
+    save_snapshot(wf.X[current_rows], 'data4_current.npy',
+                  tickers=wf.df['ticker'].values[current_rows])
+    print(f"Saved feature snapshot to data4_current.npy")
+
+    # Native LightGBM copy for utils/native_scoring.py (no unpickling); the
+    # manifest is written last
+    export_native(current_model, 'data4_model')
+    print(f"Saved native model to data4_model.json")
+
     # Show top 10 and bottom 10
     print(f"\nTop 10 predicted stocks for {current_predict_month}:")
     print(df_current.head(10).to_string(index=False))
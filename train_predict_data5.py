@@ -15,9 +15,16 @@ INPUT FILE: data5.parquet
 
 OUTPUT FILES:
     1. data5_predict.parquet - (ticker, week, predict) predictions
-    2. data5_portfolios.csv - (week, decile, return, predict) portfolio analysis
+    2. data5_portfolios.csv - (week, decile, return, [return_vw,] predict) portfolio analysis
     3. data5_current.xlsx - Current week predictions with features
     4. data5_model.pkl - Trained LightGBM model
+    5. data5_model.json (+ .txt) - Same model in LightGBM's native format
+    6. data5_current.npy (+ _tickers.npy) - Ranked current features for serving
+    7. data5_importance.parquet - (window, week, feature, gain, split) per window model
+    8. data5_backtest.csv - Long-short backtest per week (gross/net return, turnover,
+       cost, positions, capacity)
+    9. data5_performance.csv - Mean/std/Sharpe (per week and annualized), hit rate,
+       skew, kurtosis, max drawdown and its duration per decile, spread and backtest
 
 METHODOLOGY:
     1. Convert all features (except ticker, week) to percentile ranks within week
@@ -26,15 +33,28 @@ METHODOLOGY:
     4. Then retrain at t+8 and predict for (t+8, ..., t+15), etc.
     5. Cut predictions into deciles each week
     6. Calculate average return and prediction by (week, decile)
+       (utils/portfolios.py: all weeks in one vectorized pass)
 
 USAGE:
     python train_predict_data5.py
 
 NOTES FOR AI:
     - Trains every 8 weeks to reduce computational cost
+    - To average a bagged multi-seed ensemble per window: set ENSEMBLE_SIZE > 1
+      (members train in parallel threads; the saved model is an EnsembleModel)
+    - Window models/predictions are cached in MODEL_CACHE_DIR, keyed by the
+      training rows, the first BIN_PERIODS weeks (they set the bin edges),
+      features, PARAMS and LightGBM version: rerunning with unchanged inputs
+      skips training, and appending or refreshing later weeks retrains only
+      the windows that contain them. Changing PARAMS or the first BIN_PERIODS
+      weeks retrains every window; BIN_PERIODS = None bins on the whole panel,
+      so then any data change retrains every window
     - Each training predicts for 8 consecutive weeks (t through t+7)
     - All features are percentile-ranked to handle scale differences
     - No early stopping: financial returns are noisy, let model train fully
+    - Rolling windows run on utils/walk_forward.py: the panel is sorted and
+      binned once, each window trains on a contiguous row subset of it, and
+      all 8 out-of-sample weeks of a window are scored in one predict call
 
 ================================================================================
 """
@@ -43,6 +63,14 @@ import pandas as pd
 import numpy as np
 import lightgbm as lgb
 from datetime import datetime
+from utils.walk_forward import WalkForward
+from utils.model_cache import ModelCache
+from utils.lgb_panel import ensemble_params
+from utils.native_scoring import export_native, save_snapshot
+from utils.portfolios import quantile_buckets, portfolio_returns
+from utils.backtest import Backtest
+from utils.performance import performance_report, summary
+from utils.resampling import spread_inference
 
 # ============================================================================
 # CONFIGURATION
@@ -54,6 +82,25 @@ NUMBER_WEEKS_BETWEEN_TRAINING = 8   # Retrain every 8 weeks
 
 # Portfolio analysis
 N_PORTFOLIOS = 10                   # Number of portfolios (deciles)
+N_RESAMPLES = 10_000                # Bootstrap/permutation draws for the spread's CI
+VALUE_WEIGHT_COLUMN = None          # Value-weight column, e.g. 'marketcap' (None = EW only)
+
+# Long-short backtest (D10 - D1 holdings, utils/backtest.py)
+HOLDING_PERIODS = 1                 # Weeks each portfolio is held (> 1 = overlapping)
+COST_BPS = 10                       # Trading cost per unit of turnover (basis points)
+MAX_OWNERSHIP = 0.01                # Capacity: largest fraction of a marketcap held
+
+# Content-addressed cache of window models and predictions (None to disable)
+MODEL_CACHE_DIR = '.model_cache'
+BIN_PERIODS = 104                   # Bin edges from the first N weeks (None = all weeks)
+
+# Per-window feature importances saved to data5_importance.parquet:
+# 'trees' (gain/split), 'shap' (also mean |SHAP| out of sample) or None
+TRACK_IMPORTANCE = 'trees'
+
+# Bagged multi-seed ensemble (see benchmark_ensemble.py); 1 = single model
+ENSEMBLE_SIZE = 1                   # Members averaged per window (each with its own
+                                    # seed and row/feature subsampling)
 
 # ============================================================================
 # LIGHTGBM HYPERPARAMETERS
@@ -156,56 +203,29 @@ features = [col for col in df_train.columns
 print(f"Target: {target}")
 print(f"Features ({len(features)}): {features}")
 
-# Train and predict
-all_predictions = []
-start_idx = NUMBER_WEEKS_FOR_TRAINING  # First prediction week index
-
-# Loop through weeks, training every NUMBER_WEEKS_BETWEEN_TRAINING weeks
-for train_idx in range(start_idx, len(weeks), NUMBER_WEEKS_BETWEEN_TRAINING):
-
-    # Define training window (52 weeks before current)
-    train_start = train_idx - NUMBER_WEEKS_FOR_TRAINING
-    train_end = train_idx
-    train_weeks = weeks[train_start:train_end]
-
-    # Define prediction weeks (current week through next NUMBER_WEEKS_BETWEEN_TRAINING-1 weeks)
-    # This gives us exactly NUMBER_WEEKS_BETWEEN_TRAINING weeks: t, t+1, ..., t+7 (when param=8)
-    predict_end = min(train_idx + NUMBER_WEEKS_BETWEEN_TRAINING, len(weeks))
-    predict_weeks = weeks[train_idx:predict_end]
-
-    print(f"\nTraining on weeks {train_weeks[0]} to {train_weeks[-1]} ({len(train_weeks)} weeks)")
-    print(f"Predicting for weeks {predict_weeks[0]} to {predict_weeks[-1]} ({len(predict_weeks)} weeks)")
-
-    # Get training data
-    train_data = df_train[df_train['week'].isin(train_weeks)]
-    X_train = train_data[features]
-    y_train = train_data[target]
-
-    # Train model (no validation set, no early stopping)
-    model = lgb.LGBMRegressor(**PARAMS)
-    model.fit(X_train, y_train)
-
-    # Predict for each week in the prediction window
-    for pred_week in predict_weeks:
-        test_data = df_train[df_train['week'] == pred_week]
-        X_test = test_data[features]
-
-        # Predict
-        predictions = model.predict(X_test)
-
-        # Store predictions
-        week_predictions = pd.DataFrame({
-            'ticker': test_data['ticker'].values,
-            'week': pred_week,
-            'predict': predictions
-        })
-        all_predictions.append(week_predictions)
-
-# Combine all predictions
-df_predict = pd.concat(all_predictions, ignore_index=True)
+# Walk-forward engine: sorts by week once and hands out contiguous row
+# ranges; the panel is binned once and each window trains on a row subset
+wf = WalkForward(df_train, 'week', features, target, bin_periods=BIN_PERIODS)
+model_cache = ModelCache(MODEL_CACHE_DIR) if MODEL_CACHE_DIR else None
+ensemble = ensemble_params(PARAMS, ENSEMBLE_SIZE) if ENSEMBLE_SIZE > 1 else None
+
+# Train every NUMBER_WEEKS_BETWEEN_TRAINING weeks on the past
+# NUMBER_WEEKS_FOR_TRAINING weeks and predict the next
+# NUMBER_WEEKS_BETWEEN_TRAINING weeks (t, t+1, ..., t+7) in one batch.
+# final=True also trains the window ending at the last complete week, which
+# Step 4 reuses when the current week is the one after it
+df_predict = wf.run(PARAMS, train_size=NUMBER_WEEKS_FOR_TRAINING,
+                    step=NUMBER_WEEKS_BETWEEN_TRAINING, end=len(weeks),
+                    ensemble=ensemble, cache=model_cache,
+                    importance=TRACK_IMPORTANCE, final=True)
+print(f"Mean fit time per window: {np.mean(wf.fit_times):.2f}s" if wf.fit_times
+      else "All windows loaded from the model cache")
 
 # Save predictions
 df_predict.to_parquet('data5_predict.parquet', index=False)
+if wf.importance is not None:
+    wf.importance.to_parquet('data5_importance.parquet', index=False)
+    print(f"Saved data5_importance.parquet ({wf.importance['window'].nunique()} windows)")
 print(f"\nSaved data5_predict.parquet")
 print(f"Total predictions: {len(df_predict):,}")
 print(f"Unique weeks: {df_predict['week'].nunique()}")
@@ -220,23 +240,22 @@ print("\n" + "=" * 80)
 print("STEP 3: Forming portfolios and analyzing performance")
 print("=" * 80)
 
-# Merge returns with predictions
-df_returns = df_raw[['ticker', 'week', 'return']]
+# Merge returns (and value weights) with predictions
+weight_col = VALUE_WEIGHT_COLUMN if VALUE_WEIGHT_COLUMN in df_raw.columns else None
+df_returns = df_raw[['ticker', 'week', 'return'] + ([weight_col] if weight_col else [])]
 df_analysis = pd.merge(df_returns, df_predict, on=['ticker', 'week'], how='inner')
 print(f"Merged rows: {len(df_analysis):,}")
 
-# Cut into portfolios (deciles) each week based on predicted return
-# Using rank-based approach to handle duplicate values
-df_analysis['decile'] = df_analysis.groupby('week')['predict'].transform(
-    lambda x: pd.cut(x.rank(method='first'), bins=N_PORTFOLIOS,
-                     labels=range(1, N_PORTFOLIOS + 1))
-)
+# Cut into portfolios (deciles) each week based on predicted return, for
+# all weeks at once. Rank-based (ties broken by row order), with the same
+# bins as pd.cut on the within-week ranks
+df_analysis['decile'] = quantile_buckets(df_analysis['predict'], df_analysis['week'],
+                                         N_PORTFOLIOS)
 
-# Calculate average return and prediction by (week, decile)
-portfolios = df_analysis.groupby(['week', 'decile'], observed=True).agg({
-    'return': 'mean',
-    'predict': 'mean'
-}).reset_index()
+# Calculate average return and prediction by (week, decile), plus the
+# value-weighted return when VALUE_WEIGHT_COLUMN is set
+portfolios = portfolio_returns(df_analysis, 'week', ['decile'], weight_col=weight_col,
+                               mean_cols=['predict'])
 
 # Save portfolio analysis
 portfolios.to_csv('data5_portfolios.csv', index=False)
@@ -256,6 +275,49 @@ spreads['spread'] = spreads[N_PORTFOLIOS] - spreads[1]
 avg_spread = spreads['spread'].mean()
 print(f"\nAverage weekly spread (D10 - D1): {avg_spread:.4f} ({avg_spread*100:.2f}%)")
 
+# 95% block-bootstrap interval and permutation p-value of the spread
+# (in-process: this script has no __main__ guard for worker processes;
+# spread_significance.py runs the same test on all cores)
+inference = spread_inference(portfolios, 'week', periods_per_year=52,
+                             n_resamples=N_RESAMPLES, n_workers=1)
+print(f"  95% CI: [{inference.loc['mean', 'ci_low']:.4f}, "
+      f"{inference.loc['mean', 'ci_high']:.4f}] | "
+      f"permutation p-value: {inference.loc['mean', 'p_value']:.4f} | "
+      f"annualized Sharpe {inference.loc['sharpe', 'observed']:.2f} "
+      f"[{inference.loc['sharpe', 'ci_low']:.2f}, {inference.loc['sharpe', 'ci_high']:.2f}]")
+if weight_col is not None:
+    vw = portfolios.pivot(index='week', columns='decile', values='return_vw')
+    avg_vw_spread = (vw[N_PORTFOLIOS] - vw[1]).mean()
+    print(f"Average weekly value-weighted spread (D10 - D1): "
+          f"{avg_vw_spread:.4f} ({avg_vw_spread*100:.2f}%)")
+
+# Backtest the long-short portfolio: sparse (ticker x week) holdings with
+# turnover, trading costs and capacity
+bt = Backtest(df_analysis, 'week')
+holdings = bt.weights(df_analysis['decile'], long=N_PORTFOLIOS, short=1, weight_col=weight_col)
+backtest = bt.run(holdings, holding_periods=HOLDING_PERIODS, cost_bps=COST_BPS,
+                  liquidity=weight_col, max_ownership=MAX_OWNERSHIP)
+# Ramp-up periods (HOLDING_PERIODS > 1) and the unrealised current period
+# have NaN returns and drop out of the averages
+backtest.to_csv('data5_backtest.csv')
+print(f"\nSaved data5_backtest.csv")
+print(f"Average weekly return: gross {backtest['gross_return'].mean():.4f}, "
+      f"net of {COST_BPS} bps costs {backtest['net_return'].mean():.4f} | "
+      f"average turnover {backtest['turnover'].mean():.2f}")
+if 'capacity' in backtest:
+    print(f"Median capacity: {backtest['capacity'].median():,.0f} (units of {weight_col})")
+
+# Performance report: per-decile and spread statistics plus the backtest's
+# gross and net returns (52 weeks per year)
+performance = pd.concat([
+    performance_report(portfolios, 'week', 'decile', periods_per_year=52),
+    summary(backtest[['gross_return', 'net_return']], periods_per_year=52),
+])
+performance.to_csv('data5_performance.csv')
+print(f"\nSaved data5_performance.csv")
+print(performance[['Annualized Mean', 'Annualized Sharpe', 'Hit Rate', 'Max Drawdown',
+                   'Max Drawdown Duration']].round(4).to_string())
+
 print("\n" + "=" * 80)
 print("COMPLETE")
 print("=" * 80)
@@ -287,27 +349,22 @@ if current_predict_week in all_weeks:
     print(f"Training on: {current_train_weeks[0]} to {current_train_weeks[-1]} ({len(current_train_weeks)} weeks)")
     print(f"Predicting for: {current_predict_week}")
 
-    # Get training and prediction data
-    current_train_data = df_train[df_train['week'].isin(current_train_weeks)]
-    current_test_data = df_train[df_train['week'] == current_predict_week]
-
-    X_current_train = current_train_data[features]
-    y_current_train = current_train_data[target]
-    X_current_test = current_test_data[features]
-
-    # Train model
-    current_model = lgb.LGBMRegressor(**PARAMS)
-    current_model.fit(X_current_train, y_current_train)
+    # Reuse the model run(..., final=True) trained on the last window before
+    # the current week when it covers exactly these rows; otherwise load it
+    # from the cache (a rerun on the same data) or train it once here
+    current_model = wf.window_model(PARAMS, train_start_idx, train_end_idx,
+                                    cache=model_cache, ensemble=ensemble)
 
     # Predict
-    current_predictions = current_model.predict(X_current_test)
+    current_rows = wf.rows(train_end_idx, train_end_idx + 1)
+    current_predictions = wf.predict(current_model, train_end_idx, train_end_idx + 1)
 
     # Get original features from data5.parquet for current week
     df_raw_current = df_raw[df_raw['week'] == current_predict_week].copy()
 
     # Create output dataframe with ticker and predict
     df_current = pd.DataFrame({
-        'ticker': current_test_data['ticker'].values,
+        'ticker': wf.df['ticker'].values[current_rows],
         'predict': current_predictions
     })
 
@@ -326,11 +383,23 @@ if current_predict_week in all_weeks:
     print(f"\nSaved data5_current.xlsx for week {current_predict_week}")
     print(f"Total predictions: {len(df_current):,}")
 
-    # Save the trained model
+    # Save the trained model (lgb.Booster)
     import joblib
     joblib.dump(current_model, 'data5_model.pkl')
     print(f"Saved trained model to data5_model.pkl")
 
+    # Ranked features of the current week for serve_predictions.py. Written
+    # before the model: the server reloads when the manifest changes, so the
+    # snapshot must already be complete by then
+    save_snapshot(wf.X[current_rows], 'data5_current.npy',
+                  tickers=wf.df['ticker'].values[current_rows])
+    print(f"Saved feature snapshot to data5_current.npy")
+
+    # Native LightGBM copy for utils/native_scoring.py (no unpickling); the
+    # manifest is written last
+    export_native(current_model, 'data5_model')
+    print(f"Saved native model to data5_model.json")
+
     # Show top 10 and bottom 10
     print(f"\nTop 10 predicted stocks for {current_predict_week}:")
     print(df_current.head(10).to_string(index=False))
@@ -0,0 +1,175 @@
+"""Sparse portfolio backtests: holdings, turnover, costs and capacity.
+
+Holdings are a sparse (ticker x period) weight matrix built from portfolio
+assignments (utils/portfolios.py): a long leg summing to +1 and an optional
+short leg summing to -1, equal- or value-weighted. Every quantity of the
+backtest is a sparse matrix operation over all periods at once:
+
+    gross return    column sums of W * R (row t's return is earned by the
+                    weights formed in period t, as in the portfolio CSVs)
+    overlap         W @ B, where B averages the portfolios formed in the last
+                    holding_periods periods (Jegadeesh-Titman overlapping
+                    portfolios)
+    turnover        column sums of |W_t - drift(W_{t-1})|, where drift()
+                    grows last period's weights by their returns and rescales
+                    them to the same gross exposure
+    costs           turnover x cost_bps / 10,000, deducted from the return
+    capacity        largest portfolio value for which no position exceeds
+                    max_ownership of the stock's liquidity (e.g. marketcap)
+
+A missing return counts as 0 for the position that holds it, but a period in
+which no held position has a return (e.g. the current, unrealised period) has
+NaN gross and net returns. With holding_periods > 1, the first periods hold
+fewer than holding_periods portfolios, so only a fraction of the gross
+exposure: their returns, turnover and costs are NaN too, and they drop out of
+averages and summaries.
+
+Usage:
+    from utils.backtest import Backtest
+    bt = Backtest(df_analysis, 'month')
+    W = bt.weights(df_analysis['decile'], long=10, short=1)
+    results = bt.run(W, holding_periods=3, cost_bps=10, liquidity='marketcap')
+"""
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class Backtest:
+    """Panel of returns on a sparse (ticker x period) grid.
+
+    Args:
+        df: Panel with one row per (id, period)
+        period_col: Period column (periods are sorted)
+        id_col: Asset column (default: 'ticker')
+        return_col: Return earned in the row's period (default: 'return')
+    """
+
+    def __init__(self, df, period_col, id_col='ticker', return_col='return'):
+        self.df = df
+        self.period_col = period_col
+        self.row, self.ids = pd.factorize(df[id_col].to_numpy(), sort=True)
+        self.col, self.periods = pd.factorize(df[period_col].to_numpy(), sort=True)
+        self.shape = (len(self.ids), len(self.periods))
+        self.return_col = return_col
+        self.returns = self.matrix(df[return_col])
+
+    def matrix(self, values):
+        """Sparse (ticker x period) CSC matrix of a panel column (NaN -> empty)."""
+        values = np.asarray(values, dtype=np.float64)
+        keep = np.isfinite(values) & (self.row >= 0) & (self.col >= 0)
+        return sp.csc_matrix((values[keep], (self.row[keep], self.col[keep])), shape=self.shape)
+
+    def weights(self, buckets, long, short=None, weight_col=None):
+        """Sparse holdings formed each period from portfolio assignments.
+
+        Args:
+            buckets: Portfolio of each row (e.g. the 'decile' column)
+            long: Portfolio held long (weights sum to +1 per period)
+            short: Optional portfolio held short (weights sum to -1)
+            weight_col: Optional column for value weights within each leg
+                (default: equal weights)
+
+        Returns:
+            CSC matrix of weights, shape (n_ids, n_periods)
+        """
+        buckets = np.asarray(buckets)
+        size = (np.ones(len(buckets)) if weight_col is None
+                else self.df[weight_col].to_numpy(dtype=np.float64))
+        legs = [(long, 1.0)] + ([(short, -1.0)] if short is not None else [])
+        weights = np.zeros(len(buckets))
+        for bucket, sign in legs:
+            member = (buckets == bucket) & np.isfinite(size) & (size > 0) & (self.col >= 0)
+            totals = np.bincount(self.col[member], size[member], minlength=self.shape[1])
+            weights[member] = sign * size[member] / totals[self.col[member]]
+        return self.matrix(np.where(weights != 0, weights, np.nan))
+
+    def overlap(self, W, holding_periods):
+        """Average of the portfolios formed in the last holding_periods periods."""
+        if holding_periods <= 1:
+            return W
+        n = self.shape[1]
+        formed = np.concatenate([np.arange(n - k) for k in range(holding_periods)])
+        held = np.concatenate([np.arange(k, n) for k in range(holding_periods)])
+        band = sp.csc_matrix((np.full(len(formed), 1.0 / holding_periods), (formed, held)),
+                             shape=(n, n))
+        return (W @ band).tocsc()
+
+    def turnover(self, W):
+        """Traded weight per period: sum |W_t - drifted W_{t-1}| (first period: sum |W_0|)."""
+        grown = W + W.multiply(self.returns)
+        gross = np.asarray(abs(W).sum(axis=0)).ravel()
+        grown_gross = np.asarray(abs(grown).sum(axis=0)).ravel()
+        scale = np.divide(gross, grown_gross, out=np.zeros_like(gross), where=grown_gross > 0)
+        drifted = grown @ sp.diags(scale)
+        n = self.shape[1]
+        shift = sp.csc_matrix((np.ones(n - 1), (np.arange(n - 1), np.arange(1, n))), shape=(n, n))
+        return np.asarray(abs(W - drifted @ shift).sum(axis=0)).ravel()
+
+    def capacity(self, W, liquidity, max_ownership=0.01):
+        """Largest portfolio value with every position <= max_ownership x liquidity.
+
+        Args:
+            W: Holdings
+            liquidity: Panel column name or values (e.g. 'marketcap'); rows
+                with unknown liquidity are ignored
+            max_ownership: Largest fraction of a stock's liquidity held
+
+        Returns:
+            Array of capacities per period (in the units of liquidity)
+        """
+        if isinstance(liquidity, str):
+            liquidity = self.df[liquidity]
+        W = W.tocoo()
+        held_liquidity = np.asarray(self.matrix(liquidity).tocsr()[W.row, W.col]).ravel()
+        limit = np.full(len(W.data), np.inf)
+        known = (held_liquidity > 0) & (W.data != 0)
+        limit[known] = max_ownership * held_liquidity[known] / np.abs(W.data[known])
+        capacity = np.full(self.shape[1], np.inf)
+        np.minimum.at(capacity, W.col, limit)
+        capacity[np.isinf(capacity)] = np.nan
+        return capacity
+
+    def run(self, W, holding_periods=1, cost_bps=0.0, liquidity=None, max_ownership=0.01):
+        """Period-by-period backtest of the holdings.
+
+        Args:
+            W: Holdings from weights()
+            holding_periods: Periods each formed portfolio is held; > 1
+                averages overlapping portfolios
+            cost_bps: Cost per unit of traded weight, in basis points
+            liquidity: Optional liquidity column for capacity (e.g. 'marketcap')
+            max_ownership: Largest fraction of a stock's liquidity held
+
+        Returns:
+            DataFrame indexed by period with gross_return, turnover, cost,
+            net_return, n_long, n_short and (with liquidity) capacity.
+            Periods holding fewer than holding_periods formed portfolios have
+            NaN returns, turnover and cost; periods without any realised
+            return of a held position have NaN returns
+        """
+        H = self.overlap(W, holding_periods)
+        gross = np.asarray(H.multiply(self.returns).sum(axis=0)).ravel()
+        turnover = self.turnover(H)
+        cost = turnover * cost_bps / 10_000
+
+        # Portfolios formed in each period, summed over the holding window
+        formed = (np.asarray(abs(W).sum(axis=0)).ravel() > 0).astype(np.float64)
+        ramp_up = self.overlap(sp.csc_matrix(formed), holding_periods).toarray().ravel()
+        ramp_up = ramp_up * holding_periods < holding_periods - 0.5
+        observed = self.matrix(np.where(np.isfinite(self.df[self.return_col]), 1.0, np.nan))
+        realised = np.asarray(abs(H).multiply(observed).sum(axis=0)).ravel() > 0
+        turnover[ramp_up] = np.nan
+        cost[ramp_up] = np.nan
+        gross[ramp_up | ~realised] = np.nan
+        results = pd.DataFrame({
+            'gross_return': gross,
+            'turnover': turnover,
+            'cost': cost,
+            'net_return': gross - cost,
+            'n_long': np.asarray((H > 0).sum(axis=0)).ravel(),
+            'n_short': np.asarray((H < 0).sum(axis=0)).ravel(),
+        }, index=pd.Index(self.periods, name=self.period_col))
+        if liquidity is not None:
+            results['capacity'] = self.capacity(H, liquidity, max_ownership)
+        return results
@@ -0,0 +1,350 @@
+"""Covariance estimation from the return panel.
+
+The monthly (data4) or weekly (data5) panel is pivoted into a (period x
+ticker) return matrix over a lookback window, and one of three estimators
+is applied:
+
+    ledoit_wolf      sample covariance shrunk toward a scaled identity with
+                     the Ledoit-Wolf (2004) optimal intensity
+    ewma_covariance  exponentially weighted covariance (halflife in periods)
+    pca_covariance   statistical factor model: the top principal components
+                     of the returns plus a diagonal of specific variances
+
+Missing returns are treated as zero deviations from the ticker's mean (its
+mean over the periods it has), and tickers with fewer than min_periods
+returns in the window are dropped by return_matrix().
+
+For large universes (N of about 5,000) everything runs in float32 by
+default. Products X'X are formed in column blocks of block_size tickers, and
+shrinkage is applied in place, so the only N x N arrays are the results. A
+5,000-name covariance is 100 MB.
+
+RollingCovariance and EwmaCovariance keep running sums, so a new period
+costs one O(N^2) rank-one update instead of a full re-estimate.
+RollingCovariance matches sample_covariance() / ledoit_wolf() of its window;
+EwmaCovariance starts from ewma_covariance() of a history and then follows
+the RiskMetrics recursion. Long-lived float32 states accumulate rounding
+from the add/drop updates; pass dtype=np.float64 or rebuild them with
+from_returns() periodically.
+
+Usage:
+    from utils.covariance import return_matrix, ledoit_wolf, pca_covariance
+    R = return_matrix(df_raw, 'month', tickers, lookback=60)
+    cov, shrinkage = ledoit_wolf(R)
+    cov = pca_covariance(R, n_factors=10)
+    state = RollingCovariance.from_returns(R)
+    state.update(new_month_returns)               # Series indexed by ticker
+    cov, shrinkage = state.ledoit_wolf()
+"""
+import numpy as np
+import pandas as pd
+
+
+def return_matrix(df, period_col, tickers=None, lookback=None, end=None, min_periods=12,
+                  id_col='ticker', return_col='return'):
+    """Wide (period x ticker) return matrix over a lookback window.
+
+    Args:
+        df: Panel with one row per (ticker, period)
+        period_col: Period column
+        tickers: Tickers to keep (default: all)
+        lookback: Number of most recent periods (default: all)
+        end: Last period included (default: the last period with any return)
+        min_periods: Fewest returns a ticker needs in the window
+        id_col, return_col: Column names
+
+    Returns:
+        DataFrame indexed by period with one column per kept ticker (NaN
+        where a return is missing)
+    """
+    panel = df[[id_col, period_col, return_col]].dropna(subset=[return_col])
+    if tickers is not None:
+        panel = panel[panel[id_col].isin(tickers)]
+    if end is not None:
+        panel = panel[panel[period_col] <= end]
+    returns = panel.pivot_table(index=period_col, columns=id_col, values=return_col,
+                                aggfunc='last').sort_index()
+    if lookback is not None:
+        returns = returns.iloc[-lookback:]
+    return returns.loc[:, returns.notna().sum() >= min_periods]
+
+
+def _demeaned(returns, dtype=np.float32, weights=None):
+    """Returns minus each column's (weighted) mean, with missing values set to 0."""
+    X = np.asarray(returns, dtype=dtype)
+    valid = np.isfinite(X)
+    w = np.ones(len(X), dtype=dtype) if weights is None else weights.astype(dtype)
+    w = valid * w[:, None]
+    mean = np.where(valid, X, 0).astype(dtype)
+    mean = (mean * w).sum(axis=0) / np.maximum(w.sum(axis=0), np.finfo(dtype).tiny)
+    return np.where(valid, X - mean, 0).astype(dtype, copy=False)
+
+
+def gram(A, B=None, block_size=1024):
+    """A'B computed in blocks of block_size columns of A (B defaults to A)."""
+    B = A if B is None else B
+    out = np.empty((A.shape[1], B.shape[1]), dtype=np.result_type(A, B))
+    for start in range(0, A.shape[1], block_size):
+        out[start:start + block_size] = A[:, start:start + block_size].T @ B
+    return out
+
+
+def _wrap(matrix, returns):
+    if isinstance(returns, pd.DataFrame):
+        return pd.DataFrame(matrix, index=returns.columns, columns=returns.columns)
+    return matrix
+
+
+def _shrink(S, fourth_moment, T):
+    """Ledoit-Wolf shrinkage of S (in place) toward trace(S)/N times the identity.
+
+    fourth_moment is mean_t ||x_t||^4 over the demeaned rows, from which the
+    sampling variance of S follows: sum_t ||x_t x_t' - S||^2 / T^2.
+    """
+    N = S.shape[0]
+    trace = float(np.trace(S, dtype=np.float64))
+    target = trace / N
+    norm2 = float(np.einsum('ij,ij->', S, S, dtype=np.float64))
+    d2 = norm2 - 2 * target * trace + target ** 2 * N
+    b2 = (fourth_moment - norm2) / T
+    shrinkage = float(np.clip(b2 / d2, 0.0, 1.0)) if d2 > 0 else 1.0
+    S *= 1 - shrinkage
+    S[np.diag_indices(N)] += shrinkage * target
+    return S, shrinkage
+
+
+def sample_covariance(returns, pairwise=False, dtype=np.float32, block_size=1024):
+    """Sample covariance (divided by T) of the (period x ticker) returns.
+
+    Args:
+        returns: DataFrame or array; NaN allowed
+        pairwise: Divide each entry by the number of periods both tickers
+            have returns instead of T (not guaranteed positive semi-definite)
+        dtype: Computation dtype (float32 halves the memory of float64)
+        block_size: Tickers per block of the X'X product
+
+    Returns:
+        N x N covariance (DataFrame when returns is one)
+    """
+    X = _demeaned(returns, dtype)
+    S = gram(X, block_size=block_size)
+    if pairwise:
+        mask = np.isfinite(np.asarray(returns, dtype=dtype)).astype(dtype)
+        S /= np.maximum(gram(mask, block_size=block_size), 1)
+    else:
+        S /= len(X)
+    return _wrap(S, returns)
+
+
+def ledoit_wolf(returns, dtype=np.float32, block_size=1024):
+    """Ledoit-Wolf shrinkage of the sample covariance toward a scaled identity.
+
+    Args:
+        returns: (period x ticker) returns (DataFrame or array; NaN allowed)
+        dtype: Computation dtype
+        block_size: Tickers per block of the X'X product
+
+    Returns:
+        (cov, shrinkage): covariance matrix (DataFrame when returns is one)
+        and the shrinkage intensity in [0, 1]
+    """
+    X = _demeaned(returns, dtype)
+    T = len(X)
+    S = gram(X, block_size=block_size)
+    S /= T
+    fourth_moment = float(np.mean(np.sum(X.astype(np.float64) ** 2, axis=1) ** 2))
+    S, shrinkage = _shrink(S, fourth_moment, T)
+    return _wrap(S, returns), shrinkage
+
+
+def ewma_weights(T, halflife):
+    """Weights of T periods (oldest first) decaying by half every halflife periods, summing to 1."""
+    decay = 0.5 ** (1.0 / halflife)
+    weights = decay ** np.arange(T - 1, -1, -1, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def ewma_covariance(returns, halflife=12, dtype=np.float32, block_size=1024):
+    """Exponentially weighted covariance, recent periods weighted most.
+
+    Args:
+        returns: (period x ticker) returns (DataFrame or array; NaN allowed)
+        halflife: Periods for a weight to halve
+        dtype: Computation dtype
+        block_size: Tickers per block of the X'X product
+
+    Returns:
+        N x N covariance (DataFrame when returns is one)
+    """
+    weights = ewma_weights(len(returns), halflife)
+    X = _demeaned(returns, dtype, weights)
+    S = gram(X * np.sqrt(weights).astype(dtype)[:, None], block_size=block_size)
+    return _wrap(S, returns)
+
+
+def pca_covariance(returns, n_factors=10, dtype=np.float32, min_specific=1e-8,
+                   return_factors=False):
+    """Statistical factor-model covariance B F B' + diag(specific).
+
+    The factors are the top principal components of the demeaned returns,
+    from a thin SVD of the (period x ticker) matrix, which is cheap because
+    there are far fewer periods than tickers.
+
+    Args:
+        returns: (period x ticker) returns (DataFrame or array; NaN allowed)
+        n_factors: Number of principal components
+        dtype: Computation dtype
+        min_specific: Floor of the specific variances
+        return_factors: Return the factor model instead of the N x N matrix
+
+    Returns:
+        N x N covariance (DataFrame when returns is one), or with
+        return_factors (loadings N x k, factor variances k, specific N)
+    """
+    X = _demeaned(returns, dtype)
+    T = len(X)
+    _, s, Vt = np.linalg.svd(X, full_matrices=False)
+    k = min(n_factors, len(s))
+    loadings = Vt[:k].T
+    factor_variance = (s[:k] ** 2 / T).astype(dtype)
+    total = (X ** 2).sum(axis=0) / T
+    specific = np.maximum(total - (loadings ** 2) @ factor_variance, min_specific).astype(dtype)
+    if return_factors:
+        return loadings, factor_variance, specific
+    S = (loadings * factor_variance) @ loadings.T
+    S[np.diag_indices_from(S)] += specific
+    return _wrap(S, returns)
+
+
+class RollingCovariance:
+    """Covariance over the last `window` periods, updated one period at a time.
+
+    Keeps the window's rows and the Gram matrices X'X, X'M and M'M of the
+    zero-filled returns X and the availability mask M, so adding a period
+    and dropping the oldest are rank-one updates. covariance() and
+    ledoit_wolf() equal sample_covariance() and ledoit_wolf() of the window.
+
+    Args:
+        tickers: Universe (fixed; returns of other tickers are ignored)
+        window: Periods in the window
+        dtype: Storage and computation dtype
+    """
+
+    def __init__(self, tickers, window, dtype=np.float32):
+        self.tickers = pd.Index(tickers)
+        self.window = window
+        self.dtype = dtype
+        n = len(self.tickers)
+        self.rows = []
+        self.XtX = np.zeros((n, n), dtype=dtype)
+        self.XtM = np.zeros((n, n), dtype=dtype)
+        self.MtM = np.zeros((n, n), dtype=dtype)
+        self.sums = np.zeros(n, dtype=np.float64)
+        self.counts = np.zeros(n, dtype=np.float64)
+
+    @classmethod
+    def from_returns(cls, returns, window=None, dtype=np.float32):
+        """State after the periods of a (period x ticker) DataFrame."""
+        state = cls(returns.columns, window or len(returns), dtype)
+        for _, row in returns.iloc[-state.window:].iterrows():
+            state.update(row)
+        return state
+
+    def _add(self, x, sign):
+        m = np.isfinite(x)
+        x0 = np.where(m, x, 0).astype(self.dtype)
+        m = m.astype(self.dtype)
+        for matrix, left, right in ((self.XtX, x0, x0), (self.XtM, x0, m), (self.MtM, m, m)):
+            for start in range(0, len(x0), 1024):
+                matrix[start:start + 1024] += sign * np.outer(left[start:start + 1024], right)
+        self.sums += sign * x0
+        self.counts += sign * m
+
+    def update(self, returns):
+        """Add one period (Series indexed by ticker, or an array aligned with tickers)."""
+        if isinstance(returns, pd.Series):
+            returns = returns.reindex(self.tickers)
+        x = np.asarray(returns, dtype=self.dtype)
+        self.rows.append(x)
+        self._add(x, 1)
+        if len(self.rows) > self.window:
+            self._add(self.rows.pop(0), -1)
+
+    def _scatter(self):
+        """sum_t of outer products of the demeaned, zero-filled rows."""
+        mean = (self.sums / np.maximum(self.counts, 1)).astype(self.dtype)
+        S = self.XtX.copy()
+        for start in range(0, len(mean), 1024):
+            block = slice(start, start + 1024)
+            S[block] -= self.XtM[block] * mean[None, :]
+            S[block] -= self.XtM[:, block].T * mean[block, None]
+            S[block] += self.MtM[block] * np.outer(mean[block], mean)
+        return S, mean
+
+    def covariance(self):
+        """Sample covariance of the window (DataFrame)."""
+        S, _ = self._scatter()
+        S /= len(self.rows)
+        return pd.DataFrame(S, index=self.tickers, columns=self.tickers)
+
+    def ledoit_wolf(self):
+        """Ledoit-Wolf shrunk covariance of the window: (DataFrame, shrinkage)."""
+        S, mean = self._scatter()
+        T = len(self.rows)
+        S /= T
+        X = np.array(self.rows, dtype=np.float64)
+        X = np.where(np.isfinite(X), X - mean, 0.0)
+        fourth_moment = float(np.mean(np.sum(X ** 2, axis=1) ** 2))
+        S, shrinkage = _shrink(S, fourth_moment, T)
+        return pd.DataFrame(S, index=self.tickers, columns=self.tickers), shrinkage
+
+
+class EwmaCovariance:
+    """RiskMetrics-style exponentially weighted covariance with O(N^2) updates.
+
+    update() applies mean <- mean + (1 - decay) d and
+    cov <- decay * cov + (1 - decay) d d' with d = r - mean (0 where a
+    return is missing). from_returns() starts from ewma_covariance() of a
+    history.
+
+    Args:
+        tickers: Universe (fixed)
+        halflife: Periods for a weight to halve
+        dtype: Storage dtype
+    """
+
+    def __init__(self, tickers, halflife=12, dtype=np.float32):
+        self.tickers = pd.Index(tickers)
+        self.decay = 0.5 ** (1.0 / halflife)
+        self.dtype = dtype
+        n = len(self.tickers)
+        self.mean = np.zeros(n, dtype=dtype)
+        self.cov = np.zeros((n, n), dtype=dtype)
+
+    @classmethod
+    def from_returns(cls, returns, halflife=12, dtype=np.float32):
+        """State initialised with the weighted mean and covariance of a history."""
+        state = cls(returns.columns, halflife, dtype)
+        weights = ewma_weights(len(returns), halflife)
+        X = np.asarray(returns, dtype=np.float64)
+        valid = np.isfinite(X)
+        w = valid * weights[:, None]
+        state.mean = ((np.where(valid, X, 0) * w).sum(axis=0)
+                      / np.maximum(w.sum(axis=0), 1e-300)).astype(dtype)
+        state.cov = np.asarray(ewma_covariance(X, halflife, dtype))
+        return state
+
+    def update(self, returns):
+        """Add one period (Series indexed by ticker, or an array aligned with tickers)."""
+        if isinstance(returns, pd.Series):
+            returns = returns.reindex(self.tickers)
+        x = np.asarray(returns, dtype=self.dtype)
+        d = np.where(np.isfinite(x), x - self.mean, 0).astype(self.dtype)
+        self.mean += (1 - self.decay) * d
+        self.cov *= self.decay
+        for start in range(0, len(d), 1024):
+            self.cov[start:start + 1024] += (1 - self.decay) * np.outer(d[start:start + 1024], d)
+
+    def covariance(self):
+        """Current covariance (DataFrame)."""
+        return pd.DataFrame(self.cov.copy(), index=self.tickers, columns=self.tickers)
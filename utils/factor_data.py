@@ -0,0 +1,108 @@
+"""Fama-French factor data: local cache and vectorized compounding.
+
+Daily factor files are downloaded once from Ken French's data library (via
+pandas_datareader) and kept as Parquet in a local cache directory, so later
+runs work offline; pass refresh=True to download again.
+
+compound() turns daily returns into returns over any periods (ISO weeks,
+months or custom labels) in one pass: rows are ordered by period, and the
+growth factors (1 + r) of all columns are multiplied within each period by
+a single np.multiply.reduceat call. This gives the same numbers as
+groupby(period).apply(lambda x: (1 + x[col]).prod() - 1) without a Python
+call per period.
+
+Usage:
+    from utils.factor_data import load_daily_factors, compound
+    daily = load_daily_factors()                       # percent, as published
+    daily[FACTORS] = daily[FACTORS] / 100
+    weekly = compound(daily, 'week')                   # ISO weeks 'YYYY-WW'
+    monthly = compound(daily, 'month')                 # 'YYYY-MM'
+"""
+import os
+import numpy as np
+import pandas as pd
+
+FF5_DAILY = 'F-F_Research_Data_5_Factors_2x3_daily'
+FACTORS = ['Mkt-RF', 'SMB', 'HML', 'RMW', 'CMA', 'RF']
+
+
+def load_daily_factors(dataset=FF5_DAILY, start='1960-01-01', cache_dir='.factor_cache',
+                       refresh=False):
+    """Daily factor returns from the local cache, downloading them if needed.
+
+    Args:
+        dataset: Ken French data library dataset name
+        start: First date requested when downloading
+        cache_dir: Directory of the cached Parquet files
+        refresh: Download again even if a cached file exists
+
+    Returns:
+        DataFrame with a 'date' column and one column per factor (percent)
+    """
+    path = os.path.join(cache_dir, f"{dataset}.parquet")
+    if os.path.exists(path) and not refresh:
+        return pd.read_parquet(path)
+
+    import pandas_datareader as pdr
+    factors = pdr.DataReader(dataset, 'famafrench', start=start)[0]
+    factors = factors.reset_index().rename(columns={'Date': 'date'})
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    factors.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return factors
+
+
+def period_labels(dates, freq):
+    """Period label of each date.
+
+    Args:
+        dates: datetime Series
+        freq: 'week' (ISO 'YYYY-WW') or 'month' ('YYYY-MM')
+
+    Returns:
+        Series of string labels
+    """
+    if freq == 'week':
+        iso = dates.dt.isocalendar()
+        return iso['year'].astype(str) + '-' + iso['week'].astype(str).str.zfill(2)
+    if freq == 'month':
+        return dates.dt.strftime('%Y-%m')
+    raise ValueError(f"Unknown frequency {freq!r}; use 'week', 'month' or an array of labels")
+
+
+def compound(df, period, columns=None, date_col='date'):
+    """Compound returns within each period.
+
+    Args:
+        df: Returns (decimals) with a date column, in date order
+        period: 'week', 'month', or an array of period labels aligned with df
+        columns: Return columns to compound (default: all but the date column)
+        date_col: Date column
+
+    Returns:
+        DataFrame with one row per period, sorted by label: the period
+        label (column 'week', 'month' or 'period'), the compounded returns
+        prod(1 + r) - 1, and the period's start_date and end_date
+    """
+    columns = [col for col in df.columns if col != date_col] if columns is None else columns
+    if isinstance(period, str):
+        name, labels = period, period_labels(df[date_col], period)
+    else:
+        name, labels = 'period', pd.Series(period, index=df.index)
+
+    # Group rows by sorted label; the stable sort keeps each period's days in order
+    codes, uniques = pd.factorize(labels.to_numpy(), sort=True)
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(len(uniques)))
+
+    growth = 1 + df[columns].to_numpy(dtype=np.float64)[order]
+    compounded = np.multiply.reduceat(growth, starts, axis=0) - 1
+    dates = df[date_col].to_numpy()[order]
+    ticks = dates.view(np.int64)
+
+    result = pd.DataFrame(compounded, columns=columns)
+    result.insert(0, name, uniques)
+    result['start_date'] = np.minimum.reduceat(ticks, starts).view(dates.dtype)
+    result['end_date'] = np.maximum.reduceat(ticks, starts).view(dates.dtype)
+    return result
@@ -0,0 +1,174 @@
+"""Batched time-series factor regressions for many portfolios.
+
+Every portfolio is regressed on the same factors (e.g. decile excess
+returns on Mkt-RF, or on the five Fama-French factors), so the regressions
+differ only in the left-hand side and in which periods are missing. All
+portfolios are solved together: per-portfolio normal equations X'X and X'y
+are built with one einsum over the missing-value mask and inverted in one
+batched np.linalg.inv call. Rolling regressions take every window's X'X and
+X'y as differences of cumulative sums, so all windows x portfolios are
+solved in the same batched call.
+
+Standard errors are either the usual OLS ones (as statsmodels OLS().fit())
+or Newey-West HAC with Bartlett weights and normal p-values (as
+fit(cov_type='HAC', cov_kwds={'maxlags': lags})). Missing returns are
+dropped per portfolio; for the HAC lags they are treated as zero
+residuals, which matches statsmodels when the missing periods are at the
+ends of the sample.
+
+Usage:
+    from utils.factor_regression import factor_regression, rolling_factor_regression
+    wide = portfolios.pivot(index='month', columns='decile', values='return')
+    capm = factor_regression(wide, ff5[['Mkt-RF', 'RF']], rf='RF', lags=6)
+    capm['params'], capm['tvalues']
+    rolling = rolling_factor_regression(wide, ff5[['Mkt-RF', 'RF']], window=36, rf='RF')
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+CONSTANT = 'const'
+
+
+def _design(returns, factors, rf):
+    """Aligned excess returns (T x N), regressors with a constant (T x K) and their mask."""
+    returns = pd.DataFrame(returns)
+    factors = pd.DataFrame(factors)
+    index = returns.index.intersection(factors.index, sort=False)
+    returns, factors = returns.loc[index], factors.loc[index]
+    y = returns.to_numpy(dtype=np.float64)
+    if rf is not None:
+        y = y - factors[[rf]].to_numpy(dtype=np.float64)
+        factors = factors.drop(columns=[rf])
+    terms = [CONSTANT] + list(factors.columns)
+    X = np.column_stack([np.ones(len(index)), factors.to_numpy(dtype=np.float64)])
+    valid = np.isfinite(y) & np.isfinite(X).all(axis=1, keepdims=True)
+    X = np.where(np.isfinite(X), X, 0.0)
+    return returns, index, terms, X, np.where(valid, y, 0.0), valid.astype(np.float64)
+
+
+def newey_west_meat(X, residuals, lags):
+    """HAC 'meat' sum_l w_l sum_t (u_t u_{t-l}' + u_{t-l} u_t') for every portfolio.
+
+    Args:
+        X: Regressors, shape (T, K)
+        residuals: Residuals, shape (T, N) (0 where missing)
+        lags: Bartlett lags
+
+    Returns:
+        Array of shape (N, K, K)
+    """
+    u = residuals[:, :, None] * X[:, None, :]
+    meat = np.einsum('tnk,tnl->nkl', u, u)
+    for lag in range(1, lags + 1):
+        gamma = np.einsum('tnk,tnl->nkl', u[lag:], u[:-lag])
+        meat += (1 - lag / (lags + 1)) * (gamma + gamma.transpose(0, 2, 1))
+    return meat
+
+
+def factor_regression(returns, factors, rf=None, lags=None, correction=False):
+    """Full-sample regression of every portfolio on the factors.
+
+    Args:
+        returns: Wide DataFrame (period x portfolio) of returns
+        factors: DataFrame of factor returns indexed like returns
+        rf: Optional risk-free column in factors, subtracted from returns
+            and not used as a regressor
+        lags: Newey-West lags (None: OLS standard errors)
+        correction: Scale the HAC covariance by n / (n - k) (statsmodels'
+            use_correction)
+
+    Returns:
+        Dict of DataFrames indexed by portfolio: 'params', 'bse', 'tvalues',
+        'pvalues' (columns: const and the factors) and Series 'rsquared',
+        'nobs'
+    """
+    returns, _, terms, X, y, mask = _design(returns, factors, rf)
+    XtX = np.einsum('tn,tk,tl->nkl', mask, X, X)
+    Xty = np.einsum('tn,tk->nk', y, X)
+    XtX_inv = np.linalg.inv(XtX)
+    params = np.einsum('nkl,nl->nk', XtX_inv, Xty)
+
+    residuals = (y - X @ params.T) * mask
+    nobs = mask.sum(axis=0)
+    dof = nobs - len(terms)
+    ssr = (residuals ** 2).sum(axis=0)
+    if lags is None:
+        cov = XtX_inv * (ssr / dof)[:, None, None]
+    else:
+        meat = newey_west_meat(X, residuals, lags)
+        cov = XtX_inv @ meat @ XtX_inv
+        if correction:
+            cov *= (nobs / dof)[:, None, None]
+
+    bse = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    tvalues = params / bse
+    if lags is None:
+        pvalues = 2 * stats.t.sf(np.abs(tvalues), dof[:, None])
+    else:
+        pvalues = 2 * stats.norm.sf(np.abs(tvalues))
+    y_mean = y.sum(axis=0) / nobs
+    centered = (((y - y_mean) * mask) ** 2).sum(axis=0)
+
+    def frame(values):
+        return pd.DataFrame(values, index=returns.columns, columns=terms)
+
+    return {
+        'params': frame(params),
+        'bse': frame(bse),
+        'tvalues': frame(tvalues),
+        'pvalues': frame(pvalues),
+        'rsquared': pd.Series(1 - ssr / centered, index=returns.columns),
+        'nobs': pd.Series(nobs.astype(np.int64), index=returns.columns),
+    }
+
+
+def rolling_factor_regression(returns, factors, window, rf=None, min_periods=None):
+    """Rolling-window regressions of every portfolio, all windows solved at once.
+
+    Args:
+        returns: Wide DataFrame (period x portfolio) of returns
+        factors: DataFrame of factor returns indexed like returns
+        window: Window length in periods
+        rf: Optional risk-free column (see factor_regression)
+        min_periods: Fewest observations for a coefficient (default: window)
+
+    Returns:
+        Dict of long DataFrames indexed by (period, portfolio), where period
+        is the last period of the window: 'params' and 'bse' (OLS standard
+        errors), columns const and the factors
+    """
+    returns, index, terms, X, y, mask = _design(returns, factors, rf)
+    min_periods = window if min_periods is None else min_periods
+    n_terms = len(terms)
+
+    def windowed(values):
+        # Window sums as differences of cumulative sums along the period axis
+        total = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+        stop = np.arange(1, len(values) + 1)
+        return total[stop] - total[np.maximum(stop - window, 0)]
+
+    XtX = windowed(np.einsum('tn,tk,tl->tnkl', mask, X, X))
+    Xty = windowed(np.einsum('tn,tk->tnk', y, X))
+    yty = windowed(y ** 2)
+    nobs = windowed(mask)
+
+    ok = nobs >= max(min_periods, n_terms + 1)
+    XtX[~ok] = np.eye(n_terms)
+    XtX_inv = np.linalg.inv(XtX)
+    params = np.einsum('tnkl,tnl->tnk', XtX_inv, Xty)
+    # SSR = y'y - b'X'y for the least-squares b
+    ssr = np.maximum(yty - np.einsum('tnk,tnk->tn', params, Xty), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma2 = ssr / (nobs - n_terms)
+    # Windows with too few observations have nobs <= n_terms (negative sigma2)
+    sigma2[~ok] = np.nan
+    bse = np.sqrt(np.diagonal(XtX_inv, axis1=2, axis2=3) * sigma2[:, :, None])
+    params[~ok] = np.nan
+
+    long_index = pd.MultiIndex.from_product([index, returns.columns],
+                                            names=[index.name, returns.columns.name])
+    return {
+        'params': pd.DataFrame(params.reshape(-1, n_terms), index=long_index, columns=terms),
+        'bse': pd.DataFrame(bse.reshape(-1, n_terms), index=long_index, columns=terms),
+    }
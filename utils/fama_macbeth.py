@@ -0,0 +1,153 @@
+"""Vectorized Fama-MacBeth cross-sectional regressions.
+
+Stage 1 regresses the return on the characteristics separately in every
+period. Instead of one OLS per period, the period-sorted panel is laid out
+as a zero-padded (period x stock x characteristic) tensor, so all periods'
+normal equations X'X and X'y come from one batched matmul and are solved in
+one batched np.linalg.solve. Padding rows are zero and add nothing to the
+sums. Periods are processed in blocks so the padded tensor stays below
+block_values floats.
+
+Stage 2 reports the time-series mean of each coefficient with its standard
+error sd / sqrt(T) and t-statistic, or Newey-West standard errors of the
+mean with Bartlett weights when lags are given.
+
+Usage:
+    from utils.fama_macbeth import fama_macbeth
+    summary, coefficients = fama_macbeth(df_ranked, 'month', features, 'return', lags=6)
+"""
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+CONSTANT = 'const'
+
+
+def cross_sectional_ols(X, y, offsets, block_values=20_000_000):
+    """OLS of y on [1, X] within every period, all periods batched.
+
+    Args:
+        X: Characteristics, shape (n_rows, K), rows sorted by period (no NaN)
+        y: Returns aligned with X (no NaN)
+        offsets: Row offset of each period (length n_periods + 1)
+        block_values: Largest padded tensor (floats) built at once
+
+    Returns:
+        (coefficients, nobs, rsquared): arrays of shape (n_periods, K + 1),
+        (n_periods,) and (n_periods,); NaN coefficients where a period has
+        no more observations than coefficients or a singular X'X
+    """
+    X = np.column_stack([np.ones(len(X)), np.asarray(X, dtype=np.float64)])
+    y = np.asarray(y, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_periods, n_terms = len(offsets) - 1, X.shape[1]
+    nobs = np.diff(offsets)
+    XtX = np.zeros((n_periods, n_terms, n_terms))
+    Xty = np.zeros((n_periods, n_terms))
+
+    start = 0
+    while start < n_periods:
+        # Grow the block while the padded tensor fits in block_values
+        stop = start + 1
+        while (stop < n_periods and
+               (stop + 1 - start) * nobs[start:stop + 1].max() * n_terms <= block_values):
+            stop += 1
+        width = nobs[start:stop].max()
+        rows = np.arange(offsets[start], offsets[stop])
+        period = np.repeat(np.arange(stop - start), nobs[start:stop])
+        position = rows - offsets[start:stop][period]
+        Xp = np.zeros((stop - start, width, n_terms))
+        yp = np.zeros((stop - start, width))
+        Xp[period, position] = X[rows]
+        yp[period, position] = y[rows]
+        XtX[start:stop] = np.matmul(Xp.transpose(0, 2, 1), Xp)
+        Xty[start:stop] = np.einsum('pjk,pj->pk', Xp, yp)
+        start = stop
+
+    # Solve all periods at once; periods that cannot be solved get NaN
+    solvable = nobs > n_terms
+    if solvable.any():
+        solvable[solvable] = np.linalg.matrix_rank(XtX[solvable]) == n_terms
+    coefficients = np.full((n_periods, n_terms), np.nan)
+    if solvable.any():
+        coefficients[solvable] = np.linalg.solve(XtX[solvable],
+                                                 Xty[solvable][..., None])[..., 0]
+
+    # R^2 from the same sums: SSR = y'y - b'X'y, SST = y'y - n * mean^2
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    cum_sq = np.concatenate([[0.0], np.cumsum(y ** 2)])
+    sum_y = cum_y[offsets[1:]] - cum_y[offsets[:-1]]
+    yty = cum_sq[offsets[1:]] - cum_sq[offsets[:-1]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ssr = yty - np.einsum('pk,pk->p', coefficients, Xty)
+        sst = yty - sum_y ** 2 / nobs
+        rsquared = 1 - ssr / sst
+    return coefficients, nobs, rsquared
+
+
+def newey_west_se(series, lags):
+    """Newey-West standard error of the mean of each column (NaN rows dropped per column)."""
+    series = np.asarray(series, dtype=np.float64)
+    valid = np.isfinite(series)
+    n = valid.sum(axis=0)
+    demeaned = np.where(valid, series - np.nanmean(series, axis=0), 0.0)
+    variance = (demeaned ** 2).sum(axis=0) / n
+    for lag in range(1, lags + 1):
+        gamma = (demeaned[lag:] * demeaned[:-lag]).sum(axis=0) / n
+        variance += 2 * (1 - lag / (lags + 1)) * gamma
+    return np.sqrt(variance / n)
+
+
+def fama_macbeth(df, period_col, features, target, lags=None, fill_value=None):
+    """Fama-MacBeth regression of target on features over a panel.
+
+    Args:
+        df: Panel with one row per (stock, period)
+        period_col: Period column
+        features: Characteristic columns (e.g. percentile ranks)
+        target: Return column
+        lags: Newey-West lags for the standard errors of the means
+            (None: sd / sqrt(T))
+        fill_value: Value for missing characteristics (e.g. 0.5, the median
+            rank); None drops rows with any missing characteristic. Rows
+            without a return are always dropped
+
+    Returns:
+        (summary, coefficients): summary DataFrame indexed by term (const
+        and features) with mean, std_error, t_stat, p_value and n_periods;
+        coefficients DataFrame (period x term) with the per-period slopes
+        plus nobs and rsquared
+    """
+    df = df.sort_values(period_col, kind='stable')
+    X = df[features].to_numpy(dtype=np.float64)
+    y = df[target].to_numpy(dtype=np.float64)
+    if fill_value is not None:
+        X = np.where(np.isnan(X), fill_value, X)
+    keep = np.isfinite(y) & np.isfinite(X).all(axis=1)
+    X, y = X[keep], y[keep]
+
+    codes, periods = pd.factorize(df[period_col].to_numpy()[keep], sort=True)
+    offsets = np.append(np.searchsorted(codes, np.arange(len(periods))), len(codes))
+    coefficients, nobs, rsquared = cross_sectional_ols(X, y, offsets)
+
+    terms = [CONSTANT] + list(features)
+    n_periods = np.isfinite(coefficients).sum(axis=0)
+    mean = np.nanmean(coefficients, axis=0)
+    if lags is None:
+        std_error = np.nanstd(coefficients, axis=0, ddof=1) / np.sqrt(n_periods)
+    else:
+        std_error = newey_west_se(coefficients, lags)
+    t_stat = mean / std_error
+    summary = pd.DataFrame({
+        'mean': mean,
+        'std_error': std_error,
+        't_stat': t_stat,
+        'p_value': 2 * stats.t.sf(np.abs(t_stat), n_periods - 1),
+        'n_periods': n_periods,
+    }, index=pd.Index(terms, name='term'))
+
+    coefficients = pd.DataFrame(coefficients, index=pd.Index(periods, name=period_col),
+                                columns=terms)
+    coefficients['nobs'] = nobs
+    coefficients['rsquared'] = rsquared
+    return summary, coefficients
@@ -0,0 +1,200 @@
+"""Reusable pre-binned LightGBM dataset for rolling-window training.
+
+The walk-forward loops train one model per window on data that is mostly the
+same as the previous window's. Fitting LGBMRegressor on a fresh pandas slice
+re-does the feature histogram binning every time. The features are percentile
+ranks in [0, 1], so the bin boundaries are stable across windows: the panel is
+binned once and each window trains on a row subset of that binned dataset.
+
+Usage:
+    from utils.lgb_panel import build_panel_dataset, train_window
+    panel = build_panel_dataset(X, y, features, PARAMS)
+    booster = train_window(panel, train_rows, PARAMS)
+    predictions = booster.predict(X[test_rows])
+
+    # Warm start: add 10 trees to the previous window's model
+    booster = train_window(panel, next_rows, PARAMS, init_model=booster,
+                           num_boost_round=10)
+
+    # Ensemble: 5 members with varied seeds/subsampling, trained in parallel
+    model = EnsembleModel(train_ensemble(panel, train_rows, ensemble_params(PARAMS, 5)))
+    predictions = model.predict(X[test_rows])
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import lightgbm as lgb
+
+
+def native_params(params):
+    """Translate an LGBMRegressor parameter dict for lgb.train.
+
+    LightGBM accepts the sklearn names (subsample, colsample_bytree,
+    min_child_samples, ...) as aliases, so only n_estimators needs to move
+    out of the dict and into num_boost_round.
+
+    Args:
+        params: Dict of LGBMRegressor keyword arguments (e.g. PARAMS)
+
+    Returns:
+        (train_params, num_boost_round) tuple
+    """
+    train_params = dict(params)
+    num_boost_round = train_params.pop('n_estimators', 100)
+    # Window subsets may have fewer rows per leaf than the full panel, so
+    # features must not be pre-filtered when the panel is binned
+    train_params['feature_pre_filter'] = False
+    return train_params, num_boost_round
+
+
+def build_panel_dataset(X, y, feature_names, params, categorical_features='auto',
+                        bin_rows=None):
+    """Bin the full panel once and return the constructed LightGBM Dataset.
+
+    Args:
+        X: 2-D float32 NumPy array of features for every row of the panel
+        y: 1-D array of targets (NaN allowed; such rows get label 0)
+        feature_names: List of feature column names
+        params: Dict of LGBMRegressor keyword arguments
+        categorical_features: Categorical feature names (default: 'auto')
+        bin_rows: Row positions (or slice) the bin boundaries are computed
+            from (default: None, all rows). The rest of the panel is binned
+            with those boundaries, so rows outside bin_rows don't move them
+
+    Returns:
+        Constructed lgb.Dataset holding the binned panel
+    """
+    train_params, _ = native_params(params)
+
+    # Rows without a realised return get label 0: the current period's rows
+    # are never trained on, but past rows with a missing return do fall inside
+    # training windows. LightGBM would itself map their NaN labels to 0, so
+    # filling here keeps the labels the per-window DataFrame fits used
+    y = np.asarray(y, dtype=np.float64)
+    label = np.where(np.isfinite(y), y, 0.0)
+
+    # free_raw_data=False keeps a reference to X (not a copy) so warm starts
+    # can compute init scores for a window
+    reference = None
+    if bin_rows is not None:
+        reference = lgb.Dataset(X[bin_rows], label=label[bin_rows],
+                                feature_name=list(feature_names),
+                                categorical_feature=categorical_features,
+                                params=train_params, free_raw_data=False).construct()
+    panel = lgb.Dataset(X, label=label, feature_name=list(feature_names),
+                        categorical_feature=categorical_features,
+                        params=train_params, free_raw_data=False, reference=reference)
+    return panel.construct()
+
+
+def window_dataset(panel, rows):
+    """Return an unconstructed subset of the binned panel for one window.
+
+    Args:
+        panel: Dataset from build_panel_dataset()
+        rows: Integer row positions (into the panel) of the training window
+
+    Returns:
+        lgb.Dataset that reuses the panel's bin mappers
+    """
+    window = panel.subset(np.ascontiguousarray(rows, dtype=np.int32))
+    # Don't slice a copy of the raw panel rows into every window
+    window.free_raw_data = True
+    return window
+
+
+def train_window(panel, rows, params, init_model=None, num_boost_round=None):
+    """Train one rolling-window model on a row subset of the binned panel.
+
+    Args:
+        panel: Dataset from build_panel_dataset()
+        rows: Integer row positions (into the panel) of the training window
+        params: Dict of LGBMRegressor keyword arguments
+        init_model: Booster to continue boosting from (warm start, default: None)
+        num_boost_round: Trees to add (default: params['n_estimators'])
+
+    Returns:
+        Trained lgb.Booster (including init_model's trees when warm-starting)
+    """
+    train_params, n_estimators = native_params(params)
+    if num_boost_round is None:
+        num_boost_round = n_estimators
+    return lgb.train(train_params, window_dataset(panel, rows),
+                     num_boost_round=num_boost_round, init_model=init_model)
+
+
+def ensemble_params(params, n_members, subsample=(0.6, 0.9), colsample=(0.5, 0.9), seed=42):
+    """Member parameters for a bagged multi-seed ensemble.
+
+    Each member gets its own random_state and its own row (bagging every
+    iteration) and feature subsampling fractions drawn from the given ranges.
+
+    Args:
+        params: Dict of LGBMRegressor keyword arguments (e.g. PARAMS)
+        n_members: Number of ensemble members (K)
+        subsample: (low, high) range of row subsampling fractions
+        colsample: (low, high) range of feature subsampling fractions
+        seed: Seed for drawing the fractions and the member seeds
+
+    Returns:
+        List of n_members parameter dicts
+    """
+    rng = np.random.default_rng(seed)
+    return [{**params,
+             'random_state': seed + k,
+             'subsample': round(float(rng.uniform(*subsample)), 3),
+             'subsample_freq': 1,
+             'colsample_bytree': round(float(rng.uniform(*colsample)), 3)}
+            for k in range(n_members)]
+
+
+def train_ensemble(panel, rows, member_params, n_jobs=None):
+    """Train all ensemble members on one window in parallel threads.
+
+    LightGBM releases the GIL while training, so members train concurrently
+    with the cores split between them.
+
+    Args:
+        panel: Dataset from build_panel_dataset()
+        rows: Integer row positions (into the panel) of the training window
+        member_params: List of parameter dicts (e.g. from ensemble_params())
+        n_jobs: Total cores to use (default: all cores)
+
+    Returns:
+        List of trained lgb.Booster, in member order
+    """
+    n_cores = n_jobs or os.cpu_count() or 1
+    threads = max(1, n_cores // len(member_params))
+    with ThreadPoolExecutor(max_workers=min(len(member_params), n_cores)) as pool:
+        futures = [pool.submit(train_window, panel, rows, {**params, 'n_jobs': threads})
+                   for params in member_params]
+        return [future.result() for future in futures]
+
+
+class EnsembleModel:
+    """Average of several boosters with a Booster-like predict().
+
+    Predictions are averaged as a running mean, one member at a time, so
+    memory does not grow with the number of members.
+    """
+
+    def __init__(self, models):
+        self.models = list(models)
+
+    def predict(self, X, **kwargs):
+        mean = None
+        for k, model in enumerate(self.models, start=1):
+            predictions = model.predict(X, **kwargs)
+            mean = predictions if mean is None else mean + (predictions - mean) / k
+        return mean
+
+    def feature_name(self):
+        return self.models[0].feature_name()
+
+    def feature_importance(self, importance_type='split'):
+        """Mean feature importance across members."""
+        return np.mean([model.feature_importance(importance_type=importance_type)
+                        for model in self.models], axis=0)
+
+    def num_trees(self):
+        return sum(model.num_trees() for model in self.models)
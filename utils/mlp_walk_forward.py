@@ -0,0 +1,216 @@
+"""Walk-forward training of sklearn MLPs with warm starts and parallel sweeps.
+
+Features are prepared as in session11C_traintest.ipynb (sector and size
+one-hot encoded, all other columns percentile-ranked within each period)
+and written once as a float32 .npy file. Every window streams shuffled
+mini-batches from the memory-mapped matrix into MLPRegressor.partial_fit,
+so no window's rows are copied into a training set up front. Between
+windows the same network can keep training (warm start: a few epochs on
+the new window instead of a fresh fit), with a fresh fit every
+refit_every windows.
+
+sweep_architectures() trains one architecture per worker process; the
+workers memory-map the same files, and BLAS threads are split between them.
+
+Usage:
+    from utils.mlp_walk_forward import onehot_ranked_panel, write_panel, sweep_architectures
+    df, features = onehot_ranked_panel(pd.read_parquet('data4.parquet'))
+    paths = write_panel(df, features, 'return', 'month', '.mlp_cache')
+    results, predictions = sweep_architectures(paths, [(10,), (20, 10)], train_size=12)
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.neural_network import MLPRegressor
+from threadpoolctl import threadpool_limits
+
+# Per-process memory-mapped panel loaded once by _init_worker()
+_STATE = {}
+
+
+def onehot_ranked_panel(df, period_col='month', categorical=('sector', 'size'),
+                        drop=('close', 'industry')):
+    """Panel in the MLP layout of session11C_traintest.ipynb.
+
+    Args:
+        df: Raw panel (e.g. data4.parquet)
+        period_col: Period column (default: 'month')
+        categorical: Columns one-hot encoded and left as 0/1
+        drop: Columns removed first (default: close, and industry, which has
+            too many categories)
+
+    Returns:
+        (df, features): panel sorted by (period, ticker) with the target
+        'return' ranked, and the list of feature columns (ranked numeric
+        columns, then dummies); rows without a return are dropped
+    """
+    df = df.drop(columns=[col for col in drop if col in df.columns])
+    df = pd.get_dummies(df, columns=list(categorical), drop_first=False, dtype=np.float32)
+    dummies = [col for col in df.columns if col.startswith(tuple(f"{c}_" for c in categorical))]
+    cols_to_rank = [col for col in df.columns
+                    if col not in ['ticker', period_col] and col not in dummies]
+    for col in cols_to_rank:
+        df[col] = df.groupby(period_col)[col].rank(pct=True)
+    # The network needs complete rows: drop unknown targets (e.g. the current
+    # period) and put missing features at the median rank
+    df = df[df['return'].notna()].copy()
+    features = [col for col in cols_to_rank if col != 'return']
+    df[features] = df[features].fillna(0.5)
+    df = df.sort_values([period_col, 'ticker'], kind='stable').reset_index(drop=True)
+    return df, features + dummies
+
+
+def write_panel(df, features, target, period_col, directory):
+    """Write the feature matrix, target and period offsets for memory-mapping.
+
+    Args:
+        df: Panel sorted by period
+        features: Feature columns
+        target: Target column
+        period_col: Period column
+        directory: Output directory (created if missing)
+
+    Returns:
+        Dict of paths {'X', 'y', 'offsets'} plus the 'periods' array
+    """
+    os.makedirs(directory, exist_ok=True)
+    period_values = df[period_col].to_numpy()
+    periods = pd.unique(period_values)
+    offsets = np.append(np.searchsorted(period_values, periods), len(df))
+    paths = {name: os.path.join(directory, f"{name}.npy") for name in ['X', 'y', 'offsets']}
+    np.save(paths['X'], df[features].to_numpy(dtype=np.float32))
+    np.save(paths['y'], df[target].to_numpy(dtype=np.float32))
+    np.save(paths['offsets'], offsets)
+    return {**paths, 'periods': periods}
+
+
+def iter_batches(n_rows, batch_size, rng):
+    """Shuffled mini-batch row positions (relative to the window start)."""
+    order = rng.permutation(n_rows)
+    for start in range(0, n_rows, batch_size):
+        yield np.sort(order[start:start + batch_size])
+
+
+def train_epochs(model, X, y, start, stop, epochs, batch_size, rng):
+    """Stream mini-batches of rows start:stop into model.partial_fit."""
+    for _ in range(epochs):
+        for batch in iter_batches(stop - start, batch_size, rng):
+            rows = start + batch
+            # Sorted positions keep the reads from the memory map sequential
+            # partial_fit takes one step per batch_size rows; matching it to
+            # the batch avoids sklearn's clipping warning on the short last one
+            model.batch_size = len(rows)
+            model.partial_fit(X[rows], y[rows])
+    return model
+
+
+def walk_forward_mlp(X, y, offsets, hidden_layer_sizes, train_size, step=1, end=None,
+                     epochs=20, warm_epochs=5, refit_every=None, batch_size=256,
+                     alpha=1e-4, learning_rate_init=1e-3, seed=42):
+    """Train and predict one architecture over every walk-forward window.
+
+    Args:
+        X, y: Feature matrix and target (may be memory-mapped)
+        offsets: Row offset of each period (length n_periods + 1)
+        hidden_layer_sizes: MLP architecture, e.g. (20, 10)
+        train_size, step, end: Walk-forward splits (see WalkForward.windows)
+        epochs: Passes over a window when a network is trained from scratch
+        warm_epochs: Passes over a window when the previous window's network
+            continues training (None disables warm starts)
+        refit_every: Train from scratch every N windows when warm-starting
+            (default: never after the first window)
+        batch_size: Rows per mini-batch
+        alpha, learning_rate_init: MLPRegressor regularization and step size
+        seed: Random seed (network initialization and batch order)
+
+    Returns:
+        (predictions, fit_times, predict_times): predictions for rows
+        offsets[train_size] to offsets[end] (NaN where not predicted) and the
+        per-window timings
+    """
+    end = len(offsets) - 1 if end is None else end
+    rng = np.random.default_rng(seed)
+    first = offsets[train_size]
+    predictions = np.full(offsets[end] - first, np.nan)
+    fit_times, predict_times = [], []
+    model = None
+    for n, train_stop in enumerate(range(train_size, end, step)):
+        train_start, predict_stop = train_stop - train_size, min(train_stop + step, end)
+        start = time.perf_counter()
+        if model is None or not warm_epochs or (refit_every and n % refit_every == 0):
+            model = MLPRegressor(hidden_layer_sizes=hidden_layer_sizes, activation='relu',
+                                 solver='adam', alpha=alpha, batch_size=batch_size,
+                                 learning_rate_init=learning_rate_init, random_state=seed)
+            n_epochs = epochs
+        else:
+            n_epochs = warm_epochs
+        train_epochs(model, X, y, offsets[train_start], offsets[train_stop],
+                     n_epochs, batch_size, rng)
+        fit_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        block = slice(offsets[train_stop], offsets[predict_stop])
+        predictions[block.start - first:block.stop - first] = model.predict(np.asarray(X[block]))
+        predict_times.append(time.perf_counter() - start)
+    return predictions, fit_times, predict_times
+
+
+def oos_r2(y, predictions):
+    """Out-of-sample R^2 over the predicted rows."""
+    keep = np.isfinite(y) & np.isfinite(predictions)
+    y, predictions = y[keep], predictions[keep]
+    return 1 - np.sum((y - predictions) ** 2) / np.sum((y - y.mean()) ** 2)
+
+
+def _init_worker(paths, threads):
+    threadpool_limits(threads)
+    _STATE['X'] = np.load(paths['X'], mmap_mode='r')
+    _STATE['y'] = np.load(paths['y'], mmap_mode='r')
+    _STATE['offsets'] = np.load(paths['offsets'])
+
+
+def _run_architecture(hidden_layer_sizes, kwargs):
+    offsets = _STATE['offsets']
+    start = time.perf_counter()
+    predictions, fit_times, predict_times = walk_forward_mlp(
+        _STATE['X'], _STATE['y'], offsets, hidden_layer_sizes, **kwargs)
+    wall = time.perf_counter() - start
+    end = kwargs.get('end') or len(offsets) - 1
+    y = np.asarray(_STATE['y'][offsets[kwargs['train_size']]:offsets[end]], dtype=np.float64)
+    return {
+        'architecture': str(hidden_layer_sizes),
+        'windows': len(fit_times),
+        'oos_r2': oos_r2(y, predictions),
+        'total_fit_s': float(np.sum(fit_times)),
+        'mean_fit_s': float(np.mean(fit_times)),
+        'mean_predict_s': float(np.mean(predict_times)),
+        'wall_s': wall,
+    }, predictions
+
+
+def sweep_architectures(paths, architectures, n_workers=None, **kwargs):
+    """Walk-forward results of several architectures, one worker process each.
+
+    Args:
+        paths: Dict from write_panel()
+        architectures: List of hidden_layer_sizes tuples
+        n_workers: Worker processes (default: all cores, at most one per architecture)
+        **kwargs: Passed to walk_forward_mlp() (train_size is required)
+
+    Returns:
+        (results, predictions): DataFrame with one row per architecture
+        (windows, OOS R^2, fit/predict timings) and a dict of architecture
+        -> out-of-sample prediction array
+    """
+    n_workers = min(n_workers or os.cpu_count() or 1, len(architectures))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    paths = {name: paths[name] for name in ['X', 'y', 'offsets']}
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(paths, threads)) as pool:
+        futures = [pool.submit(_run_architecture, tuple(arch), kwargs) for arch in architectures]
+        outputs = [future.result() for future in futures]
+    results = pd.DataFrame([row for row, _ in outputs]).set_index('architecture')
+    predictions = {row['architecture']: p for row, p in outputs}
+    return results, predictions
@@ -0,0 +1,107 @@
+"""Content-addressed cache for walk-forward window models and predictions.
+
+Each window model is stored under a key hashed from everything that determines
+it: the training rows, the feature list, the LightGBM parameters and the
+LightGBM version (plus the parent model's key when warm-starting). Models
+trained on a subset of a pre-binned panel also depend on the panel's bin
+edges, so callers fold a digest of the rows the bins were computed from into
+the rows digest (see WalkForward.training_digest()). Predictions are stored
+under the model key combined with a hash of the rows being scored. Re-running
+a pipeline with unchanged inputs loads every window's predictions from disk;
+changing one parameter retrains only the windows whose keys changed, and
+changing the rows the bins come from retrains every window.
+
+Usage:
+    from utils.model_cache import ModelCache, digest_arrays
+    cache = ModelCache('.model_cache')
+    key = cache.model_key(digest_arrays(X_train, y_train), features, PARAMS)
+    model = cache.load_model(key)          # None on a cache miss
+    cache.save_model(key, model)
+"""
+import hashlib
+import json
+import os
+import numpy as np
+import lightgbm as lgb
+
+
+def digest_arrays(*arrays):
+    """SHA-256 hex digest of the contents, dtypes and shapes of NumPy arrays."""
+    h = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        h.update(f"{array.dtype}{array.shape}".encode())
+        h.update(memoryview(array).cast('B'))
+    return h.hexdigest()
+
+
+def digest_values(*values):
+    """SHA-256 hex digest of JSON-serializable values (dict keys sorted)."""
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ModelCache:
+    """On-disk store of LightGBM boosters (native text format) and predictions."""
+
+    def __init__(self, directory='.model_cache'):
+        """
+        Args:
+            directory: Cache directory (created if missing)
+        """
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'models'), exist_ok=True)
+        os.makedirs(os.path.join(directory, 'predictions'), exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def model_key(self, rows_digest, features, params, parent_key=None, num_boost_round=None):
+        """Key of a window model.
+
+        Args:
+            rows_digest: Digest of the training rows (features and target)
+                and of anything else the training data depends on, such as
+                the panel the bins were built from
+            features: List of feature names
+            params: Dict of LightGBM parameters
+            parent_key: Key of the init_model when warm-starting (default: None)
+            num_boost_round: Trees added on top of the parent (default: None)
+        """
+        return digest_values(rows_digest, list(features), params, lgb.__version__,
+                             parent_key, num_boost_round)
+
+    def prediction_key(self, model_key, rows_digest):
+        """Key of one model's predictions for a block of rows."""
+        return digest_values(model_key, rows_digest)
+
+    def _path(self, kind, key, extension):
+        return os.path.join(self.directory, kind, f"{key}{extension}")
+
+    def load_model(self, key):
+        """Cached Booster for key, or None on a miss."""
+        path = self._path('models', key, '.txt')
+        if not os.path.exists(path):
+            return None
+        return lgb.Booster(model_file=path)
+
+    def save_model(self, key, model):
+        """Store a Booster in LightGBM's native text format."""
+        path = self._path('models', key, '.txt')
+        model.save_model(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def load_predictions(self, key):
+        """Cached prediction array for key, or None on a miss."""
+        path = self._path('predictions', key, '.npy')
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return np.load(path)
+
+    def save_predictions(self, key, predictions):
+        """Store a prediction array."""
+        path = self._path('predictions', key, '.npy')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, predictions)
+        os.replace(path + '.tmp', path)
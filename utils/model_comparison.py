@@ -0,0 +1,173 @@
+"""Model-family comparison on shared walk-forward splits.
+
+The ranked panel is prepared once and written as memory-mapped .npy files
+(features, ranked target, raw returns, period offsets); every worker process
+maps the same files, so each model family trains and predicts on exactly
+the same rows without re-reading or re-ranking the data. Each model runs
+every walk-forward window in one worker, and all models are scored the same
+way: mean rank IC and mean top-minus-bottom portfolio spread of the raw
+returns (utils/param_search.py window_metrics), plus fit and predict times.
+
+Families:
+    'lightgbm': Booster trained on a row subset of a panel binned once per
+        worker (utils/lgb_panel.py); config is an LGBMRegressor parameter dict
+    'mlp': sklearn MLPRegressor via utils/mlp_walk_forward.py; config holds
+        walk_forward_mlp() keyword arguments (e.g. hidden_layer_sizes). It
+        trains on the shared ranked matrix, so categorical columns such as
+        sector and size are ranks, not one-hot columns
+    'linear': sklearn LinearRegression; config is ignored
+sklearn families see missing ranks as 0.5 (the median rank).
+
+Usage:
+    from utils.model_comparison import write_shared, compare
+    paths = write_shared(X, y, raw_returns, offsets, '.compare_cache')
+    table = compare(paths, [('LightGBM', 'lightgbm', PARAMS),
+                            ('Linear', 'linear', {})], train_size=12)
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from threadpoolctl import threadpool_limits
+from utils.lgb_panel import build_panel_dataset, train_window
+from utils.mlp_walk_forward import walk_forward_mlp
+from utils.param_search import window_metrics
+
+# Per-process memory-mapped panel loaded once by _init_worker()
+_STATE = {}
+
+
+def write_shared(X, y, returns, offsets, directory):
+    """Write the shared panel arrays once for the worker processes.
+
+    Args:
+        X: Feature matrix (rows sorted by period; NaN allowed)
+        y: Training target (e.g. ranked return)
+        returns: Raw returns used for scoring
+        offsets: Row offset of each period (length n_periods + 1)
+        directory: Output directory (created if missing)
+
+    Returns:
+        Dict of .npy paths {'X', 'X_filled', 'y', 'returns', 'offsets'}
+    """
+    os.makedirs(directory, exist_ok=True)
+    X = np.asarray(X, dtype=np.float32)
+    arrays = {
+        'X': X,
+        'X_filled': np.where(np.isnan(X), np.float32(0.5), X),
+        'y': np.asarray(y, dtype=np.float32),
+        'returns': np.asarray(returns, dtype=np.float64),
+        'offsets': np.asarray(offsets, dtype=np.int64),
+    }
+    paths = {}
+    for name, array in arrays.items():
+        paths[name] = os.path.join(directory, f"{name}.npy")
+        np.save(paths[name], array)
+    return paths
+
+
+def _init_worker(paths, threads):
+    threadpool_limits(threads)
+    for name, path in paths.items():
+        _STATE[name] = np.load(path, mmap_mode=None if name == 'offsets' else 'r')
+    _STATE['threads'] = threads
+
+
+def _windows(train_size, step, end):
+    offsets = _STATE['offsets']
+    end = len(offsets) - 1 if end is None else end
+    for train_stop in range(train_size, end, step):
+        yield train_stop - train_size, train_stop, min(train_stop + step, end)
+
+
+def _run_lightgbm(params, train_size, step, end):
+    X, offsets = _STATE['X'], _STATE['offsets']
+    params = {**params, 'n_jobs': _STATE['threads']}
+    panel = build_panel_dataset(np.asarray(X), np.asarray(_STATE['y']),
+                                [f"f{j}" for j in range(X.shape[1])], params)
+    fit_times, predict_times, blocks = [], [], []
+    for train_start, train_stop, predict_stop in _windows(train_size, step, end):
+        start = time.perf_counter()
+        rows = np.arange(offsets[train_start], offsets[train_stop], dtype=np.int32)
+        model = train_window(panel, rows, params)
+        fit_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        blocks.append(model.predict(X[offsets[train_stop]:offsets[predict_stop]]))
+        predict_times.append(time.perf_counter() - start)
+    return np.concatenate(blocks), fit_times, predict_times
+
+
+def _run_linear(config, train_size, step, end):
+    X, y, offsets = _STATE['X_filled'], _STATE['y'], _STATE['offsets']
+    fit_times, predict_times, blocks = [], [], []
+    for train_start, train_stop, predict_stop in _windows(train_size, step, end):
+        start = time.perf_counter()
+        rows = slice(offsets[train_start], offsets[train_stop])
+        model = LinearRegression().fit(X[rows], y[rows])
+        fit_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        blocks.append(model.predict(X[offsets[train_stop]:offsets[predict_stop]]))
+        predict_times.append(time.perf_counter() - start)
+    return np.concatenate(blocks), fit_times, predict_times
+
+
+def _run_mlp(config, train_size, step, end):
+    predictions, fit_times, predict_times = walk_forward_mlp(
+        _STATE['X_filled'], _STATE['y'], _STATE['offsets'],
+        train_size=train_size, step=step, end=end, **config)
+    return predictions, fit_times, predict_times
+
+
+_FAMILIES = {'lightgbm': _run_lightgbm, 'linear': _run_linear, 'mlp': _run_mlp}
+
+
+def _run_model(name, family, config, train_size, step, end, n_portfolios):
+    start = time.perf_counter()
+    predictions, fit_times, predict_times = _FAMILIES[family](config, train_size, step, end)
+    wall = time.perf_counter() - start
+
+    offsets = _STATE['offsets']
+    end = len(offsets) - 1 if end is None else end
+    first = offsets[train_size]
+    returns = np.asarray(_STATE['returns'][first:offsets[end]])
+    rank_ic, spread = window_metrics(predictions, returns, offsets[train_size:end + 1] - first,
+                                     n_portfolios)
+    return {'model': name, 'family': family, 'windows': len(fit_times),
+            'rank_ic': rank_ic, 'spread': spread,
+            'total_fit_s': float(np.sum(fit_times)), 'mean_fit_s': float(np.mean(fit_times)),
+            'total_predict_s': float(np.sum(predict_times)),
+            'mean_predict_s': float(np.mean(predict_times)), 'wall_s': wall}, predictions
+
+
+def compare(paths, models, train_size, step=1, end=None, n_workers=None, n_portfolios=10):
+    """Run every model over the same walk-forward windows in parallel workers.
+
+    Args:
+        paths: Dict from write_shared()
+        models: List of (name, family, config) tuples (families above)
+        train_size, step, end: Walk-forward splits (see WalkForward.windows)
+        n_workers: Worker processes (default: all cores, at most one per model)
+        n_portfolios: Portfolios for the spread (default: 10)
+
+    Returns:
+        (table, predictions): DataFrame with one row per model (rank IC,
+        spread, fit/predict times) and a dict of name -> out-of-sample
+        predictions for rows offsets[train_size]:offsets[end]
+    """
+    unknown = {family for _, family, _ in models} - set(_FAMILIES)
+    if unknown:
+        raise ValueError(f"Unknown model families: {sorted(unknown)}")
+    n_workers = min(n_workers or os.cpu_count() or 1, len(models))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(paths, threads)) as pool:
+        futures = [pool.submit(_run_model, name, family, config, train_size, step, end,
+                               n_portfolios)
+                   for name, family, config in models]
+        outputs = [future.result() for future in futures]
+    table = pd.DataFrame([row for row, _ in outputs]).set_index('model')
+    return table, {row['model']: p for row, p in outputs}
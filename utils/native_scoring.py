@@ -0,0 +1,193 @@
+"""Low-latency scoring of saved LightGBM models from their native format.
+
+The training scripts save joblib pickles of sklearn wrappers (lightGBM.pkl)
+or of boosters (data4_model.pkl, data5_model.pkl); loading those imports
+sklearn and unpickles the whole wrapper, and scoring goes through pandas.
+export_native() writes the booster(s) as LightGBM text model files plus a
+small JSON manifest (feature names, categorical levels). NativeScorer loads
+those files directly and scores contiguous float32 NumPy batches, and
+feature snapshots are saved as .npy files that are memory-mapped on load,
+so a scoring process touches only the pages it actually reads.
+
+Usage:
+    from utils.native_scoring import export_native, NativeScorer, load_snapshot
+    export_native(joblib.load('data4_model.pkl'), 'data4_model')
+    scorer = NativeScorer('data4_model.json')
+    X = load_snapshot('data4_current.npy')           # memory-mapped float32
+    predictions = scorer.predict(X)
+"""
+import json
+import os
+import numpy as np
+import lightgbm as lgb
+
+
+def unwrap_boosters(model):
+    """List of lgb.Booster inside a saved model object.
+
+    Accepts a Booster, an sklearn LGBMModel, an EnsembleModel (one booster
+    per member) or the {'model': ...} dict written by train_lightgbm.py.
+    """
+    if isinstance(model, dict):
+        model = model['model']
+    if isinstance(model, lgb.Booster):
+        return [model]
+    if hasattr(model, 'booster_'):
+        return [model.booster_]
+    if hasattr(model, 'models'):
+        return [booster for member in model.models for booster in unwrap_boosters(member)]
+    raise TypeError(f"Cannot extract a LightGBM booster from {type(model).__name__}")
+
+
+def export_native(model, prefix):
+    """Write a saved model as native LightGBM text files plus a manifest.
+
+    Args:
+        model: Loaded model object (see unwrap_boosters())
+        prefix: Output path without extension (e.g. 'data4_model')
+
+    Returns:
+        Path of the manifest ('{prefix}.json'); boosters are written to
+        '{prefix}.txt' (single model) or '{prefix}_member{k}.txt' (ensemble)
+    """
+    boosters = unwrap_boosters(model)
+    if len(boosters) == 1:
+        files = [f"{prefix}.txt"]
+    else:
+        files = [f"{prefix}_member{k}.txt" for k in range(len(boosters))]
+    for booster, path in zip(boosters, files):
+        booster.save_model(path)
+
+    manifest = {
+        'models': [os.path.basename(path) for path in files],
+        'features': boosters[0].feature_name(),
+        'categories': booster_categories(boosters[0]),
+        'lightgbm_version': lgb.__version__,
+    }
+    # Written last and atomically: a watcher that sees the new manifest also
+    # sees complete model files
+    manifest_path = f"{prefix}.json"
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest_path
+
+
+def booster_categories(booster):
+    """Category levels of each categorical feature, in training code order.
+
+    Returns:
+        Dict of feature name -> list of levels (as strings); code i is level i
+    """
+    names = booster.feature_name()
+    categorical = [names[i] for i in _categorical_indices(booster)]
+    return {name: [str(level) for level in levels]
+            for name, levels in zip(categorical, booster.pandas_categorical or [])}
+
+
+def encode_frame(df, features, categories):
+    """float32 feature matrix of a DataFrame, categories as training codes.
+
+    Args:
+        df: DataFrame with the feature columns
+        features: Column order of the matrix
+        categories: Dict from booster_categories() (unknown levels -> NaN)
+    """
+    X = np.empty((len(df), len(features)), dtype=np.float32)
+    for j, name in enumerate(features):
+        if name in categories:
+            codes = {level: i for i, level in enumerate(categories[name])}
+            X[:, j] = df[name].astype(str).map(codes).to_numpy(dtype=np.float32,
+                                                                na_value=np.nan)
+        else:
+            X[:, j] = df[name].to_numpy(dtype=np.float32)
+    return X
+
+
+def _categorical_indices(booster):
+    """Feature indices LightGBM treats as categorical.
+
+    In the model text, numeric features are described by '[min:max]' (or
+    'none') and categorical features by their ':'-separated category codes.
+    """
+    for line in booster.model_to_string(num_iteration=1).splitlines():
+        if line.startswith('feature_infos='):
+            infos = line[len('feature_infos='):].split(' ')
+            return [i for i, info in enumerate(infos)
+                    if info != 'none' and not info.startswith('[')]
+    return []
+
+
+class NativeScorer:
+    """Scores float32 feature batches with boosters loaded from export_native()."""
+
+    def __init__(self, manifest_path, num_threads=0):
+        """
+        Args:
+            manifest_path: Manifest written by export_native()
+            num_threads: LightGBM prediction threads (default: 0, all cores)
+        """
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        directory = os.path.dirname(os.path.abspath(manifest_path))
+        self.features = manifest['features']
+        self.categories = manifest['categories']
+        self.boosters = [lgb.Booster(model_file=os.path.join(directory, name))
+                         for name in manifest['models']]
+        self.num_threads = num_threads
+
+    def encode(self, df):
+        """float32 feature matrix of a DataFrame (categories as training codes)."""
+        return encode_frame(df, self.features, self.categories)
+
+    def predict(self, X, batch_size=None):
+        """Predictions for a 2-D float32 array (rows may be memory-mapped).
+
+        Args:
+            X: Array with columns in self.features order
+            batch_size: Rows scored per LightGBM call (default: all at once)
+
+        Returns:
+            float64 array of predictions (mean over members for an ensemble)
+        """
+        X = np.asarray(X)
+        if X.dtype != np.float32:
+            X = X.astype(np.float32)
+        batch_size = batch_size or max(len(X), 1)
+        out = np.empty(len(X))
+        for start in range(0, len(X), batch_size):
+            batch = np.ascontiguousarray(X[start:start + batch_size])
+            out[start:start + len(batch)] = self._predict_batch(batch)
+        return out
+
+    def _predict_batch(self, batch):
+        mean = None
+        for k, booster in enumerate(self.boosters, start=1):
+            predictions = booster.predict(batch, num_threads=self.num_threads)
+            mean = predictions if mean is None else mean + (predictions - mean) / k
+        return mean
+
+
+def save_snapshot(X, path, tickers=None):
+    """Save a feature matrix as a float32 .npy file for memory-mapped scoring.
+
+    Args:
+        X: 2-D feature matrix (columns in the model's feature order)
+        path: Output .npy path
+        tickers: Optional row labels, saved as '{path without .npy}_tickers.npy'
+    """
+    base = path[:-4] if path.endswith('.npy') else path
+    if tickers is not None:
+        _save_atomic(f"{base}_tickers.npy", np.asarray(tickers).astype(str))
+    _save_atomic(f"{base}.npy", np.ascontiguousarray(X, dtype=np.float32))
+
+
+def _save_atomic(path, array):
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.tmp', path)
+
+
+def load_snapshot(path):
+    """Memory-map a feature snapshot written by save_snapshot()."""
+    return np.load(path, mmap_mode='r')
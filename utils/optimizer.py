@@ -0,0 +1,209 @@
+"""Mean-variance portfolio optimization for hundreds of names.
+
+Solves
+
+    minimize    1/2 w' C w - gamma * mu' w
+    subject to  sum(w) = budget,  lower <= w <= upper
+
+with accelerated projected gradient descent (FISTA) with adaptive momentum
+restart. The projection onto the budget-and-box set is clip(v - tau,
+lower, upper); tau is carried between iterations and corrected with a
+Newton step, falling back to an exact solve from the sorted breakpoints.
+Every iteration is a matrix-vector product plus a vectorized projection.
+The solver stops when the projected-gradient step is negligible relative
+to the objective, so a few hundred names solve in tens of milliseconds
+(benchmark_optimizer.py checks speed and frontier monotonicity). gamma = 0
+gives the minimum-variance portfolio.
+
+Long-only portfolios use lower = 0. Long-short portfolios allow negative
+weights down to -max_weight. The efficient frontier is a sweep over gamma
+where each point starts from the previous point's weights (warm start), so
+later points need only a few iterations.
+
+Usage:
+    from utils.optimizer import optimize, efficient_frontier
+    w = optimize(mu, cov, gamma=1.0, long_only=True, max_weight=0.05)
+    frontier, weights = efficient_frontier(mu, cov, n_points=50)
+"""
+import numpy as np
+import pandas as pd
+
+
+def _bounds(n, long_only, max_weight):
+    upper = np.full(n, np.inf if max_weight is None else max_weight)
+    lower = np.zeros(n) if long_only else -upper
+    return lower, upper
+
+
+def _shift(v, budget, lower, upper):
+    """tau with sum(clip(v - tau, lower, upper)) = budget, from the sorted kinks.
+
+    The sum is piecewise linear and nonincreasing in tau, with kinks at
+    v - upper and v - lower. It is evaluated at every kink at once from
+    sorted cumulative sums, and tau is interpolated exactly on the segment
+    where it crosses budget.
+    """
+    at_upper = v - upper                # tau <= at_upper: weight at its upper bound
+    at_lower = v - lower                # tau >= at_lower: weight at its lower bound
+    order_upper = np.argsort(at_upper)
+    order_lower = np.argsort(at_lower)
+    kinks_upper = at_upper[order_upper]
+    kinks_lower = at_lower[order_lower]
+    # Sums over the names at the upper bound (suffixes of kinks_upper) and at
+    # the lower bound (prefixes of kinks_lower); infinite bounds never enter
+    zero = np.zeros(1)
+    upper_sum = np.concatenate([np.cumsum((upper - v)[order_upper][::-1])[::-1], zero])
+    lower_sum = np.concatenate([zero, np.cumsum((lower - v)[order_lower])])
+    total_v = v.sum()
+
+    def total(tau):
+        # Free names give v - tau; clipped names give v plus their bound's offset
+        i = np.searchsorted(kinks_upper, tau, side='left')
+        j = np.searchsorted(kinks_lower, tau, side='left')
+        n_free = i - j
+        return total_v + upper_sum[i] + lower_sum[j] - tau * n_free, n_free
+
+    kinks = np.concatenate([kinks_upper, kinks_lower])
+    kinks = np.sort(kinks[np.isfinite(kinks)])
+    sums, _ = total(kinks)
+    k = np.searchsorted(-sums, -budget, side='left')     # first kink with sum <= budget
+    if k == 0:
+        _, n_free = total(kinks[0])
+        tau = kinks[0] - (budget - sums[0]) / n_free if n_free else kinks[0]
+    elif k == len(kinks):
+        _, n_free = total(kinks[-1] + 1.0)
+        tau = kinks[-1] + (sums[-1] - budget) / n_free if n_free else kinks[-1]
+    else:
+        drop = sums[k - 1] - sums[k]
+        tau = kinks[k - 1] + (sums[k - 1] - budget) / drop * (kinks[k] - kinks[k - 1])
+    return tau
+
+
+def _project_from(v, budget, lower, upper, tau, newton_steps=3):
+    """Projection and its tau, starting from a nearby tau (e.g. the last iteration's).
+
+    Between FISTA iterations the set of names at a bound rarely changes, so
+    a Newton step on tau (the excess sum over the number of free names) is
+    usually exact; otherwise this falls back to the sorted-kink solve.
+    """
+    for _ in range(newton_steps):
+        w = np.clip(v - tau, lower, upper)
+        excess = w.sum() - budget
+        if abs(excess) <= 1e-13 * (1.0 + abs(budget)):
+            return w, tau
+        n_free = np.count_nonzero((w > lower) & (w < upper))
+        if n_free == 0:
+            break
+        tau += excess / n_free
+    tau = _shift(v, budget, lower, upper)
+    return np.clip(v - tau, lower, upper), tau
+
+
+def project(v, budget, lower, upper):
+    """Euclidean projection onto {w : sum(w) = budget, lower <= w <= upper}.
+
+    The projection is clip(v - tau, lower, upper) with tau solved exactly
+    from the sorted breakpoints v - upper and v - lower.
+    """
+    return np.clip(v - _shift(v, budget, lower, upper), lower, upper)
+
+
+def optimize(mu, cov, gamma=1.0, long_only=True, max_weight=None, budget=1.0, w0=None,
+             tol=1e-9, max_iter=10_000, lipschitz=None):
+    """Mean-variance (or, with gamma=0, minimum-variance) weights.
+
+    Args:
+        mu: Expected returns (Series or array; ignored when gamma=0)
+        cov: Covariance matrix (DataFrame or array)
+        gamma: Weight on expected return relative to half the variance
+        long_only: No negative weights
+        max_weight: Largest absolute weight per name (None: no cap; required
+            for long-short portfolios, which are otherwise unbounded)
+        budget: Sum of the weights (1 = fully invested)
+        w0: Starting weights (warm start); default equal weights
+        tol: Stop when a full projected-gradient step would lower the
+            objective by less than tol relative to its size
+        max_iter: Iteration limit
+        lipschitz: Largest eigenvalue of cov, if already known (sets the step)
+
+    Returns:
+        Weights (Series indexed like cov when cov is a DataFrame)
+    """
+    index = cov.index if isinstance(cov, pd.DataFrame) else None
+    C = np.asarray(cov, dtype=np.float64)
+    n = C.shape[0]
+    mu = np.zeros(n) if mu is None else np.asarray(mu, dtype=np.float64)
+    if not long_only and max_weight is None:
+        raise ValueError("Long-short portfolios need max_weight to be bounded")
+    lower, upper = _bounds(n, long_only, max_weight)
+    if upper.sum() < budget or lower.sum() > budget:
+        raise ValueError(f"No weights of {n} names within the bounds sum to {budget}")
+    step = 1.0 / (np.linalg.eigvalsh(C)[-1] if lipschitz is None else lipschitz)
+
+    w = project(np.full(n, budget / n) if w0 is None else np.asarray(w0, dtype=np.float64),
+                budget, lower, upper)
+    y, t, tau = w.copy(), 1.0, 0.0
+    for _ in range(max_iter):
+        gradient = C @ y - gamma * mu
+        w_next, tau = _project_from(y - step * gradient, budget, lower, upper, tau)
+        move = w_next - y
+        # |move|^2 / step is the gradient mapping's size in objective units;
+        # the scale is half the variance plus the return term at y
+        scale = abs(y @ (gradient + gamma * mu)) / 2 + abs(gamma * (mu @ y))
+        if move @ move / step <= tol * max(scale, np.finfo(float).tiny):
+            w = w_next
+            break
+        # Adaptive restart (O'Donoghue & Candes): drop the momentum when it
+        # points uphill, which keeps FISTA from oscillating near the optimum
+        if (y - w_next) @ (w_next - w) > 0:
+            t = 1.0
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = w_next + ((t - 1) / t_next) * (w_next - w)
+        w, t = w_next, t_next
+    return pd.Series(w, index=index) if index is not None else w
+
+
+def portfolio_stats(w, mu, cov, periods_per_year=12):
+    """Annualized expected return, volatility and their ratio of weights w."""
+    w = np.asarray(w, dtype=np.float64)
+    expected = float(np.asarray(mu, dtype=np.float64) @ w) * periods_per_year
+    volatility = float(np.sqrt(w @ np.asarray(cov, dtype=np.float64) @ w * periods_per_year))
+    return expected, volatility, expected / volatility if volatility > 0 else np.nan
+
+
+def efficient_frontier(mu, cov, n_points=50, gamma_max=None, long_only=True, max_weight=None,
+                       budget=1.0, periods_per_year=12):
+    """Efficient frontier from minimum variance to the most return-seeking point.
+
+    The points use gamma = 0 and then a log grid up to gamma_max. Each point
+    warm-starts from the previous point's weights.
+
+    Args:
+        mu, cov, long_only, max_weight, budget: See optimize()
+        n_points: Points on the frontier
+        gamma_max: Largest gamma (default: scaled so that the last point is
+            dominated by expected return: 100 x trace(cov) / (n x |mu|_inf))
+        periods_per_year: Annualization of the reported statistics
+
+    Returns:
+        (frontier, weights): DataFrame with gamma, expected_return,
+        volatility and sharpe per point, and a (point x name) DataFrame of
+        weights
+    """
+    C = np.asarray(cov, dtype=np.float64)
+    mu_values = np.asarray(mu, dtype=np.float64)
+    if gamma_max is None:
+        gamma_max = 100 * np.trace(C) / len(C) / max(np.max(np.abs(mu_values)), 1e-12)
+    gammas = np.concatenate([[0.0], np.geomspace(gamma_max / 1e4, gamma_max, n_points - 1)])
+
+    lipschitz = np.linalg.eigvalsh(C)[-1]
+    rows, weights, w = [], [], None
+    for gamma in gammas:
+        w = np.asarray(optimize(mu_values, C, gamma, long_only, max_weight, budget, w0=w,
+                                lipschitz=lipschitz))
+        expected, volatility, sharpe = portfolio_stats(w, mu_values, C, periods_per_year)
+        rows.append({'gamma': gamma, 'expected_return': expected, 'volatility': volatility,
+                     'sharpe': sharpe})
+        weights.append(w)
+    names = cov.index if isinstance(cov, pd.DataFrame) else None
+    return pd.DataFrame(rows), pd.DataFrame(np.array(weights), columns=names)
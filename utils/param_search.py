@@ -0,0 +1,201 @@
+"""Parallel walk-forward hyperparameter search with successive halving.
+
+Every configuration is scored on the same walk-forward splits as the training
+pipelines (rank IC or D10 - D1 spread of the out-of-sample predictions).
+All configurations start on the first few windows; after each rung only the
+best 1/eta are kept and evaluated on eta times as many windows, until the
+survivors have seen every window. Window evaluations run in parallel worker
+processes that share one binned LightGBM dataset (saved once as a LightGBM
+binary file) and a memory-mapped feature matrix, so no worker re-bins or
+copies the panel. Configurations may vary booster parameters only; dataset
+parameters such as max_bin come from the first configuration.
+
+Usage:
+    from utils.param_search import expand_grid, search
+    configs = expand_grid(PARAMS, {'num_leaves': [15, 31], 'learning_rate': [0.02, 0.05]})
+    leaderboard, windows = search(wf, configs, raw_returns, train_size=12)
+"""
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from utils.lgb_panel import native_params, train_window
+from utils.model_cache import digest_values
+
+# Per-process state loaded once by _init_worker()
+_STATE = {}
+
+
+def expand_grid(base_params, space):
+    """All combinations of a search space, each merged into base_params.
+
+    Args:
+        base_params: Dict of LGBMRegressor keyword arguments (e.g. PARAMS)
+        space: Dict of parameter name -> list of values
+
+    Returns:
+        List of parameter dicts
+    """
+    names = list(space)
+    return [{**base_params, **dict(zip(names, values))}
+            for values in itertools.product(*(space[name] for name in names))]
+
+
+def window_metrics(predictions, returns, offsets, n_portfolios=10):
+    """Mean rank IC and mean top-minus-bottom portfolio spread over periods.
+
+    Args:
+        predictions: Predictions for a block of consecutive periods
+        returns: Realised returns aligned with predictions
+        offsets: Period boundaries within the block (length n_periods + 1)
+        n_portfolios: Number of portfolios (default: 10)
+
+    Returns:
+        (rank_ic, spread) averaged over the periods of the block
+    """
+    ics, spreads = [], []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        p = predictions[start:stop]
+        r = returns[start:stop]
+        keep = np.isfinite(r)
+        p, r = p[keep], r[keep]
+        if len(p) < n_portfolios:
+            continue
+        order = np.argsort(p, kind='stable')
+        rank_p = np.empty(len(p))
+        rank_p[order] = np.arange(len(p))
+        rank_r = pd.Series(r).rank().to_numpy()
+        ics.append(np.corrcoef(rank_p, rank_r)[0, 1])
+        bucket = len(p) // n_portfolios
+        spreads.append(r[order[-bucket:]].mean() - r[order[:bucket]].mean())
+    if not ics:
+        return np.nan, np.nan
+    return float(np.mean(ics)), float(np.mean(spreads))
+
+
+def _init_worker(dataset_path, dataset_params, X_path, returns_path, offsets):
+    """Load the shared binned dataset and memory-map the panel arrays."""
+    train_params, _ = native_params(dataset_params)
+    _STATE['dataset'] = lgb.Dataset(dataset_path, params=train_params).construct()
+    _STATE['X'] = np.load(X_path, mmap_mode='r')
+    _STATE['returns'] = np.load(returns_path, mmap_mode='r')
+    _STATE['offsets'] = offsets
+
+
+def _evaluate_window(config_id, params, window_id, split, n_portfolios):
+    """Train one configuration on one window and score its predictions."""
+    train_start, train_stop, predict_stop = split
+    offsets = _STATE['offsets']
+
+    start = time.perf_counter()
+    rows = np.arange(offsets[train_start], offsets[train_stop], dtype=np.int32)
+    model = train_window(_STATE['dataset'], rows, params)
+    fit_time = time.perf_counter() - start
+
+    block = slice(offsets[train_stop], offsets[predict_stop])
+    start = time.perf_counter()
+    predictions = model.predict(np.asarray(_STATE['X'][block]))
+    predict_time = time.perf_counter() - start
+
+    block_offsets = offsets[train_stop:predict_stop + 1] - offsets[train_stop]
+    rank_ic, spread = window_metrics(predictions, _STATE['returns'][block],
+                                     block_offsets, n_portfolios)
+    return {'config': config_id, 'window': window_id, 'rank_ic': rank_ic,
+            'spread': spread, 'fit_time': fit_time, 'predict_time': predict_time}
+
+
+def _shared_files(wf, base_params, returns, work_dir):
+    """Write (once per panel content) the binned dataset and mmap-able arrays."""
+    os.makedirs(work_dir, exist_ok=True)
+    key = digest_values(wf.digest(0, len(wf.periods)), wf.features,
+                        native_params(base_params)[0], lgb.__version__)[:16]
+    dataset_path = os.path.join(work_dir, f"panel_{key}.bin")
+    X_path = os.path.join(work_dir, f"X_{key}.npy")
+    returns_path = os.path.join(work_dir, f"returns_{key}.npy")
+    if not os.path.exists(dataset_path):
+        wf.dataset(base_params).save_binary(dataset_path)
+    if not os.path.exists(X_path):
+        np.save(X_path, wf.X)
+    np.save(returns_path, np.asarray(returns, dtype=np.float64))
+    return dataset_path, X_path, returns_path
+
+
+def search(wf, configs, returns, train_size, step=1, horizon=None, end=None,
+           metric='rank_ic', first_windows=8, eta=3, n_workers=None,
+           n_portfolios=10, work_dir='.search_cache', verbose=True):
+    """Successive-halving search over parameter configurations.
+
+    Args:
+        wf: WalkForward engine over the ranked panel
+        configs: List of parameter dicts (e.g. from expand_grid())
+        returns: Realised returns aligned with wf.df rows (used for scoring)
+        train_size, step, horizon, end: Walk-forward splits (see WalkForward.windows)
+        metric: 'rank_ic' or 'spread' (default: 'rank_ic')
+        first_windows: Windows evaluated by every configuration (default: 8)
+        eta: Keep the best 1/eta configurations per rung (default: 3)
+        n_workers: Worker processes (default: all cores)
+        n_portfolios: Portfolios for the spread metric (default: 10)
+        work_dir: Directory for the shared binned dataset (default: '.search_cache')
+        verbose: Print progress per rung (default: True)
+
+    Returns:
+        (leaderboard, windows) DataFrames: one row per configuration, and one
+        row per (configuration, window) evaluation with its timings
+    """
+    n_workers = n_workers or os.cpu_count()
+    # Split the cores between workers instead of oversubscribing
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    configs = [{**config, 'n_jobs': threads} for config in configs]
+
+    splits = list(wf.windows(train_size, step, horizon, end))
+    base_params = configs[0]
+    paths = _shared_files(wf, base_params, returns, work_dir)
+
+    results = {}
+    alive = list(range(len(configs)))
+    budget = min(first_windows, len(splits))
+    rung = 0
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(paths[0], base_params, paths[1], paths[2],
+                                       wf.offsets)) as pool:
+        while True:
+            futures = [pool.submit(_evaluate_window, c, configs[c], n, splits[n], n_portfolios)
+                       for c in alive for n in range(budget) if (c, n) not in results]
+            for future in futures:
+                row = future.result()
+                results[(row['config'], row['window'])] = dict(row, rung=rung)
+
+            scores = {c: np.nanmean([results[(c, n)][metric] for n in range(budget)])
+                      for c in alive}
+            if verbose:
+                best = max(alive, key=lambda c: scores[c])
+                print(f"Rung {rung}: {len(alive)} configs x {budget} windows | "
+                      f"best {metric} = {scores[best]:.4f} (config {best})")
+            if budget >= len(splits):
+                break
+
+            # Keep the best 1/eta configurations and give them eta times the windows
+            keep = max(1, math.ceil(len(alive) / eta))
+            alive = sorted(alive, key=lambda c: scores[c], reverse=True)[:keep]
+            budget = min(budget * eta, len(splits))
+            rung += 1
+
+    windows = pd.DataFrame(list(results.values())).sort_values(['config', 'window'])
+    leaderboard = windows.groupby('config').agg(
+        windows=('window', 'count'),
+        rung=('rung', 'max'),
+        rank_ic=('rank_ic', 'mean'),
+        spread=('spread', 'mean'),
+        mean_fit_time=('fit_time', 'mean'),
+        mean_predict_time=('predict_time', 'mean'),
+    )
+    varied = [k for k in configs[0] if any(c[k] != configs[0][k] for c in configs)]
+    params = pd.DataFrame([{k: configs[c][k] for k in varied} for c in leaderboard.index],
+                          index=leaderboard.index)
+    leaderboard = pd.concat([params, leaderboard], axis=1).sort_values(
+        ['windows', metric], ascending=False)
+    return leaderboard, windows
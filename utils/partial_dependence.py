@@ -0,0 +1,147 @@
+"""Vectorized partial-dependence (PDP) and ICE curves for every feature.
+
+For each feature f and each value g on its grid, the ICE curve of a row is
+the model's prediction with feature f set to g and every other feature left
+as observed; the PDP is the mean ICE curve. Instead of one predict call per
+(feature, grid value), all of them are laid out in one stacked float32
+design matrix (feature blocks of grid copies of the cross-section) that is
+scored in as few batched LightGBM calls as batch_rows allows, and the
+predictions are reshaped into (rows x grid) ICE matrices with NumPy.
+
+Curves are cached per (model, cross-section, grid) as one .npz file, so
+re-plotting a model's curves does not re-score anything.
+
+Usage:
+    from utils.partial_dependence import partial_dependence, pdp_frame
+    curves = partial_dependence(model, X)        # X: full cross-section
+    pdp_frame(curves)                            # feature, value, pdp, ice quantiles
+    curves['momentum']['ice']                    # (n_rows, n_grid) ICE matrix
+"""
+import os
+import numpy as np
+import pandas as pd
+from utils.native_scoring import unwrap_boosters, booster_categories, encode_frame
+from utils.model_cache import digest_arrays, digest_values
+from utils.shap_cache import model_hash
+
+
+def feature_grid(column, grid_size, categorical=False):
+    """Grid of a feature: its observed category codes, or quantiles of its values."""
+    values = column[np.isfinite(column)]
+    if categorical:
+        return np.unique(values)
+    return np.unique(np.quantile(values, np.linspace(0, 1, grid_size))).astype(np.float32)
+
+
+def ice_curves(boosters, X, grids, batch_rows=2_000_000):
+    """ICE matrices of every feature from one stacked design matrix.
+
+    Args:
+        boosters: List of lgb.Booster (predictions are averaged over them)
+        X: float32 feature matrix (n_rows x n_features)
+        grids: List with the grid of each feature (None to skip a feature)
+        batch_rows: Maximum rows per predict call (default: 2,000,000)
+
+    Returns:
+        List with an (n_rows x len(grid)) ICE matrix per feature (None if skipped)
+    """
+    n_rows = len(X)
+    blocks = [(j, grid) for j, grid in enumerate(grids) if grid is not None]
+    total = sum(len(grid) for _, grid in blocks) * n_rows
+
+    # Feature block j holds len(grid_j) copies of X with column j set to each grid value
+    design = np.empty((total, X.shape[1]), dtype=np.float32)
+    start = 0
+    for j, grid in blocks:
+        stop = start + len(grid) * n_rows
+        design[start:stop] = np.tile(X, (len(grid), 1))
+        design[start:stop, j] = np.repeat(grid, n_rows)
+        start = stop
+
+    predictions = np.empty(total)
+    for batch in range(0, total, batch_rows):
+        rows = design[batch:batch + batch_rows]
+        mean = None
+        for k, booster in enumerate(boosters, start=1):
+            p = booster.predict(rows)
+            mean = p if mean is None else mean + (p - mean) / k
+        predictions[batch:batch + len(rows)] = mean
+
+    curves = [None] * len(grids)
+    start = 0
+    for j, grid in blocks:
+        stop = start + len(grid) * n_rows
+        curves[j] = predictions[start:stop].reshape(len(grid), n_rows).T.astype(np.float32)
+        start = stop
+    return curves
+
+
+def partial_dependence(model, X, features=None, grid_size=20, batch_rows=2_000_000,
+                       cache_dir='pdp_cache'):
+    """PDP and ICE curves of a model over a cross-section, cached per model.
+
+    Args:
+        model: Saved model object (Booster, LGBMModel, EnsembleModel or the
+            train_lightgbm.py dict)
+        X: DataFrame with the model's features (categoricals as category or str)
+        features: Features to compute (default: all model features)
+        grid_size: Quantile grid points per numeric feature (default: 20);
+            categorical features use every observed category
+        batch_rows: Maximum rows per predict call
+        cache_dir: Directory for cached curves (None disables the cache)
+
+    Returns:
+        Dict of feature -> {'grid': grid values, 'pdp': mean curve,
+        'ice': (n_rows x n_grid) float32 ICE matrix}; grid values of
+        categorical features are category labels
+    """
+    boosters = unwrap_boosters(model)
+    names = boosters[0].feature_name()
+    categories = booster_categories(boosters[0])
+    features = names if features is None else list(features)
+    X_encoded = encode_frame(X, names, categories)
+
+    path = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        key = digest_values(model_hash(model), digest_arrays(X_encoded), features, grid_size)
+        path = os.path.join(cache_dir, f"{key[:16]}.npz")
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                return {f: _curve(cached[f"{f}__grid"], cached[f"{f}__ice"], categories.get(f))
+                        for f in features}
+
+    grids = [feature_grid(X_encoded[:, j], grid_size, name in categories)
+             if name in features else None for j, name in enumerate(names)]
+    ice = ice_curves(boosters, X_encoded, grids, batch_rows)
+
+    if path is not None:
+        arrays = {}
+        for j, name in enumerate(names):
+            if grids[j] is not None:
+                arrays[f"{name}__grid"] = grids[j]
+                arrays[f"{name}__ice"] = ice[j]
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+
+    return {name: _curve(grids[j], ice[j], categories.get(name))
+            for j, name in enumerate(names) if grids[j] is not None}
+
+
+def _curve(grid, ice, levels=None):
+    if levels is not None:
+        grid = np.array([levels[int(code)] for code in grid])
+    return {'grid': grid, 'pdp': ice.mean(axis=0), 'ice': ice}
+
+
+def pdp_frame(curves, quantiles=(0.1, 0.9)):
+    """Long DataFrame of the curves: feature, value, pdp and ICE quantiles."""
+    frames = []
+    for feature, curve in curves.items():
+        low, high = np.quantile(curve['ice'], quantiles, axis=0)
+        frames.append(pd.DataFrame({'feature': feature, 'value': curve['grid'],
+                                    'pdp': curve['pdp'],
+                                    f"ice_q{quantiles[0]:g}": low,
+                                    f"ice_q{quantiles[1]:g}": high}))
+    return pd.concat(frames, ignore_index=True)
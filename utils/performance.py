@@ -0,0 +1,155 @@
+"""Batched performance analytics for portfolio return series.
+
+Every function takes a wide (period x portfolio) table of returns and
+computes its metric for all portfolios at once with NumPy operations along
+the period axis, skipping missing returns as pandas does. Rolling statistics
+come from cumulative sums of the returns and their squares, so every window
+of every portfolio costs O(1) after one pass.
+
+summary() reproduces the tables of analyze_portfolios.ipynb (mean, std and
+Sharpe ratio per period and annualized, maximum drawdown) and adds
+drawdown duration, hit rate, skewness, excess kurtosis and the cumulative
+return. performance_report() builds it straight from a portfolio CSV
+layout, including the top-minus-bottom spread.
+
+Usage:
+    from utils.performance import performance_report, rolling_sharpe
+    table = performance_report(portfolios, 'month', 'decile', periods_per_year=12)
+    wide = portfolios.pivot(index='month', columns='decile', values='return')
+    sharpe_36m = rolling_sharpe(wide, window=36, periods_per_year=12)
+"""
+import numpy as np
+import pandas as pd
+
+
+def _values(returns):
+    returns = pd.DataFrame(returns)
+    return returns, returns.to_numpy(dtype=np.float64)
+
+
+def _moments(x):
+    """Count, mean and central moments 2-4 of every column, skipping NaN."""
+    valid = np.isfinite(x)
+    n = valid.sum(axis=0).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, x, 0.0).sum(axis=0) / n
+        d = np.where(valid, x - mean, 0.0)
+        m2, m3, m4 = (d ** 2).sum(axis=0), (d ** 3).sum(axis=0), (d ** 4).sum(axis=0)
+    return n, mean, m2, m3, m4
+
+
+def cumulative_returns(returns):
+    """Growth of 1 invested in each portfolio ((1 + r).cumprod(); missing returns hold value)."""
+    returns, x = _values(returns)
+    growth = np.cumprod(1.0 + np.nan_to_num(x), axis=0)
+    return pd.DataFrame(growth, index=returns.index, columns=returns.columns)
+
+
+def drawdowns(returns):
+    """Drawdown from the running peak and periods since that peak, per portfolio.
+
+    Returns:
+        (drawdown, duration): DataFrames shaped like returns
+    """
+    returns, x = _values(returns)
+    growth = np.cumprod(1.0 + np.nan_to_num(x), axis=0)
+    peak = np.maximum.accumulate(growth, axis=0)
+    drawdown = (growth - peak) / peak
+    steps = np.arange(len(x))[:, None]
+    last_peak = np.maximum.accumulate(np.where(growth >= peak, steps, 0), axis=0)
+    duration = steps - last_peak
+    return (pd.DataFrame(drawdown, index=returns.index, columns=returns.columns),
+            pd.DataFrame(duration, index=returns.index, columns=returns.columns))
+
+
+def summary(returns, periods_per_year=12):
+    """Performance statistics of every portfolio.
+
+    Args:
+        returns: Wide DataFrame (period x portfolio) of returns
+        periods_per_year: 12 for monthly, 52 for weekly returns
+
+    Returns:
+        DataFrame indexed by portfolio with Mean, Std Dev, Sharpe Ratio
+        (per period), their annualized versions, Hit Rate, Skew, Kurtosis
+        (excess), Max Drawdown, Max Drawdown Duration (periods) and
+        Cumulative Return
+    """
+    returns, x = _values(returns)
+    n, mean, m2, m3, m4 = _moments(x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(m2 / (n - 1))
+        # Bias-corrected sample skewness and excess kurtosis (as pandas)
+        skew = n * np.sqrt(n - 1) / (n - 2) * m3 / m2 ** 1.5
+        kurt = ((n + 1) * n * (n - 1) / ((n - 2) * (n - 3)) * m4 / m2 ** 2
+                - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+        hit_rate = (x > 0).sum(axis=0) / n
+    drawdown, duration = drawdowns(returns)
+    growth = cumulative_returns(returns)
+    table = pd.DataFrame({
+        'Mean': mean,
+        'Std Dev': std,
+        'Sharpe Ratio': mean / std,
+        'Annualized Mean': mean * periods_per_year,
+        'Annualized Std Dev': std * np.sqrt(periods_per_year),
+        'Annualized Sharpe': mean / std * np.sqrt(periods_per_year),
+        'Hit Rate': hit_rate,
+        'Skew': skew,
+        'Kurtosis': kurt,
+        'Max Drawdown': drawdown.to_numpy().min(axis=0),
+        'Max Drawdown Duration': duration.to_numpy().max(axis=0),
+        'Cumulative Return': growth.to_numpy()[-1] - 1 if len(x) else np.nan,
+    }, index=returns.columns)
+    table.index.name = returns.columns.name
+    return table
+
+
+def rolling_sharpe(returns, window, periods_per_year=12, min_periods=None):
+    """Rolling annualized Sharpe ratio of every portfolio.
+
+    Windows are evaluated from cumulative sums of r and r^2, so all windows
+    of all portfolios are computed in a few vectorized passes.
+
+    Args:
+        returns: Wide DataFrame (period x portfolio) of returns
+        window: Window length in periods
+        periods_per_year: 12 for monthly, 52 for weekly returns
+        min_periods: Fewest non-missing returns for a value (default: window)
+
+    Returns:
+        DataFrame shaped like returns (NaN until a window is complete)
+    """
+    returns, x = _values(returns)
+    min_periods = window if min_periods is None else min_periods
+    valid = np.isfinite(x)
+    zeros = np.zeros((1, x.shape[1]))
+    s1, s2, count = (np.vstack([zeros, np.cumsum(a, axis=0)])
+                     for a in (np.where(valid, x, 0.0), np.where(valid, x * x, 0.0), valid))
+    stop = np.arange(1, len(x) + 1)
+    start = np.maximum(stop - window, 0)
+    n, total, total_sq = count[stop] - count[start], s1[stop] - s1[start], s2[stop] - s2[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        var = np.maximum(total_sq - n * mean ** 2, 0.0) / (n - 1)
+        sharpe = mean / np.sqrt(var) * np.sqrt(periods_per_year)
+    sharpe[n < max(min_periods, 2)] = np.nan
+    return pd.DataFrame(sharpe, index=returns.index, columns=returns.columns)
+
+
+def performance_report(portfolios, period_col, bucket_col, value_col='return',
+                       periods_per_year=12, spread=True):
+    """summary() of a long (period, portfolio, return) table such as data4_portfolios.csv.
+
+    Args:
+        portfolios: Long DataFrame with one row per (period, portfolio)
+        period_col, bucket_col, value_col: Column names
+        periods_per_year: 12 for monthly, 52 for weekly returns
+        spread: Add a 'spread' row for the top minus the bottom portfolio
+
+    Returns:
+        summary() table, one row per portfolio (plus 'spread')
+    """
+    wide = portfolios.pivot(index=period_col, columns=bucket_col, values=value_col)
+    if spread:
+        wide['spread'] = wide[wide.columns.max()] - wide[wide.columns.min()]
+    return summary(wide, periods_per_year)
@@ -0,0 +1,218 @@
+"""Vectorized quantile-portfolio formation.
+
+Buckets are assigned for every period at once: rows are sorted by
+(group, value) in one stable lexsort, each row's within-group rank is its
+position minus the group's first position, and the bucket follows from rank
+arithmetic against the group's bin edges. With the default rank breakpoints
+the result is exactly
+
+    groupby(period)[value].transform(
+        lambda x: pd.cut(x.rank(method='first'), bins=n, labels=range(1, n + 1)))
+
+(same edges as pd.cut, including its 0.1% widening of the first bin), but
+without a Python call per period. With a breakpoint mask (e.g. NYSE stocks)
+the edges are instead the within-group quantiles of the masked rows, and
+every row is placed against them.
+
+Double sorts are either independent (both variables sorted within the
+period) or conditional (the second variable sorted within each bucket of
+the first). portfolio_returns() aggregates equal- and value-weighted
+returns of all portfolios in a single grouped sum.
+
+Usage:
+    from utils.portfolios import quantile_buckets, double_sort, portfolio_returns
+    df['decile'] = quantile_buckets(df['predict'], df['month'], 10)
+    df['size_q'], df['pred_q'] = double_sort(df['marketcap'], df['predict'], df['month'],
+                                             5, 5, conditional=True)
+    portfolios = portfolio_returns(df, 'month', ['decile'], weight_col='marketcap',
+                                   mean_cols=['predict'])
+"""
+import numpy as np
+import pandas as pd
+
+
+def group_codes(groups):
+    """Integer code of each row's group.
+
+    Args:
+        groups: One array of group labels, or a list of arrays whose
+            combinations define the groups
+
+    Returns:
+        int64 array of codes (-1 where any label is missing)
+    """
+    if not isinstance(groups, (list, tuple)):
+        groups = [groups]
+    codes = np.zeros(len(groups[0]), dtype=np.int64)
+    missing = np.zeros(len(codes), dtype=bool)
+    for labels in groups:
+        labels_codes, uniques = pd.factorize(np.asarray(labels), sort=True)
+        missing |= labels_codes < 0
+        codes = codes * max(len(uniques), 1) + labels_codes
+    codes[missing] = -1
+    return codes
+
+
+def _sorted_groups(values, codes):
+    """Rows sorted by (group, value) with ties in row order, NaN last in each group."""
+    order = np.lexsort((values, codes))
+    sorted_codes = codes[order]
+    n_groups = int(codes.max()) + 1 if len(codes) else 0
+    starts = np.searchsorted(sorted_codes, np.arange(n_groups))
+    return order, sorted_codes, starts, n_groups
+
+
+def _rank_buckets(values, codes, n_portfolios):
+    """pd.cut(rank(method='first'), bins=n_portfolios) labels for all groups at once."""
+    order, sorted_codes, starts, n_groups = _sorted_groups(values, codes)
+    valid = np.isfinite(values)
+    ranks = np.empty(len(values))
+    ranks[order] = np.arange(len(values)) - starts[sorted_codes] + 1.0
+    counts = np.bincount(codes[valid], minlength=n_groups).astype(np.float64)
+
+    # pd.cut on ranks 1..n uses edges linspace(1, n, bins + 1); a single
+    # observation gets the widened range (0.999, 1.001). Only the interior
+    # edges matter: bucket = 1 + number of interior edges below the rank
+    single = counts == 1
+    lo = np.where(single, 1.0 - 0.001, 1.0)
+    hi = np.where(single, 1.0 + 0.001, counts)
+    step = (hi - lo) / n_portfolios
+    bucket_step, bucket_lo = step[codes], lo[codes]
+    buckets = np.ones(len(values), dtype=np.int64)
+    for k in range(1, n_portfolios):
+        buckets += (k * bucket_step + bucket_lo) < ranks
+    buckets[~valid] = 0
+    return buckets
+
+
+def _breakpoint_buckets(values, codes, n_portfolios, breakpoints):
+    """Buckets against within-group quantiles of the breakpoint rows."""
+    valid = np.isfinite(values)
+    use = valid & breakpoints
+    bp_values = np.where(use, values, np.nan)
+    order, sorted_codes, starts, n_groups = _sorted_groups(bp_values, codes)
+    sorted_values = bp_values[order]
+    counts = np.bincount(codes[use], minlength=n_groups)
+
+    buckets = np.ones(len(values), dtype=np.int64)
+    last = np.maximum(counts - 1, 0)
+    for k in range(1, n_portfolios):
+        # Linear interpolation between order statistics, as np.quantile
+        position = (k / n_portfolios) * last
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, last)
+        low = sorted_values[np.minimum(starts + below, len(values) - 1)]
+        high = sorted_values[np.minimum(starts + above, len(values) - 1)]
+        edge = low + (position - below) * (high - low)
+        buckets += values > edge[codes]
+    buckets[~valid | (counts[codes] == 0)] = 0
+    return buckets
+
+
+def quantile_buckets(values, groups, n_portfolios, breakpoints=None):
+    """Quantile portfolio of every row, assigned within each group.
+
+    Args:
+        values: Sort variable (e.g. predictions)
+        groups: Group labels (e.g. the period column), or a list of arrays
+            for sorts within combined groups
+        n_portfolios: Number of portfolios
+        breakpoints: Optional boolean mask of the rows that set the
+            breakpoints (e.g. NYSE stocks). Default: equal-count buckets of
+            the within-group ranks, identical to pd.cut(rank(method='first'))
+
+    Returns:
+        int64 array of portfolios 1..n_portfolios (0 where the value or the
+        group is missing, or the group has no breakpoint rows)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    codes = group_codes(groups)
+    known = codes >= 0
+    buckets = np.zeros(len(values), dtype=np.int64)
+    if not known.any():
+        return buckets
+    if breakpoints is None:
+        buckets[known] = _rank_buckets(values[known], codes[known], n_portfolios)
+    else:
+        breakpoints = np.asarray(breakpoints, dtype=bool)
+        buckets[known] = _breakpoint_buckets(values[known], codes[known], n_portfolios,
+                                             breakpoints[known])
+    return buckets
+
+
+def double_sort(first, second, groups, n_first, n_second, conditional=False,
+                breakpoints=None):
+    """Two-way portfolio sort within each group.
+
+    Args:
+        first, second: Sort variables (e.g. marketcap and predict)
+        groups: Group labels (e.g. the period column)
+        n_first, n_second: Portfolios per variable
+        conditional: If True, sort the second variable within each portfolio
+            of the first; otherwise sort both independently
+        breakpoints: Optional breakpoint mask (see quantile_buckets)
+
+    Returns:
+        (first_buckets, second_buckets): int64 arrays (0 where unassigned)
+    """
+    first_buckets = quantile_buckets(first, groups, n_first, breakpoints)
+    if conditional:
+        groups = list(groups) if isinstance(groups, (list, tuple)) else [groups]
+        second_buckets = quantile_buckets(second, groups + [first_buckets], n_second,
+                                          breakpoints)
+        second_buckets[first_buckets == 0] = 0
+    else:
+        second_buckets = quantile_buckets(second, groups, n_second, breakpoints)
+    return first_buckets, second_buckets
+
+
+def portfolio_returns(df, period_col, bucket_cols, return_col='return', weight_col=None,
+                      mean_cols=()):
+    """Equal- and value-weighted returns of every (period, portfolio).
+
+    All sums and counts are taken in one grouped reduction over the
+    (period, portfolio) keys; means skip missing values, as groupby().mean() does. Rows with
+    portfolio 0 (unassigned) are left out.
+
+    Args:
+        df: Panel with the period, portfolio and return columns
+        period_col: Period column
+        bucket_cols: Portfolio column(s), e.g. ['decile'] or ['size_q', 'pred_q']
+        return_col: Return column (default: 'return')
+        weight_col: Optional weight column for value weighting (e.g.
+            'marketcap', which in data4 is already the prior month's value)
+        mean_cols: Other columns averaged per portfolio (e.g. ['predict'])
+
+    Returns:
+        DataFrame sorted by period and portfolio with columns period_col,
+        *bucket_cols, return_col (equal-weighted), f'{return_col}_vw' (when
+        weight_col is given) and *mean_cols
+    """
+    bucket_cols = [bucket_cols] if isinstance(bucket_cols, str) else list(bucket_cols)
+    assigned = np.ones(len(df), dtype=bool)
+    for col in bucket_cols:
+        assigned &= df[col].to_numpy() > 0
+    df = df[assigned]
+
+    sums = {}
+    for col in [return_col, *mean_cols]:
+        x = df[col].to_numpy(dtype=np.float64)
+        sums[col] = x
+        sums[f'_n_{col}'] = np.isfinite(x).astype(np.float64)
+    if weight_col is not None:
+        r = df[return_col].to_numpy(dtype=np.float64)
+        w = df[weight_col].to_numpy(dtype=np.float64)
+        usable = np.isfinite(r) & np.isfinite(w)
+        sums['_wr'] = np.where(usable, w * r, np.nan)
+        sums['_w'] = np.where(usable, w, np.nan)
+
+    keys = [df[period_col].to_numpy()] + [df[col].to_numpy() for col in bucket_cols]
+    totals = pd.DataFrame(sums).groupby(keys, sort=True).sum()
+
+    result = totals.index.to_frame(index=False, name=[period_col] + bucket_cols)
+    result[return_col] = (totals[return_col] / totals[f'_n_{return_col}']).to_numpy()
+    if weight_col is not None:
+        result[f'{return_col}_vw'] = (totals['_wr'] / totals['_w']).to_numpy()
+    for col in mean_cols:
+        result[col] = (totals[col] / totals[f'_n_{col}']).to_numpy()
+    return result
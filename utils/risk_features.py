@@ -0,0 +1,97 @@
+"""Rolling market beta, idiosyncratic volatility and total volatility.
+
+For every ticker and period, over the trailing `window` periods (weekly or
+daily returns):
+
+    beta        slope of the ticker's excess return on the market factor
+    idio_vol    residual volatility of the regression on all factors (FF5)
+    total_vol   volatility of the ticker's excess return
+
+All three are closed-form functions of windowed moments: the count, X'X,
+X'y and y'y, where X is a constant plus the factors and y is the ticker's
+excess return. Each moment is a cumulative sum over time, and a window sum is
+the difference of two cumulative sums. So the whole universe is computed in a
+few array operations, with no rolling or per-ticker regression loop. The
+(factor x factor) moments depend on which periods a ticker has returns, so
+they are kept per ticker. Tickers are processed in blocks of block_size to
+bound memory: one block uses periods x block_size x (k+1)^2 floats.
+
+Usage:
+    from utils.risk_features import rolling_risk
+    risk = rolling_risk(weekly_excess, ff_weekly[['Mkt-RF', 'SMB', 'HML', 'RMW', 'CMA']],
+                        window=52, min_periods=26, periods_per_year=52)
+"""
+import numpy as np
+import pandas as pd
+
+
+def _window_sum(values, window):
+    """Sums over the trailing `window` rows (fewer at the start) via cumulative sums."""
+    total = np.cumsum(values, axis=0)
+    total[window:] -= total[:-window].copy()
+    return total
+
+
+def rolling_risk(returns, factors, window=52, min_periods=26, market='Mkt-RF',
+                 periods_per_year=52, block_size=250):
+    """Rolling beta, idiosyncratic and total volatility of every ticker.
+
+    Args:
+        returns: Wide (period x ticker) excess returns, NaN where missing
+        factors: (period x factor) factor returns; periods missing from it
+            are left out of every window
+        window: Periods per window
+        min_periods: Fewest returns a window needs (fewer gives NaN)
+        market: Market factor column, the regressor of beta
+        periods_per_year: Annualization of the volatilities
+        block_size: Tickers per block
+
+    Returns:
+        Long DataFrame with the period, ticker, beta, idio_vol and total_vol
+        (annualized), one row per (period, ticker) with any value
+    """
+    F = factors.reindex(returns.index).to_numpy(dtype=np.float64)
+    X = np.column_stack([np.ones(len(F)), F])
+    has_factors = np.isfinite(X).all(axis=1)
+    X = np.where(has_factors[:, None], X, 0.0)
+    XX = X[:, :, None] * X[:, None, :]
+    m = 1 + list(factors.columns).index(market)
+    p = X.shape[1]
+
+    Y = returns.to_numpy(dtype=np.float64)
+    T, N = Y.shape
+    out = {name: np.full((T, N), np.nan) for name in ['beta', 'idio_vol', 'total_vol']}
+    for start in range(0, N, block_size):
+        block = slice(start, start + block_size)
+        valid = np.isfinite(Y[:, block]) & has_factors[:, None]
+        y = np.where(valid, Y[:, block], 0.0)
+
+        xx = _window_sum(valid[:, :, None, None] * XX[:, None], window)
+        xy = _window_sum(y[:, :, None] * X[:, None, :], window)
+        yy = _window_sum(y * y, window)
+        n = xx[..., 0, 0]
+        sum_y = xy[..., 0]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total_var = (yy - sum_y ** 2 / n) / (n - 1)
+            sxx = xx[..., m, m] - xx[..., 0, m] ** 2 / n
+            sxy = xy[..., m] - xx[..., 0, m] * sum_y / n
+            beta = sxy / sxx
+
+            solvable = n >= max(min_periods, p + 1)
+            A = np.where(solvable[..., None, None], xx, np.eye(p))
+            coef = np.linalg.solve(A, xy[..., None])[..., 0]
+            idio_var = (yy - (coef * xy).sum(axis=-1)) / (n - p)
+
+        enough = n >= min_periods
+        out['beta'][:, block] = np.where(enough, beta, np.nan)
+        out['total_vol'][:, block] = np.where(
+            enough, np.sqrt(np.maximum(total_var, 0) * periods_per_year), np.nan)
+        out['idio_vol'][:, block] = np.where(
+            solvable, np.sqrt(np.maximum(idio_var, 0) * periods_per_year), np.nan)
+
+    index = pd.MultiIndex.from_product([returns.index, returns.columns],
+                                       names=[returns.index.name or 'period',
+                                              returns.columns.name or 'ticker'])
+    result = pd.DataFrame({name: values.ravel() for name, values in out.items()}, index=index)
+    return result.dropna(how='all').reset_index()
@@ -0,0 +1,174 @@
+"""Memory-resident model state and request micro-batching for the HTTP server.
+
+ModelStore loads a native model (utils/native_scoring.py) and the latest
+ranked feature snapshot once, scores the whole snapshot up front and keeps
+the ranking in memory, so top-N, bottom-N and per-ticker lookups are array
+reads. A background thread polls the model manifest and swaps in a fully
+loaded new state when it changes (hot reload). The manifest is the commit
+point: writers save the snapshot first and call export_native() last, so a
+new manifest means the model and snapshot files are all complete.
+
+MicroBatcher collects feature rows posted by concurrent requests into one
+predict call: it waits at most max_wait_ms after the first queued request,
+or until max_batch rows are queued, then scores them together.
+
+Usage:
+    from utils.serving import ModelStore, MicroBatcher
+    store = ModelStore('data4_model.json', 'data4_current')
+    batcher = MicroBatcher(store)
+    store.top(10), store.ticker('AAPL')
+    predictions = batcher.submit(rows).result()
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from utils.native_scoring import NativeScorer, load_snapshot
+
+
+class ModelState:
+    """One loaded model with its scored snapshot (never mutated after load)."""
+
+    def __init__(self, manifest_path, snapshot_prefix):
+        self.scorer = NativeScorer(manifest_path)
+        self.X = load_snapshot(f"{snapshot_prefix}.npy")
+        self.tickers = np.load(f"{snapshot_prefix}_tickers.npy")
+        if len(self.tickers) != len(self.X):
+            raise ValueError(f"Snapshot has {len(self.X)} rows but {len(self.tickers)} tickers")
+        if self.X.shape[1] != len(self.scorer.features):
+            raise ValueError(f"Snapshot has {self.X.shape[1]} features but the model "
+                             f"expects {len(self.scorer.features)}")
+        self.predictions = self.scorer.predict(self.X)
+        self.order = np.argsort(-self.predictions, kind='stable')
+        self.rank = np.empty(len(self.order), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(self.order))
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers.tolist())}
+        self.loaded_at = time.time()
+
+
+class ModelStore:
+    """Current ModelState, reloaded in the background when its files change."""
+
+    def __init__(self, manifest_path, snapshot_prefix, reload_seconds=5.0):
+        """
+        Args:
+            manifest_path: Manifest written by export_native()
+            snapshot_prefix: Snapshot path without extension; reads
+                '{prefix}.npy' (float32 features) and '{prefix}_tickers.npy'
+            reload_seconds: Seconds between manifest checks (None disables reload)
+        """
+        self.manifest_path = manifest_path
+        self.snapshot_prefix = snapshot_prefix
+        self._stamp = self._file_stamp()
+        self.state = ModelState(manifest_path, snapshot_prefix)
+        self.reloads = 0
+        if reload_seconds:
+            thread = threading.Thread(target=self._watch, args=(reload_seconds,), daemon=True)
+            thread.start()
+
+    def _file_stamp(self):
+        return os.stat(self.manifest_path).st_mtime_ns
+
+    def _watch(self, reload_seconds):
+        while True:
+            time.sleep(reload_seconds)
+            try:
+                stamp = self._file_stamp()
+                if stamp != self._stamp:
+                    # Load fully before swapping, so requests never see a partial state
+                    self.state = ModelState(self.manifest_path, self.snapshot_prefix)
+                    self._stamp = stamp
+                    self.reloads += 1
+                    print(f"Reloaded model ({len(self.state.tickers)} tickers)")
+            except Exception as e:
+                # Missing or inconsistent files: keep serving the current
+                # state and retry on the next check
+                print(f"Reload skipped: {e}")
+
+    @staticmethod
+    def _rows(state, positions):
+        return [{'ticker': str(state.tickers[i]), 'predict': float(state.predictions[i]),
+                 'rank': int(r) + 1}
+                for r, i in positions]
+
+    def top(self, n):
+        """The n highest predictions, best first."""
+        if n < 0:
+            raise ValueError(f"n must be non-negative, got {n}")
+        state = self.state
+        return self._rows(state, enumerate(state.order[:n]))
+
+    def bottom(self, n):
+        """The n lowest predictions, worst first."""
+        if n < 0:
+            raise ValueError(f"n must be non-negative, got {n}")
+        state = self.state
+        start = max(len(state.order) - n, 0)
+        return self._rows(state, reversed(list(enumerate(state.order[start:], start=start))))
+
+    def ticker(self, ticker):
+        """Prediction and rank of one ticker, or None if it is not in the snapshot."""
+        state = self.state
+        i = state.index.get(ticker)
+        if i is None:
+            return None
+        return self._rows(state, [(state.rank[i], i)])[0]
+
+
+class MicroBatcher:
+    """Scores feature rows from concurrent requests in shared predict calls."""
+
+    def __init__(self, store, max_batch=4096, max_wait_ms=2.0):
+        """
+        Args:
+            store: ModelStore whose current scorer is used for each batch
+            max_batch: Rows per predict call (default: 4096)
+            max_wait_ms: Longest wait for more requests after the first
+                (default: 2.0)
+        """
+        self.store = store
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, rows):
+        """Queue a 2-D array of feature rows; returns a Future of predictions."""
+        n_features = len(self.store.state.scorer.features)
+        future = Future()
+        self._queue.put((np.asarray(rows, dtype=np.float32).reshape(-1, n_features), future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+
+            try:
+                batch = np.vstack([rows for rows, _ in pending])
+                predictions = self.store.state.scorer.predict(batch)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(pending)
+            start = 0
+            for rows, future in pending:
+                future.set_result(predictions[start:start + len(rows)])
+                start += len(rows)
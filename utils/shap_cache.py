@@ -0,0 +1,150 @@
+"""Exact TreeSHAP for full cross-sections, computed in parallel and cached.
+
+SHAP values come from LightGBM's own TreeSHAP implementation
+(Booster.predict(pred_contrib=True)), which is exact for tree models and
+gives the same values as shap.TreeExplainer. The cross-section is split into
+chunks that are explained in parallel worker processes, each holding one
+copy of the model. Results are stored as float32 Parquet files keyed by
+(model hash, period, data hash), so summary, dependence and waterfall plots of a model
+are drawn from the cache instead of being recomputed. The data hash covers
+the feature values and row ids, so a refreshed or different cross-section
+of the same period is recomputed rather than paired with stale rows.
+to_explanation()
+wraps a cached frame for the shap plotting functions.
+
+Usage:
+    from utils.shap_cache import ShapCache, to_explanation
+    cache = ShapCache('shap_cache')
+    shap_frame = cache.get(model, X, period='2025-11', ids=df['ticker'])
+    shap.summary_plot(to_explanation(shap_frame, X), X)
+
+On platforms that start worker processes by spawning (macOS, Windows),
+scripts calling get() must do so under an if __name__ == '__main__' guard.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from utils.native_scoring import unwrap_boosters
+
+BASE_COLUMN = 'base_value'
+
+# Per-process model copies loaded once by _init_worker()
+_BOOSTERS = []
+
+
+def model_hash(model):
+    """SHA-256 hex digest of the booster(s) inside a saved model object."""
+    h = hashlib.sha256()
+    for booster in unwrap_boosters(model):
+        h.update(booster.model_to_string().encode())
+    return h.hexdigest()
+
+
+def data_hash(X, ids=None):
+    """SHA-256 hex digest of a feature DataFrame's columns, values and row ids."""
+    h = hashlib.sha256()
+    h.update('\x1f'.join(map(str, X.columns)).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    if ids is not None:
+        ids = pd.Series(np.asarray(ids))
+        h.update(pd.util.hash_pandas_object(ids, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _init_worker(model_strings, num_threads):
+    _BOOSTERS[:] = [lgb.Booster(model_str=s, params={'num_threads': num_threads})
+                    for s in model_strings]
+
+
+def _explain_chunk(X):
+    """Mean over members of [SHAP values..., base value] for each row."""
+    mean = None
+    for k, booster in enumerate(_BOOSTERS, start=1):
+        contrib = booster.predict(X, pred_contrib=True)
+        mean = contrib if mean is None else mean + (contrib - mean) / k
+    return mean.astype(np.float32)
+
+
+def compute_shap(model, X, n_workers=None, chunk_size=2000):
+    """Exact SHAP values of every row of X, explained in parallel chunks.
+
+    Args:
+        model: Saved model object (Booster, LGBMModel, EnsembleModel or the
+            train_lightgbm.py dict)
+        X: Feature DataFrame (or array) in the model's feature order
+        n_workers: Worker processes (default: all cores, at most one per chunk)
+        chunk_size: Rows per chunk (default: 2000)
+
+    Returns:
+        float32 array of shape (n_rows, n_features + 1); the last column is
+        the base value (expected prediction)
+    """
+    model_strings = [booster.model_to_string() for booster in unwrap_boosters(model)]
+    chunks = [X[start:start + chunk_size] for start in range(0, len(X), chunk_size)]
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(chunks)))
+    # Split the cores between workers instead of oversubscribing
+    num_threads = max(1, (os.cpu_count() or 1) // n_workers)
+
+    if n_workers == 1:
+        _init_worker(model_strings, num_threads)
+        return np.vstack([_explain_chunk(chunk) for chunk in chunks])
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(model_strings, num_threads)) as pool:
+        return np.vstack(list(pool.map(_explain_chunk, chunks)))
+
+
+def to_explanation(shap_frame, X):
+    """shap.Explanation of a cached SHAP frame, for shap's plotting functions."""
+    import shap
+    features = [col for col in shap_frame.columns if col in set(X.columns)]
+    return shap.Explanation(values=shap_frame[features].to_numpy(),
+                            base_values=shap_frame[BASE_COLUMN].to_numpy(),
+                            data=X[features].to_numpy(), feature_names=features)
+
+
+class ShapCache:
+    """SHAP values per (model hash, period, data hash) as float32 Parquet files."""
+
+    def __init__(self, directory='shap_cache'):
+        """
+        Args:
+            directory: Cache directory (created if missing)
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, model_key, period, data_key):
+        """Parquet path of one model's SHAP values for one period's data."""
+        return os.path.join(self.directory,
+                            f"{model_key[:16]}_{period}_{data_key[:16]}.parquet")
+
+    def get(self, model, X, period, ids=None, n_workers=None, chunk_size=2000):
+        """SHAP values of X for period, computed once per (model, period, data).
+
+        Args:
+            model: Saved model object (see compute_shap())
+            X: Feature DataFrame of the period's full cross-section
+            period: Period label used in the cache key (e.g. '2025-11')
+            ids: Optional row identifiers stored with the values (e.g. tickers)
+            n_workers, chunk_size: Parallelism of the computation on a miss
+
+        Returns:
+            DataFrame with one float32 column per feature, 'base_value' and
+            (if given) 'id', in the row order of X
+        """
+        path = self.path(model_hash(model), period, data_hash(X, ids))
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+
+        values = compute_shap(model, X, n_workers=n_workers, chunk_size=chunk_size)
+        features = list(X.columns)
+        shap_frame = pd.DataFrame(values[:, :-1], columns=features, index=X.index)
+        shap_frame[BASE_COLUMN] = values[:, -1]
+        if ids is not None:
+            shap_frame.insert(0, 'id', np.asarray(ids))
+        shap_frame.to_parquet(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        return shap_frame
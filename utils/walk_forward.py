@@ -0,0 +1,344 @@
+"""Walk-forward engine shared by the data4 (monthly) and data5 (weekly) pipelines.
+
+The panel is sorted by period once and a period -> row offset table is built,
+so every training window and every out-of-sample block is a contiguous row
+range: training windows are row subsets of one binned LightGBM dataset
+(utils/lgb_panel.py) and all out-of-sample periods of a window are scored with
+one batched predict call on a zero-copy slice of the feature matrix.
+
+Passing a ModelCache (utils/model_cache.py) to run() loads the models and
+predictions of unchanged windows from disk instead of retraining them. A
+window's key covers its own rows and the rows the bin boundaries come from.
+By default that is the whole panel, so appending a period retrains every
+window; with bin_periods=N the bins come from the first N periods only, and
+appending or refreshing later periods retrains only the windows that use them.
+With importance='trees' (or 'shap'), run() also records every window
+model's feature importances as a long time series in self.importance.
+
+Usage:
+    from utils.walk_forward import WalkForward
+    wf = WalkForward(df_train, 'month', features, 'return')
+    df_predict = wf.run(PARAMS, train_size=12)                  # monthly
+    df_predict = wf.run(PARAMS, train_size=52, step=8)          # weekly
+    df_predict = wf.run(PARAMS, train_size=12, ensemble=ensemble_params(PARAMS, 5))
+"""
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+from utils.lgb_panel import build_panel_dataset, train_window, train_ensemble, EnsembleModel
+from utils.model_cache import digest_arrays, digest_values
+
+
+class WalkForward:
+    """Period-sorted panel with contiguous row ranges per period.
+
+    Attributes:
+        df: Panel sorted by (period, ticker)
+        periods: Sorted array of unique periods
+        offsets: Row offset of each period; rows of period i are
+            offsets[i]:offsets[i + 1]
+        X: Feature matrix, float32 by default (rows aligned with df)
+        y: Target vector (rows aligned with df)
+    """
+
+    def __init__(self, df, period_col, features, target, id_col='ticker', dtype=np.float32,
+                 bin_periods=None):
+        """
+        Args:
+            df: Panel with one row per (id, period)
+            period_col: Period column ('month' or 'week')
+            features: List of feature columns (numeric, e.g. percentile ranks)
+            target: Target column
+            id_col: Identifier column (default: 'ticker')
+            dtype: Feature matrix dtype (default: float32; raw, unranked
+                features may need float64 to bin exactly as a DataFrame would)
+            bin_periods: Compute the LightGBM bin boundaries from the first
+                bin_periods periods only (default: None, all periods). Fits
+                rank features, whose boundaries barely depend on the periods
+                used; raw features should keep the default
+        """
+        # Sort once (skipped if the caller already sorted the panel)
+        if not df[period_col].is_monotonic_increasing:
+            df = df.sort_values([period_col, id_col], kind='stable').reset_index(drop=True)
+        self.df = df
+        self.period_col = period_col
+        self.id_col = id_col
+        self.features = list(features)
+        self.target = target
+
+        period_values = df[period_col].to_numpy()
+        self.periods = pd.unique(period_values)
+        self.offsets = np.append(np.searchsorted(period_values, self.periods, side='left'),
+                                 len(df))
+
+        self.X = df[self.features].to_numpy(dtype=dtype)
+        self.y = df[target].to_numpy(dtype=np.float64)
+        self.bin_periods = (len(self.periods) if bin_periods is None
+                            else min(int(bin_periods), len(self.periods)))
+        self._dataset = None
+        self._dataset_params = None
+        self._period_digests = {}
+        self._last_window = None
+        self.last_model = None
+        self.fit_times = []
+        self.importance = None
+
+    def period_index(self, period):
+        """Position of a period in self.periods."""
+        return int(np.searchsorted(self.periods, period))
+
+    def rows(self, start, stop):
+        """Slice of the rows belonging to periods[start:stop]."""
+        return slice(self.offsets[start], self.offsets[stop])
+
+    def digest(self, start, stop):
+        """Content hash of the features and target of periods[start:stop].
+
+        Each period is hashed once and a window's digest combines the
+        per-period digests, so overlapping windows don't re-hash shared rows.
+        """
+        h = hashlib.sha256()
+        for i in range(start, stop):
+            if i not in self._period_digests:
+                rows = self.rows(i, i + 1)
+                self._period_digests[i] = digest_arrays(self.X[rows], self.y[rows])
+            h.update(self._period_digests[i].encode())
+        return h.hexdigest()
+
+    def training_digest(self, start, stop, params):
+        """Digest of everything a model of periods[start:stop] depends on but its params.
+
+        Windows train on the panel binned once (dataset()) with boundaries
+        computed from periods[:bin_periods], so the models change whenever
+        those periods do. The digest covers the window's rows, the bin
+        periods' rows and the params the panel was binned with.
+        """
+        return digest_values(self.digest(start, stop), self.digest(0, self.bin_periods),
+                             params)
+
+    def dataset(self, params):
+        """Binned LightGBM dataset over the whole panel (built once per params)."""
+        if self._dataset is None or self._dataset_params != params:
+            bin_rows = (None if self.bin_periods == len(self.periods)
+                        else self.rows(0, self.bin_periods))
+            self._dataset = build_panel_dataset(self.X, self.y, self.features, params,
+                                                bin_rows=bin_rows)
+            self._dataset_params = dict(params)
+        return self._dataset
+
+    def windows(self, train_size, step=1, horizon=None, end=None):
+        """Walk-forward splits as period index ranges.
+
+        Args:
+            train_size: Periods in each training window
+            step: Periods between retrainings (default: 1)
+            horizon: Periods predicted per window (default: step)
+            end: Only predict periods before this index (default: all periods)
+
+        Yields:
+            (train_start, train_stop, predict_stop): train on periods
+            [train_start, train_stop), predict periods [train_stop, predict_stop)
+        """
+        horizon = step if horizon is None else horizon
+        end = len(self.periods) if end is None else end
+        for train_stop in range(train_size, end, step):
+            yield train_stop - train_size, train_stop, min(train_stop + horizon, end)
+
+    def fit(self, params, train_start, train_stop, init_model=None, num_boost_round=None):
+        """Train one window on the contiguous rows of periods[train_start:train_stop]."""
+        return train_window(self.dataset(params), self._row_index(train_start, train_stop),
+                            params, init_model=init_model, num_boost_round=num_boost_round)
+
+    def fit_ensemble(self, params, member_params, train_start, train_stop, cache=None):
+        """Train (or load from the cache) every ensemble member for one window.
+
+        Members missing from the cache are trained in parallel threads on the
+        panel binned with the base params.
+        """
+        keys = [None] * len(member_params)
+        models = [None] * len(member_params)
+        if cache is not None:
+            digest = self.training_digest(train_start, train_stop, params)
+            keys = [cache.model_key(digest, self.features, p) for p in member_params]
+            models = [cache.load_model(key) for key in keys]
+        missing = [k for k, model in enumerate(models) if model is None]
+        if missing:
+            trained = train_ensemble(self.dataset(params), self._row_index(train_start, train_stop),
+                                     [member_params[k] for k in missing])
+            for k, model in zip(missing, trained):
+                models[k] = model
+                if cache is not None:
+                    cache.save_model(keys[k], model)
+        return EnsembleModel(models)
+
+    def _row_index(self, start, stop):
+        """Row positions of periods[start:stop] for a LightGBM subset."""
+        return np.arange(self.offsets[start], self.offsets[stop], dtype=np.int32)
+
+    def window_model(self, params, train_start, train_stop, cache=None, ensemble=None):
+        """Model trained on periods[train_start:train_stop], reusing earlier work.
+
+        Returns run()'s last model if it was fully trained on the same window
+        with the same params (run(..., final=True) trains the window ending at
+        `end` for this), else the cached model for the window, else trains it
+        once and stores it in the cache, so a rerun on the same data finds it.
+        """
+        if self._last_window == (train_start, train_stop, params, ensemble):
+            return self.last_model
+        if ensemble is not None:
+            return self.fit_ensemble(params, ensemble, train_start, train_stop, cache)
+        if cache is None:
+            return self.fit(params, train_start, train_stop)
+        key = cache.model_key(self.training_digest(train_start, train_stop, params),
+                              self.features, params)
+        return self._fit_cached(cache, key, params, train_start, train_stop)
+
+    def predict(self, model, start, stop):
+        """Batched prediction for all rows of periods[start:stop]."""
+        return model.predict(self.X[self.rows(start, stop)])
+
+    def run(self, params, train_size, step=1, horizon=None, end=None,
+            warm_start_trees=None, refit_every=None, ensemble=None, cache=None,
+            importance=None, final=False, verbose=True):
+        """Train and predict over every walk-forward window.
+
+        Args:
+            params: Dict of LGBMRegressor keyword arguments
+            train_size: Periods in each training window
+            step: Periods between retrainings (default: 1)
+            horizon: Periods predicted per window (default: step)
+            end: Only predict periods before this index (default: all periods)
+            warm_start_trees: If set, continue boosting the previous window's
+                model with this many extra trees (default: None, full retrain)
+            refit_every: Full retrain every N windows when warm-starting
+            ensemble: Member parameter dicts (from ensemble_params()) to train
+                and average per window instead of one model (default: None)
+            cache: ModelCache for window models and predictions (default: None)
+            importance: Record each window model's feature importances in
+                self.importance: 'trees' (gain and split) or 'shap' (also
+                mean |SHAP| over the window's out-of-sample rows)
+                (default: None)
+            final: Also train the window of the last train_size periods before
+                `end`, which predicts nothing yet: its model is the one for the
+                first period at or after `end`, kept as self.last_model for
+                window_model() (default: False)
+            verbose: Print progress every 12 windows (default: True)
+
+        Returns:
+            DataFrame with (id, period, predict) for every out-of-sample row
+            (per-window fit times are kept in self.fit_times)
+        """
+        if importance not in (None, 'trees', 'shap'):
+            raise ValueError(f"importance must be None, 'trees' or 'shap', got {importance!r}")
+        if ensemble is not None and warm_start_trees:
+            raise ValueError("Warm start is not supported in ensemble mode")
+
+        predictions = np.full(len(self.df), np.nan)
+        scored = np.zeros(len(self.df), dtype=bool)
+        splits = list(self.windows(train_size, step, horizon, end))
+        stop = len(self.periods) if end is None else end
+        if final and stop >= train_size and (not splits or splits[-1][1] != stop):
+            splits.append((stop - train_size, stop, stop))
+        model, model_key, loaded_key = None, None, None
+        warm = False
+        self._last_window = None
+        self.fit_times = []
+        records = []
+        for n, (train_start, train_stop, predict_stop) in enumerate(splits):
+            warm = bool(warm_start_trees) and n % (refit_every or len(splits)) != 0
+            num_boost_round = warm_start_trees if warm else None
+            start = time.perf_counter()
+
+            if ensemble is not None:
+                # Member models are cached; their averaged predictions are not
+                model = self.fit_ensemble(params, ensemble, train_start, train_stop, cache)
+                self.fit_times.append(time.perf_counter() - start)
+                block_predictions = self.predict(model, train_stop, predict_stop)
+                model_key = loaded_key = None
+            elif cache is None:
+                model = self.fit(params, train_start, train_stop,
+                                 init_model=model if warm else None,
+                                 num_boost_round=num_boost_round)
+                self.fit_times.append(time.perf_counter() - start)
+                block_predictions = self.predict(model, train_stop, predict_stop)
+            else:
+                parent_key = model_key if warm else None
+                model_key = cache.model_key(self.training_digest(train_start, train_stop, params),
+                                            self.features, params, parent_key, num_boost_round)
+                prediction_key = cache.prediction_key(model_key,
+                                                      self.digest(train_stop, predict_stop))
+                block_predictions = cache.load_predictions(prediction_key)
+                if block_predictions is None:
+                    model = self._fit_cached(cache, model_key, params, train_start, train_stop,
+                                             parent_key, model if warm and loaded_key == parent_key else None,
+                                             num_boost_round)
+                    loaded_key = model_key
+                    self.fit_times.append(time.perf_counter() - start)
+                    block_predictions = self.predict(model, train_stop, predict_stop)
+                    cache.save_predictions(prediction_key, block_predictions)
+
+            # All out-of-sample periods of the window in one predict call
+            block = self.rows(train_stop, predict_stop)
+            predictions[block] = block_predictions
+            scored[block] = True
+
+            if importance is not None and predict_stop > train_stop:
+                if loaded_key != model_key:
+                    # Predictions came from the cache; the (small) model file is enough
+                    model = cache.load_model(model_key)
+                    loaded_key = model_key
+                records.append(self._window_importance(model, n, train_stop, predict_stop,
+                                                       importance == 'shap'))
+
+            if verbose and ((n + 1) % 12 == 0 or n == len(splits) - 1):
+                print(f"Completed {n + 1}/{len(splits)} windows "
+                      f"(predicted through {self.periods[predict_stop - 1]})")
+
+        if cache is not None and ensemble is None:
+            if loaded_key != model_key:
+                model = cache.load_model(model_key)
+            if verbose:
+                print(f"Model cache: {cache.hits} windows loaded, {cache.misses} trained")
+
+        if importance is not None:
+            self.importance = pd.concat(records, ignore_index=True) if records else None
+        self.last_model = model
+        if splits and not warm:
+            self._last_window = (splits[-1][0], splits[-1][1], dict(params), ensemble)
+        return pd.DataFrame({
+            self.id_col: self.df[self.id_col].to_numpy()[scored],
+            self.period_col: self.df[self.period_col].to_numpy()[scored],
+            'predict': predictions[scored],
+        })
+
+    def _window_importance(self, model, window, train_stop, predict_stop, shap=False):
+        """Long-format importances of one window model (compact dtypes)."""
+        n_features = len(self.features)
+        record = pd.DataFrame({
+            'window': np.full(n_features, window, dtype=np.int32),
+            self.period_col: self.periods[train_stop],
+            'feature': pd.Categorical(self.features, categories=self.features),
+            'gain': model.feature_importance(importance_type='gain').astype(np.float32),
+            'split': model.feature_importance(importance_type='split').astype(np.float32),
+        })
+        if shap:
+            contrib = model.predict(self.X[self.rows(train_stop, predict_stop)], pred_contrib=True)
+            record['mean_abs_shap'] = np.abs(contrib[:, :n_features]).mean(axis=0).astype(np.float32)
+        return record
+
+    def _fit_cached(self, cache, key, params, train_start, train_stop,
+                    parent_key=None, parent_model=None, num_boost_round=None):
+        """Load a window model from the cache, or train and store it."""
+        model = cache.load_model(key)
+        if model is None:
+            if parent_key is not None and parent_model is None:
+                parent_model = cache.load_model(parent_key)
+                if parent_model is None:
+                    raise FileNotFoundError(
+                        f"Warm-start parent model {parent_key} is missing from "
+                        f"{cache.directory}; clear the cache and rerun")
+            model = self.fit(params, train_start, train_stop, init_model=parent_model,
+                             num_boost_round=num_boost_round)
+            cache.save_model(key, model)
+        return model